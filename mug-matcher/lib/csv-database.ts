@@ -7,6 +7,7 @@ interface CsvInmate {
   InmateID: string;
   Name: string;
   MugshotURL: string;
+  LocalMugshotPath?: string; // Locally stored copy written by mugshotscripts/image_fetcher.py
   AI_Description_Explanation: string; // Changed from Description
   // Other fields are available but not needed for our implementation
 }
@@ -327,7 +328,7 @@ export async function getInmates(limit = 10): Promise<Inmate[]> {
       return {
         id,
         name: (inmate.Name || 'Unknown').replace(/"/g, ''), // Remove quotes from names
-        image: inmate.MugshotURL || '',
+        image: inmate.LocalMugshotPath || inmate.MugshotURL || '',
         crime: crime
       };
     });
@@ -1,55 +1,79 @@
 import pandas as pd
-from openai import OpenAI
+from openai import AsyncOpenAI
 import os
 import csv
+import asyncio
 from dotenv import load_dotenv
-import time
+from openai_async import AsyncChatRunner, run_ordered
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Set up OpenAI API key
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+MODEL = "gpt-4.1-mini"
 
 # Function to reword charges into plain language
-def reword_charges(row):
+async def reword_charges(runner, row):
     # Combine all charge information
     charges = f"Statute: {row['Statute']}, Description: {row['Description']}"
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4.1-mini",
-            messages=[
+        return await runner.complete([
                 {"role": "system", "content": "You are a helpful assistant that rewrites legal charges into plain language. For example: 'VIOL OF PROB - FEL' should be rewritten as 'Violation Of Parole (Felony)'."},
                 {"role": "user", "content": f"Rewrite these charges into plain language that anyone can understand: {charges}"}
-            ],
-            max_tokens=250
-        )
-        
-        return response.choices[0].message.content.strip()
+            ], max_tokens=250, temperature=1, purpose="reword")
     
     except Exception as e:
         print(f"Error rewording charges for inmate {row['Name']}: {str(e)}")
         return f"Error: {str(e)}"
 
 # Function to identify the most interesting charge
-def identify_interesting_charge(plain_language_charges):
+async def identify_interesting_charge(runner, plain_language_charges):
     try:
-        response = client.chat.completions.create(
-            model="gpt-4.1-mini",
-            messages=[
+        return await runner.complete([
                 {"role": "system", "content": "You are a helpful assistant that analyzes criminal charges. Identify the most interesting, unusual, or serious charge from a list."},
                 {"role": "user", "content": f"From these reworded charges, identify the single most interesting, unusual, or serious charge: {plain_language_charges}"}
-            ],
-            max_tokens=150
-        )
-        
-        return response.choices[0].message.content.strip()
+            ], max_tokens=150, temperature=1, purpose="select")
     
     except Exception as e:
         print(f"Error identifying interesting charge: {str(e)}")
         return f"Error: {str(e)}"
 
+async def process_inmate(runner, row):
+    # Step 1: Reword all charges
+    plain_language = await reword_charges(runner, row)
+    
+    # Step 2: Identify most interesting charge
+    if not plain_language.startswith("Error:"):
+        most_interesting = await identify_interesting_charge(runner, plain_language)
+    else:
+        most_interesting = "Could not analyze due to error in rewording"
+    return plain_language, most_interesting
+
+async def process_all(df, total_rows):
+    # Calls are paced by the shared RPM/TPM token buckets and retried under openai_retry's policy
+    # (openai_async.py) instead of a fixed sleep after every inmate
+    runner = AsyncChatRunner(AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0), MODEL)
+    try:
+        # Process in batches so progress is saved regularly
+        batch_size = 10
+        for i in range(0, len(df), batch_size):
+            batch = df.iloc[i:i+batch_size]
+            for idx, row in batch.iterrows():
+                print(f"Processing inmate {idx+1}/{total_rows}: {row['Name']}")
+            
+            # Results come back in row order whatever order the responses arrive in
+            results = await run_ordered([row for _, row in batch.iterrows()], lambda row: process_inmate(runner, row))
+            for idx, (plain_language, most_interesting) in zip(batch.index, results):
+                df.loc[idx, 'Plain_Language_Charges'] = plain_language
+                df.loc[idx, 'Most_Interesting_Charge'] = most_interesting
+            
+            # Save progress after each batch
+            df.to_csv('enhanced_mugshots.csv', index=False, quoting=csv.QUOTE_ALL)
+            print(f"Saved progress through inmate {min(i+batch_size, total_rows)}/{total_rows}")
+    finally:
+        print(runner.summary())
+        await runner.client.close()
+
 # Main function
 def main():
     try:
@@ -85,32 +109,7 @@ def main():
         df['Plain_Language_Charges'] = None
         df['Most_Interesting_Charge'] = None
         
-        # Process in batches to avoid rate limits
-        batch_size = 10
-        for i in range(0, len(df), batch_size):
-            batch = df.iloc[i:i+batch_size]
-            
-            # Process each row in the batch
-            for idx, row in batch.iterrows():
-                print(f"Processing inmate {idx+1}/{total_rows}: {row['Name']}")
-                
-                # Step 1: Reword all charges
-                plain_language = reword_charges(row)
-                df.loc[idx, 'Plain_Language_Charges'] = plain_language
-                
-                # Step 2: Identify most interesting charge
-                if not plain_language.startswith("Error:"):
-                    most_interesting = identify_interesting_charge(plain_language)
-                    df.loc[idx, 'Most_Interesting_Charge'] = most_interesting
-                else:
-                    df.loc[idx, 'Most_Interesting_Charge'] = "Could not analyze due to error in rewording"
-                
-                # Small delay to respect rate limits
-                time.sleep(1.5)
-            
-            # Save progress after each batch
-            df.to_csv('enhanced_mugshots.csv', index=False, quoting=csv.QUOTE_ALL)
-            print(f"Saved progress through inmate {min(i+batch_size, total_rows)}/{total_rows}")
+        asyncio.run(process_all(df, total_rows))
         
         print("Processing complete! Results saved to enhanced_mugshots.csv")
     
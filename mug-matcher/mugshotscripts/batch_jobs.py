@@ -0,0 +1,259 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+# Offline batch jobs for consolidated_mugshot_processor.py --batch.
+# Rather than one synchronous chat completion per inmate, every request is written to a JSONL job
+# file, submitted as one batch, polled until it finishes and merged back by InmateID. Each step
+# records its progress in <batch dir>/state.json, so any of them can be re-run or resumed after
+# an interruption without re-submitting (and paying for) the same batch twice:
+#
+#   prepare   requests.jsonl   one line per distinct request, custom_id "inmate-<InmateID>-<hash>"
+#   submit    state.json       uploaded input file id and batch id
+#   poll      output.jsonl     downloaded results (and errors.jsonl) once the batch has finished
+#   merge     the output CSV   results joined back on custom_id
+#
+# The hash in a custom_id covers the request body, so editing the prompt or an inmate's charges
+# produces a new ID rather than silently reusing an old answer.
+#
+# Transports carry out submit and poll. OpenAIBatchTransport talks to the Batch API;
+# LocalBatchTransport is a file-based stand-in that answers like fake_openai_server.py.
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+def custom_id_for(inmate_id, body):
+    digest = hashlib.sha256(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    return f"inmate-{inmate_id}-{digest}"
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, mode="w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+class BatchJob:
+    """The files and state of one batch run, kept in `path`."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.requests_path = os.path.join(path, "requests.jsonl")
+        self.output_path = os.path.join(path, "output.jsonl")
+        self.errors_path = os.path.join(path, "errors.jsonl")
+        self.state_path = os.path.join(path, "state.json")
+        self.state = {}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, mode="r", encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    def save(self):
+        _write_atomic(self.state_path, json.dumps(self.state, indent=1, sort_keys=True))
+
+    def prepare(self, requests):
+        """
+        Writes [(custom_id, body)] as the job file. Returns False, keeping the current submission,
+        when an identical job file was already prepared.
+        """
+        lines = []
+        seen = set()
+        for custom_id, body in requests:
+            if custom_id in seen:
+                continue  # Same inmate with identical charges (duplicate CSV rows): one request is enough
+            seen.add(custom_id)
+            lines.append(json.dumps({"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body},
+                                    sort_keys=True))
+        text = "".join(line + "\n" for line in lines)
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        if self.state.get("requests_sha256") == digest and os.path.exists(self.requests_path):
+            return False
+        _write_atomic(self.requests_path, text)
+        # A different job file starts over: earlier submission and results belong to the old one
+        for path in (self.output_path, self.errors_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.state = {"requests_sha256": digest, "request_count": len(lines), "prepared_at": time.time()}
+        self.save()
+        return True
+
+    def submit(self, transport):
+        """Uploads the job file and creates the batch, resuming after whichever step last completed."""
+        if not os.path.exists(self.requests_path):
+            raise RuntimeError(f"No job file at {self.requests_path}; run the prepare step first")
+        if self.state.get("batch_id"):
+            return False
+        if not self.state.get("input_file_id"):
+            self.state["input_file_id"] = transport.upload(self.requests_path)
+            self.save()
+        self.state["batch_id"] = transport.create_batch(self.state["input_file_id"])
+        self.state["status"] = "submitted"
+        self.state["submitted_at"] = time.time()
+        self.save()
+        return True
+
+    def poll(self, transport, interval=60.0, once=False, log=print):
+        """
+        Checks the batch until it reaches a terminal status (or once), downloading its output
+        files when it has. Returns the last status.
+        """
+        batch_id = self.state.get("batch_id")
+        if not batch_id:
+            raise RuntimeError("The batch has not been submitted yet; run the submit step first")
+        while True:
+            if self.state.get("status") in TERMINAL_STATUSES and self.is_downloaded():
+                return self.state["status"]
+            info = transport.retrieve_batch(batch_id)
+            self.state["status"] = info["status"]
+            self.state["request_counts"] = info.get("request_counts")
+            self.save()
+            counts = info.get("request_counts") or {}
+            log(f"Batch {batch_id}: {info['status']} "
+                f"({counts.get('completed', 0)}/{counts.get('total', 0)} completed, {counts.get('failed', 0)} failed)")
+            if info["status"] in TERMINAL_STATUSES:
+                for key, path in (("output_file_id", self.output_path), ("error_file_id", self.errors_path)):
+                    if info.get(key):
+                        transport.download(info[key], path)
+                        self.state[key] = info[key]
+                self.state["downloaded"] = True
+                self.save()
+                return info["status"]
+            if once:
+                return info["status"]
+            time.sleep(interval)
+
+    def is_downloaded(self):
+        return bool(self.state.get("downloaded"))
+
+    def results(self):
+        """{custom_id: response text} for every request that succeeded, and {custom_id: error} for the rest."""
+        answers = {}
+        errors = {}
+        for path in (self.output_path, self.errors_path):
+            if not os.path.exists(path):
+                continue
+            with open(path, mode="r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    response = record.get("response") or {}
+                    if response.get("status_code") == 200 and not record.get("error"):
+                        answers[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"].strip()
+                    else:
+                        errors[record["custom_id"]] = record.get("error") or response.get("body")
+        return answers, errors
+
+    def usage(self):
+        """The usage block of every successful result, for the run ledger."""
+        usages = []
+        if os.path.exists(self.output_path):
+            with open(self.output_path, mode="r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        body = (json.loads(line).get("response") or {}).get("body") or {}
+                        if body.get("usage"):
+                            usages.append(body["usage"])
+        return usages
+
+# --- Transports ---
+
+class OpenAIBatchTransport:
+    """Submits and polls through the OpenAI Batch API."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def upload(self, path):
+        with open(path, mode="rb") as f:
+            return self.client.files.create(file=f, purpose="batch").id
+
+    def create_batch(self, input_file_id):
+        return self.client.batches.create(
+            input_file_id=input_file_id, endpoint=BATCH_ENDPOINT, completion_window=COMPLETION_WINDOW
+        ).id
+
+    def retrieve_batch(self, batch_id):
+        batch = self.client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        return {
+            "status": batch.status,
+            "output_file_id": batch.output_file_id,
+            "error_file_id": batch.error_file_id,
+            "request_counts": {"total": counts.total, "completed": counts.completed, "failed": counts.failed}
+            if counts else None,
+        }
+
+    def download(self, file_id, path):
+        _write_atomic(path, self.client.files.content(file_id).text)
+
+class LocalBatchTransport:
+    """
+    File-based stand-in for the Batch API, for tests and dry runs. Uploaded files and batches live
+    under `root`; a batch reports in_progress for `polls_until_done` polls, then completes with
+    deterministic answers. Requests whose prompt contains `fail_marker` come back as failures.
+    """
+
+    def __init__(self, root, polls_until_done=1, fail_marker=None):
+        self.root = root
+        self.polls_until_done = polls_until_done
+        self.fail_marker = fail_marker
+        os.makedirs(os.path.join(root, "files"), exist_ok=True)
+        os.makedirs(os.path.join(root, "batches"), exist_ok=True)
+
+    def _file_path(self, file_id):
+        return os.path.join(self.root, "files", file_id)
+
+    def _batch_path(self, batch_id):
+        return os.path.join(self.root, "batches", f"{batch_id}.json")
+
+    def upload(self, path):
+        file_id = f"file-local-{uuid.uuid4().hex[:12]}"
+        shutil.copyfile(path, self._file_path(file_id))
+        return file_id
+
+    def create_batch(self, input_file_id):
+        batch_id = f"batch-local-{uuid.uuid4().hex[:12]}"
+        _write_atomic(self._batch_path(batch_id), json.dumps({"input_file_id": input_file_id, "polls": 0}))
+        return batch_id
+
+    def retrieve_batch(self, batch_id):
+        from fake_openai_server import fake_answer, fake_usage
+
+        with open(self._batch_path(batch_id), mode="r", encoding="utf-8") as f:
+            batch = json.load(f)
+        batch["polls"] += 1
+        if batch["polls"] > self.polls_until_done and "output_file_id" not in batch:
+            outputs, errors = [], []
+            with open(self._file_path(batch["input_file_id"]), mode="r", encoding="utf-8") as f:
+                for line in f:
+                    request = json.loads(line)
+                    prompt = request["body"]["messages"][-1]["content"]
+                    if self.fail_marker and self.fail_marker in prompt:
+                        errors.append({"custom_id": request["custom_id"], "response": None,
+                                       "error": {"code": "server_error", "message": "Simulated failure"}})
+                        continue
+                    answer = fake_answer(prompt)
+                    body = {"choices": [{"index": 0, "message": {"role": "assistant", "content": answer}}],
+                            "usage": fake_usage(request["body"]["messages"], answer)}
+                    outputs.append({"custom_id": request["custom_id"], "response": {"status_code": 200, "body": body},
+                                    "error": None})
+            for key, records in (("output_file_id", outputs), ("error_file_id", errors)):
+                if records:
+                    batch[key] = f"file-local-{uuid.uuid4().hex[:12]}"
+                    _write_atomic(self._file_path(batch[key]), "".join(json.dumps(r) + "\n" for r in records))
+            batch["counts"] = {"total": len(outputs) + len(errors), "completed": len(outputs), "failed": len(errors)}
+        _write_atomic(self._batch_path(batch_id), json.dumps(batch))
+        done = "counts" in batch
+        return {
+            "status": "completed" if done else "in_progress",
+            "output_file_id": batch.get("output_file_id"),
+            "error_file_id": batch.get("error_file_id"),
+            "request_counts": batch.get("counts"),
+        }
+
+    def download(self, file_id, path):
+        shutil.copyfile(self._file_path(file_id), path)
@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+import argparse
+
+from page_extract import parse_inmate_page, reference_parse, lxml
+from mock_sheriff_server import load_pages
+
+# Micro-benchmark for InmateDetail extraction.
+# Compares the original multi-scan extractor (page_extract.reference_parse on html.parser) with
+# the single-pass lxml walk in page_extract.parse_inmate_page, checks that both produce identical
+# output for every page, and reports pages parsed per second.
+#
+# The equivalence check also always covers fixtures/inmate_pages: pages in the live site's
+# layout (navigation, scripts, entities, CR LF line endings) and pages with missing or malformed
+# sections (no photo, missing fields, other warning panels, broken and truncated markup, no
+# booking, empty body). Each is checked with LF, CR LF and CR line endings.
+#
+#   python bench_extract.py                      # Corpus rendered from mugshots_data.csv
+#   python bench_extract.py --pages-dir pages/   # Corpus of saved InmateDetail .html files
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "inmate_pages")
+
+def load_pages_dir(pages_dir):
+    corpus = []
+    for filename in sorted(os.listdir(pages_dir)):
+        if not filename.endswith(".html"):
+            continue
+        stem = filename[:-len(".html")]
+        inmate_id = int(stem) if stem.isdigit() else stem
+        # newline="" keeps the page's own line endings, as requests' resp.text does
+        with open(os.path.join(pages_dir, filename), mode="r", encoding="utf-8", newline="") as f:
+            corpus.append((inmate_id, f.read()))
+    return corpus
+
+def load_corpus(args):
+    if args.pages_dir:
+        return load_pages_dir(args.pages_dir)
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    csv_path = args.csv or os.path.join(script_dir, "mugshots_data.csv")
+    return sorted(load_pages(csv_path).items())
+
+def fixture_pages():
+    """The fixture pages, each with its line endings rewritten to LF, CR LF and CR."""
+    pages = []
+    for inmate_id, html in load_pages_dir(FIXTURES_DIR):
+        text = html.replace("\r\n", "\n")
+        for ending in ["\n", "\r\n", "\r"]:
+            pages.append((inmate_id, text.replace("\n", ending)))
+    return pages
+
+def mismatched_pages(pages):
+    """IDs of the pages where the lxml walk and the original extractor disagree."""
+    return [inmate_id for inmate_id, html in pages
+            if parse_inmate_page(html, inmate_id, parser="lxml") != reference_parse(html, inmate_id)]
+
+def time_extractor(extract, corpus, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for inmate_id, html in corpus:
+            extract(html, inmate_id)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return len(corpus) / best if best else float("inf")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark InmateDetail page extraction (pages parsed per second).")
+    parser.add_argument('--csv', help="CSV to render the fixture corpus from. Default: mugshots_data.csv")
+    parser.add_argument('--pages-dir', help="Directory of saved <InmateID>.html pages to use instead of rendered ones.")
+    parser.add_argument('--repeat', type=int, default=3, help="Timing runs per extractor; the best is reported. Default: 3")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args)
+    if not corpus:
+        print("No pages in the fixture corpus.")
+        sys.exit(1)
+    size_kb = sum(len(html) for _, html in corpus) / 1024
+    print(f"Fixture corpus: {len(corpus)} pages, {size_kb:.0f} KB")
+
+    if lxml is None:
+        print("lxml is not installed: parse_inmate_page runs the original extractor (pip install lxml for the single pass).")
+    else:
+        fixtures = fixture_pages()
+        mismatches = mismatched_pages(corpus + fixtures)
+        for inmate_id in mismatches:
+            print(f"MISMATCH for page {inmate_id}")
+        if mismatches:
+            print(f"{len(mismatches)} pages differ from the original extractor.")
+            sys.exit(1)
+        print(f"Single-pass output is identical to the original extractor on the corpus and {len(fixtures)} fixture pages.")
+
+    baseline = time_extractor(reference_parse, corpus, args.repeat)
+    print(f"{'original (html.parser)':<28} {baseline:8.1f} pages/s")
+    if lxml is not None:
+        rate = time_extractor(lambda html, i: parse_inmate_page(html, i, parser="lxml"), corpus, args.repeat)
+        print(f"{'single-pass (lxml)':<28} {rate:8.1f} pages/s  ({rate / baseline:.2f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import argparse
+import collections
+import csv
+import json
+import os
+import re
+
+from charge_cache import normalize_charge
+from statute_lookup import DEFAULT_LOOKUP_FILENAME, load_table, save_table, normalize_statute, split_statutes
+
+# Proposes statute_lookup.json entries from earlier mugshot_ai_processor.py output.
+# Lines up each row's Statute, Description and AI_Description_Explanation columns, and counts how
+# often each (statute, description) pair was explained and how consistently. Pairs seen at least
+# --min-count times become candidates, written to a review file. --merge adds the candidates whose
+# most common explanation reaches --min-agreement to the lookup table and bumps its version.
+#
+# By default only procedural codes (statutes starting with a letter, like CAP-FEL) are proposed;
+# --all includes numbered statutes as well.
+#
+#   python mugshotscripts/build_statute_lookup.py --input mugshotscripts/mugshot_ai_v1.csv
+#   python mugshotscripts/build_statute_lookup.py --input mugshotscripts/mugshot_ai_v1.csv --merge
+
+PROCEDURAL_CODE = re.compile(r"^[A-Z]")
+
+def collect_explanations(paths, include_all=False):
+    """{(statute, normalized description): {"description": first spelling, "explanations": Counter}}"""
+    pairs = {}
+    for path in paths:
+        with open(path, mode="r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                descriptions = [d.strip() for d in (row.get("Description") or "").split("|")]
+                explanations = [e.strip() for e in (row.get("AI_Description_Explanation") or "").split("|")]
+                if len(descriptions) != len(explanations):
+                    continue  # Can't tell which explanation belongs to which charge
+                statutes = split_statutes(row.get("Statute"), len(descriptions))
+                for statute, description, explanation in zip(statutes, descriptions, explanations):
+                    if not statute or not description or not explanation or explanation.startswith("Error"):
+                        continue
+                    if not include_all and not PROCEDURAL_CODE.match(statute):
+                        continue
+                    pair = pairs.setdefault((statute, normalize_charge(description)),
+                                            {"description": description, "explanations": collections.Counter()})
+                    pair["explanations"][explanation] += 1
+    return pairs
+
+def build_candidates(pairs, known, min_count):
+    candidates = []
+    for (statute, description_key), pair in pairs.items():
+        count = sum(pair["explanations"].values())
+        if count < min_count or (statute, description_key) in known:
+            continue
+        explanation, votes = pair["explanations"].most_common(1)[0]
+        candidates.append({
+            "statute": statute,
+            "description": pair["description"],
+            "explanation": explanation,
+            "count": count,
+            "agreement": round(votes / count, 3),
+            "alternatives": [e for e, _ in pair["explanations"].most_common()[1:4]],
+        })
+    candidates.sort(key=lambda c: -c["count"])
+    return candidates
+
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Propose statute lookup entries from earlier AI explanations.")
+    parser.add_argument('--input', nargs='+', default=[os.path.join(script_dir, 'mugshot_ai_v1.csv')], help='CSV files with Statute, Description and AI_Description_Explanation columns. Default: mugshot_ai_v1.csv')
+    parser.add_argument('--table', default=os.path.join(script_dir, DEFAULT_LOOKUP_FILENAME), help=f'Lookup table to extend. Default: {DEFAULT_LOOKUP_FILENAME} in the script directory')
+    parser.add_argument('--output', help='Candidate review file. Default: <table>.candidates.json')
+    parser.add_argument('--min-count', type=int, default=5, help='Propose pairs explained at least this many times. Default: 5')
+    parser.add_argument('--min-agreement', type=float, default=0.6, help='With --merge, add candidates whose top explanation has at least this share. Default: 0.6')
+    parser.add_argument('--all', action='store_true', help='Include numbered statutes, not just procedural codes')
+    parser.add_argument('--merge', action='store_true', help='Add the agreed candidates to the table and bump its version')
+    args = parser.parse_args()
+
+    table = load_table(args.table)
+    known = {(normalize_statute(e["statute"]), normalize_charge(e["description"])) for e in table["entries"]}
+    pairs = collect_explanations(args.input, include_all=args.all)
+    candidates = build_candidates(pairs, known, args.min_count)
+
+    output = args.output or f"{args.table}.candidates.json"
+    with open(output, mode="w", encoding="utf-8") as f:
+        json.dump(candidates, f, indent=1)
+        f.write("\n")
+    print(f"{len(pairs)} statute/description pairs found, {len(candidates)} new candidates written to {output}")
+    for c in candidates:
+        print(f"  {c['statute']:<14} {c['count']:>5}x  {c['agreement']:.0%} agree  {c['description']} -> {c['explanation']}")
+
+    if args.merge:
+        accepted = [c for c in candidates if c["agreement"] >= args.min_agreement]
+        if not accepted:
+            print("Nothing to merge.")
+            return
+        table["entries"] += [{"statute": c["statute"], "description": c["description"], "explanation": c["explanation"]}
+                             for c in accepted]
+        table["version"] = table.get("version", 0) + 1
+        save_table(args.table, table)
+        print(f"Merged {len(accepted)} entries into {args.table} (now version {table['version']}, "
+              f"{len(table['entries'])} entries). Review the explanations before committing the table.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+# Persistent cache of AI charge explanations, shared across runs of the AI processors.
+# The same few hundred statutes make up most of the data (CRT-ORDER alone appears hundreds of
+# times), so each distinct charge only needs to be sent to the API once per model and prompt.
+#
+# Entries are keyed by (model, prompt version, normalized charge text). The prompt version is a
+# hash of the prompt text and generation settings, so editing the prompt or switching models
+# never serves a stale explanation; old entries just stop being hit and age out.
+#
+# Eviction runs when the cache is opened and closed: entries older than `max_age_days` are
+# dropped, then the least recently used ones beyond `max_entries`.
+
+DEFAULT_CACHE_FILENAME = "charge_cache.sqlite"
+DEFAULT_MAX_ENTRIES = 50000
+DEFAULT_MAX_AGE_DAYS = 180
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS explanations (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    charge TEXT NOT NULL,
+    explanation TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_explanations_last_used ON explanations (last_used_at);
+"""
+
+def normalize_charge(text):
+    """Whitespace-collapsed, case-folded charge text, so trivially different spellings share an entry."""
+    return " ".join(text.split()).casefold()
+
+def prompt_version(*parts):
+    """Short hash of everything that shapes a response: prompt text, temperature, max_tokens, ..."""
+    joined = "\x1f".join(str(part) for part in parts)
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()[:16]
+
+class ChargeCache:
+    def __init__(self, path, model, prompt_version, max_entries=DEFAULT_MAX_ENTRIES,
+                 max_age_days=DEFAULT_MAX_AGE_DAYS):
+        self.path = path
+        self.model = model
+        self.prompt_version = prompt_version
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, isolation_level=None)  # Autocommit: every put is durable at once
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.evict()
+
+    def key(self, charge):
+        return hashlib.sha256(
+            f"{self.model}\x1f{self.prompt_version}\x1f{normalize_charge(charge)}".encode("utf-8")
+        ).hexdigest()
+
+    def get(self, charge):
+        """Returns the cached explanation for `charge`, or None."""
+        key = self.key(charge)
+        row = self.conn.execute("SELECT explanation FROM explanations WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.conn.execute(
+            "UPDATE explanations SET last_used_at = ?, hits = hits + 1 WHERE key = ?", (time.time(), key)
+        )
+        return row[0]
+
+    def put(self, charge, explanation):
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO explanations "
+            "(key, model, prompt_version, charge, explanation, created_at, last_used_at, hits) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+            (self.key(charge), self.model, self.prompt_version, normalize_charge(charge), explanation, now, now),
+        )
+        self.stored += 1
+
+    def evict(self):
+        """Drops expired entries, then the least recently used beyond max_entries. Returns the count removed."""
+        removed = 0
+        if self.max_age_days:
+            cutoff = time.time() - self.max_age_days * 86400
+            removed += self.conn.execute("DELETE FROM explanations WHERE created_at < ?", (cutoff,)).rowcount
+        if self.max_entries:
+            removed += self.conn.execute(
+                "DELETE FROM explanations WHERE key IN ("
+                "SELECT key FROM explanations ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+        self.evicted += removed
+        return removed
+
+    def size(self):
+        return self.conn.execute("SELECT COUNT(*) FROM explanations").fetchone()[0]
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        hit_rate = f"{self.hits / lookups:.1%}" if lookups else "n/a"
+        return (f"{self.hits} hits, {self.misses} misses ({hit_rate} hit rate), {self.stored} stored, "
+                f"{self.evicted} evicted, {self.size()} entries in {self.path}")
+
+    def close(self):
+        self.evict()
+        self.conn.close()
@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+
+# Local, deterministic ranking of an inmate's charges by how serious / story-worthy they are.
+# Replaces the API calls that only pick one charge out of a list (the model's answer often didn't
+# match any charge verbatim, and the fallback was simply the first charge).
+#
+# All charges of all inmates are scored in one pass over a long table (one row per charge, built
+# by exploding the pipe-separated Description, Statute, Bond Amount and Bond Type columns):
+#
+#   statute      weight of the Florida statute section (782.04 murder) or chapter (784 assault and
+#                battery); procedural codes such as CRT-ORDER or CAP-FEL rank below any offence
+#   keywords     violence, weapons, sex offences, drugs ... in the description
+#   severity     felony / misdemeanor / degree markers
+#   bond         log-scaled bond amount, plus a bonus when bond was refused (Bond Type NB)
+#
+# The text features only depend on (description, statute), so they are computed once per distinct
+# pair (a few hundred, however many inmates) and broadcast back to the charges.
+#
+# Ties go to the earlier charge, so a ranking never changes between runs.
+#
+# ranked_rows() does the same for csv.DictReader rows, a chunk at a time, for the scripts that
+# stream their input instead of loading it into a DataFrame.
+
+SECTION_WEIGHTS = {
+    "782.04": 100, "782.051": 95, "782.07": 90, "794.011": 90, "787.01": 85, "806.01": 80,
+    "812.13": 75, "775.0847": 70, "827.071": 70, "847.0135": 70, "812.131": 65, "784.045": 65,
+    "784.041": 60, "784.021": 55, "784.07": 55, "790.15": 55, "893.135": 55, "784.08": 50,
+    "784.048": 45, "790.23": 45, "810.02": 45, "828.12": 45, "316.1935": 40, "316.027": 40,
+    "810.145": 40, "817.034": 40, "836.05": 40, "836.10": 40, "896.101": 40, "316.193": 35,
+    "800.03": 35, "843.01": 35, "893.13": 35, "812.019": 30, "817.568": 30, "812.014": 25,
+    "812.015": 25, "843.02": 15, "948.06": 8,
+}
+CHAPTER_WEIGHTS = {
+    "782": 90, "794": 85, "787": 75, "827": 60, "847": 60, "777": 40, "784": 40, "790": 40,
+    "806": 40, "836": 35, "828": 35, "896": 35, "893": 30, "741": 30, "775": 30, "655": 30,
+    "800": 30, "914": 30, "812": 25, "810": 25, "817": 25, "918": 25, "831": 20, "539": 15,
+    "843": 15, "933": 15, "870": 12, "316": 10, "877": 10, "901": 10, "322": 8, "948": 8, "125": 5,
+}
+UNKNOWN_STATUTE_WEIGHT = 20  # A numbered statute not in the tables: a real offence of unknown weight
+PROCEDURAL_WEIGHT = -20  # Warrants, holds, court orders, probation violations: chosen only when nothing else is listed
+
+KEYWORD_WEIGHTS = [
+    (r"MURDER|HOMICIDE", 40),
+    (r"MANSLAUGHTER|KIDNAP", 35),
+    (r"SEX(?:UAL)? ?(?:BATT|ASLT|ASSAULT)|RAPE", 30),
+    (r"ROBBERY|ARSON|CARJACK", 25),
+    (r"FIREARM|\bGUN\b|DEADLY WEAP|\bARMED\b|STRANGULATION|DEATH", 20),
+    (r"CHILD|MINOR|TRAFFICK", 15),
+    (r"\bAGG|BATTERY|ASSAULT|ELUDE|\bFLEE|STALK|EXTORTION", 10),
+    (r"THREAT|COCAINE|HEROIN|FENTANYL|METH|ANIMAL|VOYEUR", 8),
+    (r"FRAUD|OFFICER|EXPOSURE|BURG", 5),
+]
+SEVERITY_WEIGHTS = [
+    (r"\bFEL(?:ONY)?\b|\bF[123]\b|LIFE FELONY", 8),
+    (r"1ST DEG", 6),
+    (r"2ND DEG", 3),
+    (r"\bMISD", -4),
+]
+NO_BOND_WEIGHT = 10
+BOND_SCALE = 4  # Points per factor of ten in the bond amount
+BOND_CAP = 25
+
+def charge_frame(df):
+    """
+    One row per non-empty charge: row (0-based position of the inmate in df), position (index in
+    the pipe-separated Description), charge_index (index among the non-empty charges), description,
+    statute, bond and bond_type. Columns that don't line up with Description are left as None.
+    """
+    descriptions = df["Description"].fillna("").astype(str).str.split("|")
+    counts = descriptions.str.len()
+    blanks = counts.map(lambda n: [None] * n)
+
+    def aligned(column):
+        if column not in df.columns:
+            return blanks
+        parts = df[column].fillna("").astype(str).str.split("|")
+        return parts.where(parts.str.len() == counts, blanks)
+
+    columns = ["description", "statute", "bond", "bond_type"]
+    charges = pd.DataFrame({
+        "row": np.arange(len(df)),
+        "description": descriptions.to_numpy(),
+        "statute": aligned("Statute").to_numpy(),
+        "bond": aligned("Bond Amount").to_numpy(),
+        "bond_type": aligned("Bond Type").to_numpy(),
+    }).explode(columns, ignore_index=True)
+    charges["position"] = charges.groupby("row").cumcount()
+    for column in columns:
+        charges[column] = charges[column].fillna("").astype(str).str.strip()
+    charges = charges[charges["description"] != ""].reset_index(drop=True)
+    charges["charge_index"] = charges.groupby("row").cumcount()
+    return charges
+
+def text_scores(descriptions, statutes):
+    """Statute, keyword and severity points for aligned Series of descriptions and statute codes."""
+    statute = statutes.str.upper()
+    description = descriptions.str.upper()
+    text = description + " " + statute
+
+    section = statute.str.extract(r"^(\d+\.\d+)", expand=False)
+    chapter = statute.str.extract(r"^(\d+)", expand=False)
+    procedural = statute.str.match(r"^[A-Z]")
+    score = (section.map(SECTION_WEIGHTS)
+             .fillna(chapter.map(CHAPTER_WEIGHTS))
+             .fillna(chapter.notna() * UNKNOWN_STATUTE_WEIGHT)
+             .astype(float))
+    score += procedural * PROCEDURAL_WEIGHT
+    for pattern, weight in KEYWORD_WEIGHTS:
+        score += description.str.contains(pattern, regex=True) * weight
+    for pattern, weight in SEVERITY_WEIGHTS:
+        score += text.str.contains(pattern, regex=True) * weight
+    return score
+
+def score_charges(charges):
+    """Severity score for every row of a charge_frame."""
+    codes, pairs = pd.factorize(charges["description"] + "\x1f" + charges["statute"])
+    pairs = pd.Series(pairs).str.split("\x1f", n=1, expand=True)
+    score = text_scores(pairs[0], pairs[1]).to_numpy()[codes]
+
+    bond = pd.to_numeric(charges["bond"].str.replace(r"[$,\s]", "", regex=True), errors="coerce").fillna(0)
+    score = score + np.minimum(np.log10(1 + bond.clip(lower=0)) * BOND_SCALE, BOND_CAP)
+    score += (charges["bond_type"].str.upper() == "NB") * NO_BOND_WEIGHT
+    return score
+
+def rank_charges(df):
+    """charge_frame(df) with a score and a rank within each inmate (0 = most interesting)."""
+    charges = charge_frame(df)
+    charges["score"] = score_charges(charges)
+    charges = charges.sort_values(["row", "score", "position"], ascending=[True, False, True], kind="stable")
+    charges["rank"] = charges.groupby("row").cumcount()
+    return charges
+
+def top_charges(df, n=None, by="charge_index"):
+    """
+    For every row of df, the `by` values (charge_index, position or description) of its best
+    `n` charges (all when n is None), best first. Rows without charges get an empty list.
+    """
+    charges = rank_charges(df)
+    if n is not None:
+        charges = charges[charges["rank"] < n]
+    grouped = charges.groupby("row")[by].agg(list).reindex(range(len(df)))
+    return pd.Series([best if isinstance(best, list) else [] for best in grouped], index=df.index)
+
+def most_interesting_charges(df):
+    """The description of every inmate's highest-ranked charge, or None when it has no charges."""
+    charges = rank_charges(df)
+    best = charges[charges["rank"] == 0].set_index("row")["description"].reindex(range(len(df)))
+    return pd.Series(best.to_numpy(), index=df.index).where(best.notna().to_numpy(), None)
+
+def ranked_rows(rows, chunksize=1000):
+    """
+    Yields (row, position of its most interesting charge or None) for an iterable of csv.DictReader
+    rows, ranking them a chunk at a time so a large file is never held in memory.
+    """
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunksize:
+            yield from _rank_chunk(chunk)
+            chunk = []
+    if chunk:
+        yield from _rank_chunk(chunk)
+
+def _rank_chunk(chunk):
+    df = pd.DataFrame(chunk, columns=["Description", "Statute", "Bond Amount", "Bond Type"]).fillna("")
+    for row, best in zip(chunk, top_charges(df, 1, by="position")):
+        yield row, (int(best[0]) if best else None)
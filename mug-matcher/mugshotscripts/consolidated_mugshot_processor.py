@@ -1,18 +1,32 @@
+import numpy as np
 import pandas as pd
 from openai import OpenAI
 import os
 import csv
+import itertools
+import json
+import re
 from dotenv import load_dotenv
 import time
 import datetime
 import argparse
 import sys
 import pkg_resources
+from batch_jobs import BatchJob, OpenAIBatchTransport, LocalBatchTransport, custom_id_for, TERMINAL_STATUSES
+from openai_retry import CircuitBreaker, call_with_retries, DEFAULT_RETRIES
+from charge_ranker import rank_charges
+from run_ledger import RunLedger
+from record_index import CheckpointLog, load_index, reused_values
 
 # --- Globals ---
 DEFAULT_MODEL = "gpt-4.1-mini" # Using gpt-4.1-mini as it's a good balance
 current_model_global = DEFAULT_MODEL
 client_global = None
+api_calls_global = 0
+tokens_used_global = 0
+rank_top_global = 0  # --rank-top: send only this many locally ranked charges per inmate (0 = all)
+# Tokens, latency and retries of every call (run_ledger.py); written next to the output CSV
+run_ledger_global = RunLedger(os.path.basename(__file__), DEFAULT_MODEL)
 
 # --- Helper Functions ---
 def log_message(message):
@@ -20,6 +34,8 @@ def log_message(message):
     timestamp = datetime.datetime.now().strftime("%H:%M:%S.%f")[:-3]
     print(f"[{timestamp}] {message}")
 
+api_breaker = CircuitBreaker(log=log_message)  # Shared by every API call in the run
+
 def check_required_packages():
     """Checks if required Python packages are installed."""
     required = {
@@ -56,7 +72,7 @@ def initialize_openai_client():
         log_message("Please ensure an API key is available.")
         sys.exit(1)
     
-    client_global = OpenAI(api_key=api_key)
+    client_global = OpenAI(api_key=api_key, max_retries=0)  # call_openai_api does the retrying
     log_message("OpenAI client initialized successfully.")
     # Verify model access
     try:
@@ -69,16 +85,24 @@ def initialize_openai_client():
         sys.exit(1)
 
 # --- OpenAI API Call Function ---
-def call_openai_api(messages, max_tokens=150, temperature=0.3, timeout=45):
+def call_openai_api(messages, max_tokens=150, temperature=0.3, timeout=45, purpose="chat"):
     """
     Helper function to call OpenAI Chat Completions API with error handling and retries.
-    Uses global client_global and current_model_global.
+    Uses global client_global and current_model_global. Retries, backoff and the shared
+    circuit breaker come from openai_retry. `purpose` labels the call in the run ledger.
     """
-    retries = 3
-    for attempt in range(retries):
+    retries = DEFAULT_RETRIES
+    attempts = 0
+    request_seconds = 0.0
+
+    def send(attempt):
+        global api_calls_global, tokens_used_global
+        nonlocal attempts, request_seconds
+        log_message(f"Calling OpenAI API (model: {current_model_global}, attempt {attempt + 1}/{retries}, timeout: {timeout}s)...")
+        start_time = time.time()
+        api_calls_global += 1
+        attempts += 1
         try:
-            log_message(f"Calling OpenAI API (model: {current_model_global}, attempt {attempt + 1}/{retries}, timeout: {timeout}s)...")
-            start_time = time.time()
             response = client_global.chat.completions.create(
                 model=current_model_global,
                 messages=messages,
@@ -86,78 +110,100 @@ def call_openai_api(messages, max_tokens=150, temperature=0.3, timeout=45):
                 temperature=temperature,
                 timeout=timeout
             )
+        finally:
             elapsed = time.time() - start_time
-            log_message(f"API call successful in {elapsed:.2f} seconds.")
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            log_message(f"OpenAI API error (attempt {attempt + 1}/{retries}): {str(e)}")
-            if "RateLimitError" in str(e) or "APIConnectionError" in str(e) or "Timeout" in str(e) or "APIError" in str(e) or "InternalServerError" in str(e): # Specific errors for retry
-                if attempt < retries - 1:
-                    sleep_time = (2 ** attempt) + (0.5 * attempt) # Exponential backoff with jitter
-                    log_message(f"Retrying in {sleep_time:.2f} seconds...")
-                    time.sleep(sleep_time)
-                else:
-                    log_message("Max retries reached for API call. Returning error.")
-                    return f"Error: API call failed after {retries} attempts due to: {type(e).__name__}."
-            else: # Non-retryable error
-                log_message(f"Non-retryable API error: {type(e).__name__}. Returning error.")
-                return f"Error: API call failed due to: {type(e).__name__}."
-    return f"Error: API call failed after {retries} attempts." # Should be caught by else above
+            request_seconds += elapsed
+        if getattr(response, "usage", None):
+            tokens_used_global += response.usage.total_tokens
+        log_message(f"API call successful in {elapsed:.2f} seconds.")
+        run_ledger_global.record_call(purpose, getattr(response, "usage", None), request_seconds, attempts)
+        return response.choices[0].message.content.strip()
+
+    try:
+        return call_with_retries(send, api_breaker, retries, log_message)
+    except Exception as e:
+        log_message("API call failed. Returning error.")
+        run_ledger_global.record_call(purpose, None, request_seconds, attempts, ok=False)
+        return f"Error: API call failed due to: {type(e).__name__}."
 
 # --- AI Processing Functions ---
-def get_consolidated_plain_english_best_crime(raw_charge_list, inmate_name=None):
+BEST_CRIME_MAX_TOKENS = 120
+BEST_CRIME_TEMPERATURE = 0.25
+
+BEST_CRIME_SYSTEM_PROMPT = (
+    "You are an expert legal analyst and a creative writer for a crime-themed game. "
+    "Your task is to summarize complex criminal charges into clear, concise, and impactful plain English that would be engaging for players. "
+    "You will be given one or more raw charge descriptions for a single individual.\n\n"
+    "Your primary goal is to select *up to two* of the most 'exciting', 'unusual', or 'story-worthy' charges for a game context. "
+    "Prioritize charges that describe specific actions, especially those involving harm, significant illicit goods, or dramatic events, over procedural violations or less descriptive offenses.\n\n"
+    "Follow these steps:\n"
+    "1. Review all provided charge(s) for the individual.\n"
+    "2. Identify one or, if applicable and distinct enough, two charges that best fit the 'exciting/unusual/story-worthy' criteria. Do not select more than two. For example:\n"
+    "   - Prefer charges like 'Battery', 'Robbery', 'Grand Theft', 'Drug Trafficking/Possession with large quantities' over 'Probation Violation', 'Failure to Appear', or generic 'Disorderly Conduct' unless the latter are directly linked to a more severe unlisted crime.\n"
+    "   - If multiple action-based charges exist, pick the one or two that sound most distinct or severe.\n"
+    "3. Rewrite *each selected charge* into a brief, plain English phrase (ideally under 10-15 words per charge, max 20). Make them sound impactful for a game. "
+    "   **If the raw charge includes specific quantities (like drug amounts, monetary values, or age ranges) that are key to its severity or nature, try to incorporate a summarized version of that quantity into your plain English phrase if it enhances the impact (e.g., 'Possession of 20+ Grams of Cannabis', 'Theft Over $1000').** However, do not force numbers if they make the description clunky or are not central to its game-worthy appeal.\n"
+    "4. If you selected two charges, join the two rephrased descriptions with a ' | ' delimiter. If you selected only one, return just that single rephrased description.\n"
+    "5. Return *only* the resulting plain English phrase(s). Do not include explanations, disclaimers, numbering, or any other text.\n\n"
+    "Examples of desired output format (raw input list -> your chosen and rephrased output):\n"
+    "- ['AGG STALKING AFTER INJUCTION'] -> Repeated Aggressive Stalking\n"
+    "- ['(COC) TO ATTEMPTED MURDER LEO/FIREARM'] -> Shot at Law Enforcement\n"
+    "- ['SEX BATT FAML/CUST VICT12-17', 'KIDNAPPING OF MINOR'] -> Sexual Battery on a Minor | Kidnapping a Minor\n"
+    "- ['POSS OF CONTROLLED SUBSTANCE W/O PRESCRIPTION', 'RESIST OFFICER W/O VIOLENCE'] -> Illegal Drug Possession\n"
+    "- ['BATTERY-CAUSE BODILY HARM- DATING VIOLENCE', 'POSSESS CANNABIS OVR 20 GRMS/SYNTH CANN OVR 3 GRMS', 'PROBATION VIOLATION OR COMMUNITY CONTROL/FELONY'] -> Dating Violence Battery | Cannabis Over 20g\n"
+    "- ['MONEY LAUNDERING OVER $100,000'] -> Money Laundering Over $100K\n"
+    "- ['POSS OF MARIJUANA UNDER 20 GRAMS'] -> Marijuana Possession (Under 20g)\n"
+    "- ['FAILURE TO APPEAR - MISDEMEANOR', 'GRAND THEFT - MOTOR VEHICLE', 'BURGLARY OF CONVEYANCE'] -> Grand Theft Auto | Vehicle Burglary"
+)
+
+# Packing mode (--pack N): several inmates per request, answered as a JSON array
+PACKED_INSTRUCTIONS = (
+    "\n\nYou will be given several individuals at once, each introduced by its InmateID. "
+    "Apply the steps above to each individual separately, using only that individual's charges. "
+    "Return *only* a JSON array with one object per individual, in the order given, of the form "
+    '[{"InmateID": 123, "Best_Crime": "Phrase | Phrase"}]. Do not wrap it in code fences or add any other text.'
+)
+PACKED_TOKENS_PER_INMATE = BEST_CRIME_MAX_TOKENS + 15  # One answer's budget plus the JSON keys around it
+
+# If only one charge, the prompt needs to be clear it should still rephrase it.
+SINGLE_CHARGE_INTRO = "Here is the raw charge description for an individual:"
+CHARGE_LIST_INTRO = "Here is a list of raw charge descriptions for an individual:"
+BEST_CRIME_REQUEST = "\n\nPlease provide the rephrased plain English summary for up to two of the most significant charges, delimited by ' | ' if two are selected."
+
+def build_best_crime_messages(raw_charge_list=None, user_prompt=None):
+    """
+    Builds the chat messages for get_consolidated_plain_english_best_crime (also used for batch job files),
+    from a charge list or from a user prompt already built by best_crime_prompts.
+    """
+    if user_prompt is None:
+        # Prepare the charge list for the prompt
+        if len(raw_charge_list) == 1:
+            charge_list_str_for_prompt = raw_charge_list[0]
+            instruction_intro = SINGLE_CHARGE_INTRO
+        else:
+            charge_list_str_for_prompt = "\n".join([f"{i + 1}. {charge}" for i, charge in enumerate(raw_charge_list)])
+            instruction_intro = CHARGE_LIST_INTRO
+        user_prompt = f"{instruction_intro}\n{charge_list_str_for_prompt}{BEST_CRIME_REQUEST}"
+
+    return [
+        {"role": "system", "content": BEST_CRIME_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+
+def get_consolidated_plain_english_best_crime(raw_charge_list, inmate_name=None, user_prompt=None):
     """
     Analyzes a list of raw charges, selects the most significant one, 
     and rewords it into a concise, plain English summary.
     Input inmate_name is optional and currently not used in the prompt but available for future enhancements.
+    `user_prompt` is the prompt for raw_charge_list when it was already built by best_crime_prompts.
     """
     if not raw_charge_list:
         log_message("  No raw charges provided to get_consolidated_plain_english_best_crime.")
         return "No charges to analyze"
 
-    # Prepare the charge list for the prompt
-    if len(raw_charge_list) == 1:
-        charge_list_str_for_prompt = raw_charge_list[0]
-        # If only one charge, the prompt needs to be clear it should still rephrase it.
-        instruction_intro = "Here is the raw charge description for an individual:"
-    else:
-        charge_list_str_for_prompt = "\n".join([f"{i + 1}. {charge}" for i, charge in enumerate(raw_charge_list)])
-        instruction_intro = "Here is a list of raw charge descriptions for an individual:"
-
-    system_prompt = (
-        "You are an expert legal analyst and a creative writer for a crime-themed game. "
-        "Your task is to summarize complex criminal charges into clear, concise, and impactful plain English that would be engaging for players. "
-        "You will be given one or more raw charge descriptions for a single individual.\n\n"
-        "Your primary goal is to select *up to two* of the most 'exciting', 'unusual', or 'story-worthy' charges for a game context. "
-        "Prioritize charges that describe specific actions, especially those involving harm, significant illicit goods, or dramatic events, over procedural violations or less descriptive offenses.\n\n"
-        "Follow these steps:\n"
-        "1. Review all provided charge(s) for the individual.\n"
-        "2. Identify one or, if applicable and distinct enough, two charges that best fit the 'exciting/unusual/story-worthy' criteria. Do not select more than two. For example:\n"
-        "   - Prefer charges like 'Battery', 'Robbery', 'Grand Theft', 'Drug Trafficking/Possession with large quantities' over 'Probation Violation', 'Failure to Appear', or generic 'Disorderly Conduct' unless the latter are directly linked to a more severe unlisted crime.\n"
-        "   - If multiple action-based charges exist, pick the one or two that sound most distinct or severe.\n"
-        "3. Rewrite *each selected charge* into a brief, plain English phrase (ideally under 10-15 words per charge, max 20). Make them sound impactful for a game. "
-        "   **If the raw charge includes specific quantities (like drug amounts, monetary values, or age ranges) that are key to its severity or nature, try to incorporate a summarized version of that quantity into your plain English phrase if it enhances the impact (e.g., 'Possession of 20+ Grams of Cannabis', 'Theft Over $1000').** However, do not force numbers if they make the description clunky or are not central to its game-worthy appeal.\n"
-        "4. If you selected two charges, join the two rephrased descriptions with a ' | ' delimiter. If you selected only one, return just that single rephrased description.\n"
-        "5. Return *only* the resulting plain English phrase(s). Do not include explanations, disclaimers, numbering, or any other text.\n\n"
-        "Examples of desired output format (raw input list -> your chosen and rephrased output):\n"
-        "- ['AGG STALKING AFTER INJUCTION'] -> Repeated Aggressive Stalking\n"
-        "- ['(COC) TO ATTEMPTED MURDER LEO/FIREARM'] -> Shot at Law Enforcement\n"
-        "- ['SEX BATT FAML/CUST VICT12-17', 'KIDNAPPING OF MINOR'] -> Sexual Battery on a Minor | Kidnapping a Minor\n"
-        "- ['POSS OF CONTROLLED SUBSTANCE W/O PRESCRIPTION', 'RESIST OFFICER W/O VIOLENCE'] -> Illegal Drug Possession\n"
-        "- ['BATTERY-CAUSE BODILY HARM- DATING VIOLENCE', 'POSSESS CANNABIS OVR 20 GRMS/SYNTH CANN OVR 3 GRMS', 'PROBATION VIOLATION OR COMMUNITY CONTROL/FELONY'] -> Dating Violence Battery | Cannabis Over 20g\n"
-        "- ['MONEY LAUNDERING OVER $100,000'] -> Money Laundering Over $100K\n"
-        "- ['POSS OF MARIJUANA UNDER 20 GRAMS'] -> Marijuana Possession (Under 20g)\n"
-        "- ['FAILURE TO APPEAR - MISDEMEANOR', 'GRAND THEFT - MOTOR VEHICLE', 'BURGLARY OF CONVEYANCE'] -> Grand Theft Auto | Vehicle Burglary"
-    )
-
-    user_prompt = f"{instruction_intro}\n{charge_list_str_for_prompt}\n\nPlease provide the rephrased plain English summary for up to two of the most significant charges, delimited by ' | ' if two are selected."
-
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": user_prompt}
-    ]
-    
-    selected_and_rephrased_charge = call_openai_api(messages, max_tokens=120, temperature=0.25)
+    messages = build_best_crime_messages(raw_charge_list, user_prompt)
+    selected_and_rephrased_charge = call_openai_api(messages, max_tokens=BEST_CRIME_MAX_TOKENS, temperature=BEST_CRIME_TEMPERATURE,
+                                                    purpose="best_crime")
 
     if selected_and_rephrased_charge.startswith("Error:"):
         log_message(f"  API call failed for consolidating best crime. Fallback needed.")
@@ -166,7 +212,7 @@ def get_consolidated_plain_english_best_crime(raw_charge_list, inmate_name=None)
             first_charge_reword_attempt = call_openai_api([
                 {"role": "system", "content": "Rewrite the following charge into simple plain English (max 15 words). Example: AGG BATTERY -> Aggravated Battery."},
                 {"role": "user", "content": raw_charge_list[0]}
-            ], max_tokens=30, temperature=0.1)
+            ], max_tokens=30, temperature=0.1, purpose="fallback_reword")
             if not first_charge_reword_attempt.startswith("Error:"):
                 return first_charge_reword_attempt
         return "Could not determine best crime"
@@ -175,78 +221,320 @@ def get_consolidated_plain_english_best_crime(raw_charge_list, inmate_name=None)
     # The prompt strongly guides it, so we trust the output unless it's an API error.
     return selected_and_rephrased_charge
 
+def build_packed_best_crime_messages(packed_items):
+    """Builds one request for several inmates. packed_items: [(InmateID, combined charge details list)]."""
+    sections = []
+    for inmate_id, raw_charge_list in packed_items:
+        charge_lines = "\n".join([f"{i + 1}. {charge}" for i, charge in enumerate(raw_charge_list)])
+        sections.append(f"InmateID {inmate_id}:\n{charge_lines}")
+    user_prompt = (
+        "Here are the raw charge descriptions for several individuals:\n\n" + "\n\n".join(sections) +
+        "\n\nFor each individual, provide the rephrased plain English summary for up to two of the most significant charges, "
+        "delimited by ' | ' if two are selected, as a JSON array of {\"InmateID\", \"Best_Crime\"} objects."
+    )
+    return [
+        {"role": "system", "content": BEST_CRIME_SYSTEM_PROMPT + PACKED_INSTRUCTIONS},
+        {"role": "user", "content": user_prompt}
+    ]
+
+def parse_packed_response(response_text, expected_ids):
+    """
+    Extracts {InmateID: Best_Crime} from a packed response. Entries that are missing, malformed,
+    empty or for an unexpected InmateID are left out, so the caller can retry just those inmates.
+    """
+    text = response_text.strip()
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text)  # Tolerate code fences despite the instructions
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end < start:
+        return {}
+    try:
+        entries = json.loads(text[start:end + 1])
+    except ValueError:
+        return {}
+    results = {}
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            inmate_id = int(entry.get("InmateID"))
+        except (TypeError, ValueError):
+            continue
+        best_crime = entry.get("Best_Crime")
+        if inmate_id in expected_ids and isinstance(best_crime, str) and best_crime.strip():
+            results[inmate_id] = best_crime.strip()
+    return results
+
+def get_packed_best_crimes(packed_items):
+    """
+    Gets Best_Crime for several inmates with one API call. Inmates whose part of the response
+    is missing or unusable are retried individually. Returns {InmateID: Best_Crime}.
+    """
+    expected_ids = {inmate_id for inmate_id, _ in packed_items}
+    response_text = call_openai_api(
+        build_packed_best_crime_messages(packed_items),
+        max_tokens=PACKED_TOKENS_PER_INMATE * len(packed_items),
+        temperature=BEST_CRIME_TEMPERATURE,
+        timeout=90,
+        purpose="best_crime_packed"
+    )
+    results = {} if response_text.startswith("Error:") else parse_packed_response(response_text, expected_ids)
+    missing = [(inmate_id, details) for inmate_id, details in packed_items if inmate_id not in results]
+    if missing:
+        log_message(f"  Packed response covered {len(results)}/{len(packed_items)} inmates; retrying {len(missing)} individually.")
+        for inmate_id, details in missing:
+            results[inmate_id] = get_consolidated_plain_english_best_crime(details)
+    return results
+
+def process_inmate_data_packed(df, pack_size, output_column_name="Best_Crime"):
+    """
+    process_inmate_data with --pack: sends the combined charge details of `pack_size` inmates per request.
+    """
+    total_rows = len(df)
+    log_message(f"Starting processing of {total_rows} inmates for 'Best_Crime', {pack_size} inmates per request...")
+
+    # An InmateID can appear twice in the CSV; such rows go in separate packs so the JSON keys stay unique
+    packs = []
+    current = []
+    best_crimes = pd.Series("No charge descriptions listed", index=df.index, dtype=object)
+    for index, inmate_id, combined_charge_details_list in zip(df.index, df['InmateID'], prepare_charges(df)['details']):
+        if not combined_charge_details_list:
+            continue
+        inmate_id = int(inmate_id)
+        if len(current) == pack_size or any(inmate_id == item[1] for item in current):
+            packs.append(current)
+            current = []
+        current.append((index, inmate_id, combined_charge_details_list))
+    if current:
+        packs.append(current)
+
+    for n, pack in enumerate(packs, start=1):
+        log_message(f"Processing pack {n}/{len(packs)}: InmateIDs {', '.join(str(item[1]) for item in pack)}")
+        results = get_packed_best_crimes([(inmate_id, details) for _, inmate_id, details in pack])
+        for index, inmate_id, _ in pack:
+            best_crimes[index] = results[inmate_id]
+
+    df[output_column_name] = best_crimes
+    log_message(f"Finished processing {total_rows} inmates for 'Best_Crime'.")
+    return df
+
+# --- Charge Table ---
+def exploded_parts(df, column):
+    """
+    The non-empty, stripped pipe-separated parts of `column`, one per table row: row (0-based
+    position of the inmate in df), part (index among that inmate's non-empty parts) and text.
+    """
+    values = df[column].to_numpy(dtype=object) if column in df.columns else np.full(len(df), "", dtype=object)
+    # Cells repeat across inmates (statute lists, common charges), so each distinct cell is split once.
+    # str() of each value, as the charge lists have always been built (a missing value reads "nan").
+    cell_codes, cells = pd.factorize(np.array([str(value) for value in values], dtype=object))
+    split_cells = [[part.strip() for part in cell.split('|')] for cell in cells]
+    cell_parts = pd.DataFrame({
+        "cell": np.repeat(np.arange(len(cells)), [len(parts) for parts in split_cells]).astype(np.int64),
+        "text": np.array(list(itertools.chain.from_iterable(split_cells)), dtype=object),
+    })
+    cell_parts = cell_parts[cell_parts["text"] != ""]
+    cell_parts["part"] = cell_parts.groupby("cell").cumcount()
+    inmates = pd.DataFrame({"row": np.arange(len(df), dtype=np.int64), "cell": cell_codes.astype(np.int64)})
+    parts = inmates.merge(cell_parts, on="cell")[["row", "part", "text"]]
+    # Before pandas 2.2 an inner merge groups its output by key instead of keeping the left order
+    return parts.sort_values(["row", "part"], kind="stable", ignore_index=True)
+
+def combined_charge_detail(description, statute, comments):
+    """One charge as sent to the model: the description, plus statute and comments when they add information."""
+    charge_parts = [f"Charge: {description}"]
+    if statute and statute.upper() != description.upper() and not statute.isdigit() and statute not in description:
+        charge_parts.append(f"Statute Ref: {statute}")
+    if comments and comments.upper() != description.upper() and comments not in description:
+        charge_parts.append(f"Details/Comments: {comments}")
+    return ", ".join(charge_parts)
+
+def charge_table(df):
+    """
+    One row per charge of every inmate in df, built in one pass: row (0-based position of the
+    inmate), charge_index, description, statute, comments and detail (combined_charge_detail).
+    Statutes and comments are paired with descriptions by their position among the non-empty
+    parts of each column. With --rank-top N only each inmate's N charges ranked highest by
+    charge_ranker are kept, still in their original order.
+    """
+    charges = exploded_parts(df, 'Description').rename(columns={"part": "charge_index", "text": "description"})
+    for column, name in [('Statute', "statute"), ('Charge Comments', "comments")]:
+        parts = exploded_parts(df, column).rename(columns={"part": "charge_index", "text": name})
+        charges = charges.merge(parts, on=["row", "charge_index"], how="left")
+        charges[name] = charges[name].astype(object).fillna("")
+
+    # Details only depend on (description, statute, comments), so they are built once per distinct triple
+    codes = charges.groupby(["description", "statute", "comments"], sort=False).ngroup().to_numpy()
+    first = charges.iloc[np.unique(codes, return_index=True)[1]]
+    details = np.array([combined_charge_detail(*triple) for triple in
+                        zip(first["description"], first["statute"], first["comments"])], dtype=object)
+    charges["detail"] = details[codes]
+
+    if rank_top_global > 0 and len(charges):
+        ranked = rank_charges(df)
+        keep = ranked.loc[ranked["rank"] < rank_top_global, ["row", "charge_index"]]
+        charges = charges.merge(keep, on=["row", "charge_index"])
+    # prepare_charges slices the table per inmate, so it must stay sorted by row whatever the merges did
+    return charges.sort_values(["row", "charge_index"], kind="stable", ignore_index=True)
+
+def prepare_charges(df):
+    """
+    The per-inmate inputs of every request, aligned with df: details (the list of combined charge
+    details, [] when the inmate has no charges) and prompt (the best-crime user prompt, or None).
+    """
+    charges = charge_table(df)
+    rows = charges["row"].to_numpy()
+    bounds = np.searchsorted(rows, np.arange(len(df) + 1))
+    details = charges["detail"].to_numpy(dtype=object)
+
+    # Prompt lines for every charge at once: numbered unless the inmate has a single charge
+    start, end = bounds[rows], bounds[rows + 1]
+    numbers = (np.arange(len(rows)) - start + 1).astype(str).astype(object)
+    lines = np.where(end - start == 1, details, numbers + ". " + details)
+
+    details_by_row = []
+    prompts = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        details_by_row.append(details[start:end].tolist())
+        if end == start:
+            prompts.append(None)
+        else:
+            intro = SINGLE_CHARGE_INTRO if end - start == 1 else CHARGE_LIST_INTRO
+            prompts.append(f"{intro}\n" + "\n".join(lines[start:end]) + BEST_CRIME_REQUEST)
+    # object dtype keeps the missing prompts None (pandas 3 would otherwise infer str and store NaN)
+    return pd.DataFrame({"details": details_by_row, "prompt": prompts}, index=df.index, dtype=object)
+
 # --- Main Processing Function ---
 def process_inmate_data(df, output_column_name="Best_Crime"):
     """
     Processes the DataFrame to add the 'Best_Crime' column using the consolidated AI call.
-    Assumes 'Description' column exists for raw charges.
+    Assumes 'Description' column exists for raw charges. Charge details and prompts for all
+    inmates are built up front (prepare_charges), so the loop only makes the API calls.
     """
-    log_message("Initializing 'Best_Crime' column...")
-    df[output_column_name] = None 
-
     total_rows = len(df)
     log_message(f"Starting processing of {total_rows} inmates for 'Best_Crime'...")
 
-    for index, row in df.iterrows():
-        log_message(f"Processing inmate {index + 1}/{total_rows}, ID: {row.get('InmateID', 'N/A')}, Name: {row.get('Name', 'N/A')}")
-        
-        # --- Enhanced Charge Detail Extraction ---
-        raw_descriptions_str = str(row.get('Description', ''))
-        raw_statutes_str = str(row.get('Statute', ''))
-        raw_comments_str = str(row.get('Charge Comments', ''))
-
-        descriptions = [d.strip() for d in raw_descriptions_str.split('|') if d.strip()]
-        # If descriptions is empty, there's nothing to process for this row regarding charges
-        if not descriptions:
+    prepared = prepare_charges(df)
+    names = df['Name'] if 'Name' in df.columns else pd.Series('N/A', index=df.index)
+    best_crimes = []
+    for n, (inmate_id, name, combined_charge_details_list, user_prompt) in enumerate(
+            zip(df['InmateID'], names, prepared['details'], prepared['prompt']), start=1):
+        log_message(f"Processing inmate {n}/{total_rows}, ID: {inmate_id}, Name: {name}")
+
+        # If there are no descriptions, there's nothing to process for this row regarding charges
+        if not combined_charge_details_list:
             log_message("  No charge descriptions found for this inmate. Skipping AI processing.")
-            df.loc[index, output_column_name] = "No charge descriptions listed"
+            best_crimes.append("No charge descriptions listed")
             continue
-            
-        statutes = [s.strip() for s in raw_statutes_str.split('|') if s.strip()]
-        comments = [c.strip() for c in raw_comments_str.split('|') if c.strip()]
-        
-        num_charge_components = len(descriptions) # Base number of charges on descriptions
-        
-        combined_charge_details_list = []
-        for i in range(num_charge_components):
-            charge_parts = []
-            current_desc = descriptions[i]
-            charge_parts.append(f"Charge: {current_desc}") # Start with the main description
-
-            # Add statute if available and non-trivial
-            if i < len(statutes) and statutes[i] and statutes[i].upper() != current_desc.upper() and not statutes[i].isdigit() and statutes[i] not in current_desc:
-                charge_parts.append(f"Statute Ref: {statutes[i]}")
-            
-            # Add comments if available and non-trivial
-            if i < len(comments) and comments[i] and comments[i].upper() != current_desc.upper() and comments[i] not in current_desc:
-                charge_parts.append(f"Details/Comments: {comments[i]}")
-            
-            combined_charge_details_list.append(", ".join(charge_parts))
-        
-        best_crime_for_row = "No charges to process" # Default if list ends up empty
 
-        if not combined_charge_details_list:
-            log_message("  No processable combined charge details constructed. Skipping AI processing.")
-            best_crime_for_row = "No valid charge details found"
-        else:
-            log_message(f'  Processing {len(combined_charge_details_list)} combined charge detail(s) for this inmate: "{str(combined_charge_details_list)[:250]}..."')
-            # Call the AI function with the new list of combined details
-            best_crime_for_row = get_consolidated_plain_english_best_crime(combined_charge_details_list, row.get('Name', 'N/A'))
-            log_message(f'  Consolidated Best Crime: "{best_crime_for_row}"')
-        
-        df.loc[index, output_column_name] = best_crime_for_row
-        
-        # Optional: A small delay can be good for very long processing jobs with many API calls,
-        # but call_openai_api already has some delay for retries.
-        # Consider if overall processing time vs API call frequency warrants an additional fixed delay here.
-        # time.sleep(0.1) # Example: Short delay if needed
+        log_message(f'  Processing {len(combined_charge_details_list)} combined charge detail(s) for this inmate: "{str(combined_charge_details_list)[:250]}..."')
+        best_crime_for_row = get_consolidated_plain_english_best_crime(combined_charge_details_list, name, user_prompt)
+        log_message(f'  Consolidated Best Crime: "{best_crime_for_row}"')
+        best_crimes.append(best_crime_for_row)
 
+    df[output_column_name] = best_crimes
     log_message(f"Finished processing {total_rows} inmates for 'Best_Crime'.")
     return df
 
+def run_processing(df, pack_size):
+    if pack_size > 1:
+        return process_inmate_data_packed(df, pack_size)
+    return process_inmate_data(df)
+
+# --- Batch Mode ---
+def build_batch_requests(df, reused=None):
+    """
+    Returns one entry per row: (custom_id, request body) for rows with charges,
+    or (None, placeholder Best_Crime) for rows without. Rows with a value in `reused`
+    (--incremental) get (None, that value) and no request.
+    """
+    entries = []
+    prepared = prepare_charges(df)
+    for index, inmate_id, combined_charge_details_list, user_prompt in zip(df.index, df['InmateID'], prepared['details'], prepared['prompt']):
+        if reused is not None and reused[index] is not None:
+            entries.append((None, reused[index]))
+            continue
+        if not combined_charge_details_list:
+            entries.append((None, "No charge descriptions listed"))
+            continue
+        body = {
+            "model": current_model_global,
+            "messages": build_best_crime_messages(user_prompt=user_prompt),
+            "max_tokens": BEST_CRIME_MAX_TOKENS,
+            "temperature": BEST_CRIME_TEMPERATURE,
+        }
+        entries.append((custom_id_for(inmate_id, body), body))
+    return entries
+
+def run_batch_mode(df, args, output_csv_path, output_column_name="Best_Crime", reused=None):
+    """
+    Runs one step of the batch workflow (or all of them for --batch run).
+    Every step is resumable: see batch_jobs.py.
+    """
+    batch_dir = args.batch_dir or f"{output_csv_path}.batch"
+    job = BatchJob(batch_dir)
+    steps = ["prepare", "submit", "poll", "merge"] if args.batch == "run" else [args.batch]
+    log_message(f"Batch mode: {', '.join(steps)} (job directory: {batch_dir})")
+
+    transport = None
+    if "submit" in steps or "poll" in steps:
+        if args.local_batch_dir:
+            transport = LocalBatchTransport(args.local_batch_dir)
+            log_message(f"Using local file-based batch transport in {args.local_batch_dir}")
+        else:
+            transport = OpenAIBatchTransport(client_global)
+
+    entries = build_batch_requests(df, reused)
+
+    if "prepare" in steps:
+        requests = [(custom_id, body) for custom_id, body in entries if custom_id]
+        if job.prepare(requests):
+            log_message(f"Prepared {job.state['request_count']} requests for {len(df)} rows in {job.requests_path}")
+        else:
+            log_message(f"Job file unchanged ({job.state['request_count']} requests); keeping the existing submission")
+
+    if "submit" in steps:
+        if job.submit(transport):
+            log_message(f"Submitted batch {job.state['batch_id']} (input file {job.state['input_file_id']})")
+        else:
+            log_message(f"Batch {job.state['batch_id']} was already submitted")
+
+    if "poll" in steps:
+        status = job.poll(transport, interval=args.poll_interval, once=args.poll_once, log=log_message)
+        if status not in TERMINAL_STATUSES:
+            log_message("Batch still running; run --batch poll again later, then --batch merge.")
+            return
+        if status != "completed":
+            log_message(f"Warning: batch ended with status '{status}'; merging whatever results it produced.")
+
+    if "merge" in steps:
+        if not job.is_downloaded():
+            log_message("ERROR: No batch results downloaded yet; run --batch poll first.")
+            sys.exit(1)
+        answers, errors = job.results()
+        best_crimes = []
+        missing = 0
+        for custom_id, value in entries:
+            if custom_id is None:
+                best_crimes.append(value)
+            elif custom_id in answers:
+                best_crimes.append(answers[custom_id])
+            else:
+                missing += 1
+                best_crimes.append("Could not determine best crime")
+        df[output_column_name] = best_crimes
+        for usage in job.usage():
+            run_ledger_global.record_call("best_crime_batch", usage, batch=True)
+        log_message(f"Merged {len(answers)} batch results into {len(df)} rows ({len(errors)} failed requests, "
+                    f"{missing} rows without a result)")
+        if missing > len(errors):
+            log_message("Some rows have no request in this batch (input or prompt changed since prepare); re-run --batch prepare.")
+        df.to_csv(output_csv_path, index=False, quoting=csv.QUOTE_ALL)
+        log_message(f"Results saved to {output_csv_path}")
+        run_ledger_global.finish(output_csv_path, len(df), log=log_message)
+
 # --- Main Execution ---
 def main():
-    global current_model_global
+    global current_model_global, rank_top_global
 
     check_required_packages()
     
@@ -255,12 +543,28 @@ def main():
     parser.add_argument('--output', type=str, default='master_mugshot_analysis.csv', help='Output CSV file path for the consolidated analysis. Default: master_mugshot_analysis.csv')
     parser.add_argument('--max-rows', type=int, help='Maximum number of rows to process (for testing purposes).')
     parser.add_argument('--model', type=str, default=DEFAULT_MODEL, help=f'OpenAI model to use for analysis. Default: {DEFAULT_MODEL}')
-    parser.add_argument('--save-interval', type=int, default=20, help='Save intermediate progress every N rows. Default: 20. Set to 0 to disable.')
+    parser.add_argument('--save-interval', type=int, default=20, help='Append finished rows to the checkpoint log (<output>.checkpoint.jsonl) every N rows. Default: 20. Set to 0 to disable.')
+    parser.add_argument('--resume', action='store_true', help='Skip inmates already finished in the checkpoint log of an interrupted run.')
+    parser.add_argument('--pack', type=int, default=1, help='Send the charges of this many inmates per API call, answered as a JSON array (e.g. 10). Default: 1 (one call per inmate).')
+    parser.add_argument('--rank-top', type=int, default=0, help='Send only the N most serious charges per inmate, as ranked locally by charge_ranker.py (e.g. 3). Default: 0 (all charges).')
+    parser.add_argument('--batch', choices=['prepare', 'submit', 'poll', 'merge', 'run'], help='Use the offline Batch API instead of one call per inmate: run a single step, or "run" for all of them.')
+    parser.add_argument('--batch-dir', type=str, help='Directory for the batch job file, state and results. Default: <output>.batch')
+    parser.add_argument('--local-batch-dir', type=str, help='Submit and poll through a local file-based stand-in kept in this directory instead of the OpenAI API (for testing).')
+    parser.add_argument('--poll-interval', type=float, default=60, help='Seconds between batch status checks. Default: 60')
+    parser.add_argument('--poll-once', action='store_true', help='Check the batch status once instead of waiting for it to finish.')
+    parser.add_argument('--incremental', action='store_true', help='Reuse the Best_Crime of inmates whose charges are unchanged since the previous output; only new or changed inmates go to the API.')
+    parser.add_argument('--previous', type=str, help='Previous output CSV for --incremental. Default: the --output file.')
     
     args = parser.parse_args()
+    if args.resume and (args.save_interval <= 0 or args.batch):
+        parser.error("--resume needs --save-interval > 0 and doesn't apply to --batch (batch jobs resume on their own)")
     current_model_global = args.model
+    run_ledger_global.model = current_model_global
+    rank_top_global = args.rank_top
 
-    initialize_openai_client() # Initialize after parsing args to get model
+    # The prepare and merge steps, and the local batch transport, never call the API
+    if not args.batch or (args.batch in ('submit', 'poll', 'run') and not args.local_batch_dir):
+        initialize_openai_client() # Initialize after parsing args to get model
 
     script_dir = os.path.dirname(__file__)
     input_csv_path = args.input if os.path.isabs(args.input) else os.path.join(script_dir, args.input)
@@ -272,8 +576,10 @@ def main():
     log_message(f"Using OpenAI model: {current_model_global}")
     if args.max_rows:
         log_message(f"Processing a maximum of {args.max_rows} rows.")
-    if args.save_interval > 0:
-        log_message(f"Saving intermediate progress every {args.save_interval} rows.")
+    if args.save_interval > 0 and not args.batch:
+        log_message(f"Checkpointing finished rows every {args.save_interval} rows.")
+    if args.rank_top > 0:
+        log_message(f"Sending the {args.rank_top} highest-ranked charges per inmate.")
 
 
     if not os.path.exists(input_csv_path):
@@ -341,8 +647,36 @@ def main():
         else:
             df_to_process = df.copy()
         
-        # --- AI Processing with intermediate saving ---
-        if args.save_interval > 0 and len(df_to_process) > args.save_interval:
+        reused = None
+        if args.incremental:
+            previous_csv_path = args.previous or output_csv_path
+            reused = reused_values(df_to_process, load_index(previous_csv_path, "Best_Crime"))
+            reused_count = int(reused.notna().sum())
+            log_message(f"Incremental: {reused_count} of {len(df_to_process)} inmates unchanged since {previous_csv_path}, "
+                        f"{len(df_to_process) - reused_count} new or changed")
+
+        if args.batch:
+            run_batch_mode(df_to_process, args, output_csv_path, reused=reused)
+            return
+
+        # Finished rows are appended to the checkpoint log once per batch; --resume reuses them
+        checkpoint = None
+        if args.save_interval > 0:
+            checkpoint = CheckpointLog(f"{output_csv_path}.checkpoint.jsonl", "Best_Crime")
+            if args.resume:
+                completed = reused_values(df_to_process, checkpoint.load())
+                log_message(f"Resume: {int(completed.notna().sum())} of {len(df_to_process)} inmates already finished "
+                            f"in {checkpoint.path} ({checkpoint.rows} rows logged)")
+                reused = completed if reused is None else reused.where(reused.notna(), completed)
+            else:
+                checkpoint.remove()
+
+        df_full = df_to_process
+        if reused is not None:
+            df_to_process = df_full[reused.isna()]
+
+        # --- AI Processing with checkpoints ---
+        if checkpoint and len(df_to_process) > args.save_interval:
             num_batches = (len(df_to_process) - 1) // args.save_interval + 1
             processed_dfs = []
             for i in range(num_batches):
@@ -351,44 +685,37 @@ def main():
                 batch_df = df_to_process.iloc[start_idx:end_idx]
                 
                 log_message(f"Processing batch {i+1}/{num_batches} (rows {start_idx+1}-{end_idx})...")
-                processed_batch_df = process_inmate_data(batch_df.copy()) # Process a copy
+                processed_batch_df = run_processing(batch_df.copy(), args.pack) # Process a copy
                 processed_dfs.append(processed_batch_df)
-                
-                # Combine all processed batches so far and save
-                current_full_processed_df = pd.concat(processed_dfs, ignore_index=True)
-                
-                # Update the original df_to_process with the new 'Best_Crime' column values from this batch
-                # This ensures that if we re-save the full df, it has all processed data up to this point.
-                for original_idx, processed_row in processed_batch_df.iterrows():
-                    # Find the corresponding row in df_to_process using InmateID (assuming it's unique after sorting and dropping NAs)
-                    # This is a bit complex; simpler to rebuild df_to_process if intermediate saving is critical
-                    # For now, we will just save the current_full_processed_df
-                    pass
-
-
-                temp_output_path = f"{output_csv_path}.batch_{i+1}_of_{num_batches}.tmp"
-                current_full_processed_df.to_csv(temp_output_path, index=False, quoting=csv.QUOTE_ALL)
-                log_message(f"Intermediate progress for batch {i+1} saved to {temp_output_path}")
+                checkpoint.append(processed_batch_df)
+                log_message(f"Checkpoint: batch {i+1} appended to {checkpoint.path} ({checkpoint.rows} rows logged)")
             
-            final_df = pd.concat(processed_dfs, ignore_index=True)
-        else: # Process all at once
-            final_df = process_inmate_data(df_to_process)
+            final_df = pd.concat(processed_dfs)
+        elif len(df_to_process) > 0: # Process all at once
+            final_df = run_processing(df_to_process, args.pack)
+        else:
+            final_df = df_to_process
 
+        if reused is not None:
+            # Inmates unchanged since the previous output or finished before --resume keep their Best_Crime;
+            # the rest come from this run, in input order
+            merged_df = df_full.copy()
+            merged_df["Best_Crime"] = reused
+            if len(final_df) > 0:
+                merged_df.loc[final_df.index, "Best_Crime"] = final_df["Best_Crime"]
+            final_df = merged_df
 
-        log_message("Consolidated processing complete.")
+
+        log_message(f"Consolidated processing complete: {api_calls_global} API calls, {tokens_used_global} tokens "
+                    f"({api_calls_global / max(len(df_to_process), 1):.2f} calls and "
+                    f"{tokens_used_global / max(len(df_to_process), 1):.0f} tokens per inmate); {api_breaker.summary()}.")
         final_df.to_csv(output_csv_path, index=False, quoting=csv.QUOTE_ALL)
         log_message(f"Results saved to {output_csv_path}")
+        run_ledger_global.finish(output_csv_path, len(df_to_process), log=log_message)
         
-        # Clean up temporary batch files if they exist
-        if args.save_interval > 0 and len(df_to_process) > args.save_interval:
-            for i in range(num_batches):
-                 temp_output_path = f"{output_csv_path}.batch_{i+1}_of_{num_batches}.tmp"
-                 if os.path.exists(temp_output_path):
-                     try:
-                         os.remove(temp_output_path)
-                         log_message(f"Removed temporary file: {temp_output_path}")
-                     except OSError as e_rem:
-                         log_message(f"Warning: Could not remove temporary file {temp_output_path}: {e_rem.strerror}")
+        # The output now holds every finished row; the next run starts a fresh checkpoint
+        if checkpoint:
+            checkpoint.remove()
 
 
     except FileNotFoundError:
@@ -0,0 +1,377 @@
+import argparse
+import csv
+import datetime
+import functools
+import os
+import sqlite3
+import time
+
+from statute_lookup import normalize_statute
+
+# Loads the pipeline CSVs into the normalized SQLite store described in README.md
+# (inmate / statute_reference / charge / bond).
+#
+# Any of the pipeline outputs can be loaded: mugshots_data.csv, sorted_mugshots.csv or the AI
+# outputs. AI columns that are present are stored as well: Best_Crime, Display_Crime and
+# Most_Interesting_Charge on the inmate, and the per-charge explanation (AI_Description_Explanation
+# or Plain_Language_Charges) on each charge.
+#
+# Each input file is one bulk load:
+#
+#   parse        the whole CSV is parsed into row tuples first, so the write phase never waits on it
+#   transaction  one BEGIN IMMEDIATE ... COMMIT per file, with executemany for every table
+#   indexes      dropped at the start of the load and rebuilt once at the end
+#   upsert       inmates are upserted on inmate_id; the charges and bonds of every loaded inmate
+#                are replaced, so reloading a file (or a newer scrape) never duplicates them
+#
+# An AI value that is missing from the file (no such column, or an empty cell) never clears one
+# already stored: a charge explanation is carried over when the inmate still has a charge with the
+# same description. The database runs
+# in WAL mode, so the app can keep reading while a load is in progress. Every load is recorded in
+# load_run with its row counts and timings; verify_database.py reports them.
+#
+#   python mugshotscripts/create_database.py
+#   python mugshotscripts/create_database.py --input mugshots_data.csv mugshot_display_crimes.csv
+
+DEFAULT_DATABASE_FILENAME = "mugshots.db"
+DEFAULT_INPUT_FILENAME = "sorted_mugshots.csv"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS inmate (
+    inmate_id INTEGER PRIMARY KEY,
+    name VARCHAR(100),
+    mugshot_url TEXT,
+    race CHAR(1),
+    sex CHAR(1),
+    date_of_birth DATE,
+    height INTEGER,
+    weight INTEGER,
+    hair_color VARCHAR(20),
+    eye_color VARCHAR(20),
+    facility_location VARCHAR(100),
+    best_crime TEXT,
+    display_crime TEXT,
+    most_interesting_charge TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS statute_reference (
+    statute_id INTEGER PRIMARY KEY,
+    statute_code VARCHAR(20) UNIQUE,
+    description TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS charge (
+    charge_id INTEGER PRIMARY KEY,
+    inmate_id INTEGER REFERENCES inmate (inmate_id),
+    statute_id INTEGER REFERENCES statute_reference (statute_id),
+    charge_comments TEXT,
+    case_number VARCHAR(50),
+    description TEXT,
+    ai_explanation TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS bond (
+    bond_id INTEGER PRIMARY KEY,
+    charge_id INTEGER REFERENCES charge (charge_id),
+    amount DECIMAL(10,2),
+    bond_type VARCHAR(20),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS load_run (
+    load_id INTEGER PRIMARY KEY,
+    source TEXT,
+    csv_rows INTEGER,
+    inmates INTEGER,
+    charges INTEGER,
+    bonds INTEGER,
+    new_statutes INTEGER,
+    skipped_rows INTEGER,
+    parse_seconds REAL,
+    insert_seconds REAL,
+    index_seconds REAL,
+    total_seconds REAL,
+    loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+INDEXES = {
+    "idx_inmate_name": "CREATE INDEX IF NOT EXISTS idx_inmate_name ON inmate (name)",
+    "idx_charge_inmate_id": "CREATE INDEX IF NOT EXISTS idx_charge_inmate_id ON charge (inmate_id)",
+    "idx_bond_charge_id": "CREATE INDEX IF NOT EXISTS idx_bond_charge_id ON bond (charge_id)",
+    "idx_statute_code": "CREATE INDEX IF NOT EXISTS idx_statute_code ON statute_reference (statute_code)",
+}
+
+# CSV column -> inmate column. AI columns are optional and never cleared by a missing value.
+INMATE_COLUMNS = {
+    "Name": "name",
+    "MugshotURL": "mugshot_url",
+    "Race": "race",
+    "Sex": "sex",
+    "DOB": "date_of_birth",
+    "Height": "height",
+    "Weight": "weight",
+    "Hair": "hair_color",
+    "Eyes": "eye_color",
+    "Location": "facility_location",
+}
+INMATE_AI_COLUMNS = {
+    "Best_Crime": "best_crime",
+    "Display_Crime": "display_crime",
+    "Most_Interesting_Charge": "most_interesting_charge",
+}
+CHARGE_AI_COLUMNS = ["AI_Description_Explanation", "Plain_Language_Charges"]
+
+def open_database(path):
+    """A connection in autocommit mode (transactions are explicit) with the schema in place."""
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # Durable at every checkpoint; WAL keeps the file consistent
+    conn.execute("PRAGMA cache_size=-65536")  # 64 MB
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.executescript(SCHEMA)
+    for sql in INDEXES.values():
+        conn.execute(sql)
+    return conn
+
+# --- Parsing ---
+def text_or_none(value):
+    value = (value or "").strip()
+    return value or None
+
+def parse_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+def parse_height(value):
+    """Height in inches. The sheriff's site writes feet and inches as one number (511 = 5'11")."""
+    height = parse_int(value)
+    if height is None or height < 100:
+        return height
+    return height // 100 * 12 + height % 100
+
+# Dates, amounts and statute codes repeat across thousands of rows, so each spelling is parsed once
+@functools.lru_cache(maxsize=None)
+def parse_date(value):
+    """MM/DD/YYYY as an ISO date; anything else is stored as written."""
+    value = text_or_none(value)
+    if value is None:
+        return None
+    try:
+        month, day, year = value.split("/")
+        return datetime.date(int(year), int(month), int(day)).isoformat()
+    except ValueError:
+        return value
+
+@functools.lru_cache(maxsize=None)
+def statute_code(value):
+    return normalize_statute(value) if value else None
+
+@functools.lru_cache(maxsize=None)
+def parse_amount(value):
+    """"$1,500.00" -> 1500.0"""
+    value = (value or "").strip().replace("$", "").replace(",", "")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+def split_parts(text, count):
+    """
+    A pipe-separated column as a list lined up with `count` charges (empty parts as None), or
+    [None] * count when the column doesn't have one part per charge.
+    """
+    parts = [part.strip() or None for part in (text or "").split("|")]
+    if len(parts) != count:
+        return [None] * count
+    return parts
+
+def parse_rows(path):
+    """
+    Reads a pipeline CSV. Returns (csv rows, skipped rows, {inmate_id: (inmate values, charges)}).
+    A later row for the same InmateID replaces an earlier one, as the upsert does.
+    """
+    inmates = {}
+    csv_rows = skipped = 0
+    with open(path, mode="r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        fields = reader.fieldnames or []
+        explanation_column = next((c for c in CHARGE_AI_COLUMNS if c in fields), None)
+        for row in reader:
+            csv_rows += 1
+            inmate_id = parse_int(row.get("InmateID"))
+            if inmate_id is None:
+                skipped += 1
+                continue
+            inmate = (
+                inmate_id,
+                text_or_none(row.get("Name")),
+                text_or_none(row.get("MugshotURL")),
+                text_or_none(row.get("Race")),
+                text_or_none(row.get("Sex")),
+                parse_date(row.get("DOB")),
+                parse_height(row.get("Height")),
+                parse_int(row.get("Weight")),
+                text_or_none(row.get("Hair")),
+                text_or_none(row.get("Eyes")),
+                text_or_none(row.get("Location")),
+            ) + tuple(text_or_none(row.get(c)) for c in INMATE_AI_COLUMNS)
+
+            # The Description column decides how many charges there are; the other columns line up with it
+            descriptions = [part.strip() or None for part in (row.get("Description") or "").split("|")]
+            count = len(descriptions) if any(descriptions) else 0
+            charges = list(zip(
+                descriptions[:count],
+                [statute_code(s) for s in split_parts(row.get("Statute"), count)],
+                split_parts(row.get("Charge Comments"), count),
+                split_parts(row.get("Case Number"), count),
+                split_parts(row.get(explanation_column), count) if explanation_column else [None] * count,
+                [parse_amount(a) for a in split_parts(row.get("Bond Amount"), count)],
+                split_parts(row.get("Bond Type"), count),
+            ))
+            inmates.pop(inmate_id, None)
+            inmates[inmate_id] = (inmate, charges)
+    return csv_rows, skipped, inmates
+
+# --- Loading ---
+def upsert_sql():
+    columns = ["inmate_id"] + list(INMATE_COLUMNS.values()) + list(INMATE_AI_COLUMNS.values())
+    updates = ([f"{c} = excluded.{c}" for c in INMATE_COLUMNS.values()] +
+               [f"{c} = COALESCE(excluded.{c}, inmate.{c})" for c in INMATE_AI_COLUMNS.values()] +
+               ["updated_at = CURRENT_TIMESTAMP"])
+    return (f"INSERT INTO inmate ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT (inmate_id) DO UPDATE SET {', '.join(updates)}")
+
+def load_file(conn, path):
+    """Loads one CSV in a single transaction. Returns the load_run values as a dict."""
+    started = time.perf_counter()
+    csv_rows, skipped, inmates = parse_rows(path)
+    parsed = time.perf_counter()
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for name in INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS load_inmate (inmate_id INTEGER PRIMARY KEY)")
+        conn.execute("DELETE FROM load_inmate")
+        conn.executemany("INSERT INTO load_inmate (inmate_id) VALUES (?)", ((i,) for i in inmates))
+
+        # Explanations of the charges about to be replaced, kept where this file has none of its own
+        kept_explanations = {
+            (inmate_id, description): explanation for inmate_id, description, explanation in conn.execute(
+                "SELECT inmate_id, description, ai_explanation FROM charge "
+                "WHERE ai_explanation IS NOT NULL AND inmate_id IN (SELECT inmate_id FROM load_inmate)"
+            )
+        }
+        conn.execute("DELETE FROM bond WHERE charge_id IN "
+                     "(SELECT charge_id FROM charge WHERE inmate_id IN (SELECT inmate_id FROM load_inmate))")
+        conn.execute("DELETE FROM charge WHERE inmate_id IN (SELECT inmate_id FROM load_inmate)")
+
+        conn.executemany(upsert_sql(), (inmate for inmate, _ in inmates.values()))
+
+        statutes_before = conn.execute("SELECT COUNT(*) FROM statute_reference").fetchone()[0]
+        first_descriptions = {}
+        for _, charges in inmates.values():
+            for description, statute, *_ in charges:
+                if statute and statute not in first_descriptions:
+                    first_descriptions[statute] = description
+        conn.executemany("INSERT OR IGNORE INTO statute_reference (statute_code, description) VALUES (?, ?)",
+                         first_descriptions.items())
+        statute_ids = dict(conn.execute("SELECT statute_code, statute_id FROM statute_reference"))
+        new_statutes = conn.execute("SELECT COUNT(*) FROM statute_reference").fetchone()[0] - statutes_before
+
+        # Charge ids are assigned here, inside the write lock, so bonds can reference them in the same pass
+        next_charge_id = conn.execute("SELECT COALESCE(MAX(charge_id), 0) + 1 FROM charge").fetchone()[0]
+        charge_rows = []
+        bond_rows = []
+        for inmate_id, (_, charges) in inmates.items():
+            for description, statute, comments, case_number, explanation, amount, bond_type in charges:
+                if explanation is None:
+                    explanation = kept_explanations.get((inmate_id, description))
+                charge_rows.append((next_charge_id, inmate_id, statute_ids.get(statute), comments, case_number,
+                                    description, explanation))
+                if amount is not None or bond_type:
+                    bond_rows.append((next_charge_id, amount, bond_type))
+                next_charge_id += 1
+        conn.executemany("INSERT INTO charge (charge_id, inmate_id, statute_id, charge_comments, case_number, "
+                         "description, ai_explanation) VALUES (?, ?, ?, ?, ?, ?, ?)", charge_rows)
+        conn.executemany("INSERT INTO bond (charge_id, amount, bond_type) VALUES (?, ?, ?)", bond_rows)
+        inserted = time.perf_counter()
+
+        for sql in INDEXES.values():
+            conn.execute(sql)
+        indexed = time.perf_counter()
+
+        run = {
+            "source": os.path.abspath(path),
+            "csv_rows": csv_rows,
+            "inmates": len(inmates),
+            "charges": len(charge_rows),
+            "bonds": len(bond_rows),
+            "new_statutes": new_statutes,
+            "skipped_rows": skipped,
+            "parse_seconds": round(parsed - started, 4),
+            "insert_seconds": round(inserted - parsed, 4),
+            "index_seconds": round(indexed - inserted, 4),
+            "total_seconds": round(indexed - started, 4),
+        }
+        conn.execute(f"INSERT INTO load_run ({', '.join(run)}) VALUES ({', '.join('?' * len(run))})",
+                     tuple(run.values()))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return run
+
+def rate(count, seconds):
+    return f"{count / seconds:,.0f}/s" if seconds > 0 else "n/a"
+
+def format_run(run):
+    return (f"{run['csv_rows']} rows -> {run['inmates']} inmates, {run['charges']} charges, {run['bonds']} bonds, "
+            f"{run['new_statutes']} new statutes ({run['skipped_rows']} rows skipped) in {run['total_seconds']:.2f}s: "
+            f"parse {run['parse_seconds']:.2f}s, insert {run['insert_seconds']:.2f}s, "
+            f"indexes {run['index_seconds']:.2f}s, {rate(run['csv_rows'], run['total_seconds'])} rows, "
+            f"{rate(run['charges'], run['total_seconds'])} charges")
+
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Load pipeline CSVs into the normalized SQLite database.")
+    parser.add_argument('--input', nargs='+', default=[DEFAULT_INPUT_FILENAME], help=f'CSV files to load, in order (any pipeline output, with or without AI columns). Default: {DEFAULT_INPUT_FILENAME}')
+    parser.add_argument('--database', default=DEFAULT_DATABASE_FILENAME, help=f'SQLite database file. Default: {DEFAULT_DATABASE_FILENAME} in the script directory')
+    parser.add_argument('--rebuild', action='store_true', help='Delete the database first instead of upserting into it')
+    args = parser.parse_args()
+
+    database_path = args.database if os.path.isabs(args.database) else os.path.join(script_dir, args.database)
+    input_paths = [p if os.path.isabs(p) else os.path.join(script_dir, p) for p in args.input]
+    for path in input_paths:
+        if not os.path.exists(path):
+            print(f"Error: input file {path} does not exist")
+            raise SystemExit(1)
+
+    if args.rebuild:
+        for suffix in ["", "-wal", "-shm"]:
+            if os.path.exists(database_path + suffix):
+                os.remove(database_path + suffix)
+
+    try:
+        conn = open_database(database_path)
+    except sqlite3.Error as e:
+        print(f"Error: could not open database {database_path}: {e}")
+        raise SystemExit(1)
+    try:
+        for path in input_paths:
+            try:
+                run = load_file(conn, path)
+            except (OSError, csv.Error, sqlite3.Error) as e:
+                print(f"Error loading {path}: {e} (nothing from this file was written)")
+                raise SystemExit(1)
+            print(f"Loaded {os.path.basename(path)}: {format_run(run)}")
+        conn.execute("PRAGMA optimize")
+    finally:
+        conn.close()
+    print(f"Database saved to {database_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import json
+import re
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Minimal OpenAI-compatible server for testing the AI scripts without an API key or cost.
+# Serves POST /v1/chat/completions and GET /v1/models/<id> with deterministic answers:
+#
+#   "InmateID <id>:" sections in the prompt    -> a JSON array with item 1 of each section (packed prompts)
+#   a numbered list in the prompt ("1. ...")   -> the text of item 1 (charge selection prompts)
+#   a quoted string in the prompt ("...")      -> "Plain: <quoted text>" (explain/reword prompts)
+#   anything else                              -> "Plain: <first 40 characters of the prompt>"
+#
+# --latency adds a fixed delay per call, and --rpm-limit answers 429 once more than that many calls
+# arrive within a minute, so concurrency and rate limiting can be checked locally. --outage answers
+# 503 to every completion for that many seconds after startup, to exercise retries and the circuit
+# breaker (openai_retry.py):
+#
+#   python mugshotscripts/fake_openai_server.py --port 8780 --latency 0.5
+#   OPENAI_API_KEY=test OPENAI_BASE_URL=http://127.0.0.1:8780/v1 python mugshotscripts/mugshot_ai_processor.py --concurrency 16
+
+def fake_usage(messages, answer):
+    """Token counts estimated at ~4 characters per token, like the real API's usage block."""
+    prompt_tokens = sum(len(m.get("content", "")) // 4 + 4 for m in messages)
+    completion_tokens = len(answer) // 4 + 1
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+def fake_answer(prompt):
+    packed = re.findall(r"^InmateID (\d+):\n1\. (.+)$", prompt, re.MULTILINE)
+    if packed:
+        return json.dumps([{"InmateID": int(inmate_id), "Best_Crime": first.strip()} for inmate_id, first in packed])
+    listed = re.search(r"^1\. (.+)$", prompt, re.MULTILINE)
+    if listed:
+        return listed.group(1).strip()
+    quoted = re.search(r'"\{?(.+?)\}?"', prompt)
+    if quoted:
+        return f"Plain: {quoted.group(1)}"
+    return f"Plain: {prompt[:40]}"
+
+def make_handler(latency, rpm_limit, outage=0.0):
+    lock = threading.Lock()
+    recent = []
+    stats = {"calls": 0, "rejected": 0, "unavailable": 0, "in_flight": 0, "max_in_flight": 0}
+    outage_until = time.time() + outage
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, body, headers=None):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.startswith("/v1/models/"):
+                model = self.path[len("/v1/models/"):]
+                self.send_json(200, {"id": model, "object": "model", "owned_by": "fake"})
+            elif self.path == "/stats":
+                with lock:
+                    self.send_json(200, dict(stats))
+            else:
+                self.send_json(404, {"error": {"message": "Not found"}})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path != "/v1/chat/completions":
+                self.send_json(404, {"error": {"message": "Not found"}})
+                return
+            now = time.time()
+            with lock:
+                if now < outage_until:
+                    stats["unavailable"] += 1
+                    self.send_json(503, {"error": {"message": "Service unavailable", "type": "server_error"}})
+                    return
+                recent[:] = [t for t in recent if now - t < 60]
+                if rpm_limit and len(recent) >= rpm_limit:
+                    stats["rejected"] += 1
+                    retry_after = max(60 - (now - recent[0]), 0.1)
+                    self.send_json(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                                   {"Retry-After": f"{retry_after:.1f}"})
+                    return
+                recent.append(now)
+                stats["calls"] += 1
+                stats["in_flight"] += 1
+                stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+            try:
+                if latency:
+                    time.sleep(latency)
+                prompt = body.get("messages", [{}])[-1].get("content", "")
+                answer = fake_answer(prompt)
+                self.send_json(200, {
+                    "id": f"chatcmpl-fake-{stats['calls']}",
+                    "object": "chat.completion",
+                    "created": int(now),
+                    "model": body.get("model", "fake"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": answer},
+                                 "finish_reason": "stop"}],
+                    "usage": fake_usage(body.get("messages", []), answer),
+                })
+            finally:
+                with lock:
+                    stats["in_flight"] -= 1
+
+    return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake OpenAI chat completions API for local testing.")
+    parser.add_argument('--port', type=int, default=8780, help="Port to listen on. Default: 8780")
+    parser.add_argument('--latency', type=float, default=0.2, help="Seconds per completion. Default: 0.2")
+    parser.add_argument('--rpm-limit', type=int, default=0, help="Answer 429 above this many calls per minute. Default: 0 (no limit)")
+    parser.add_argument('--outage', type=float, default=0, help="Answer 503 for this many seconds after startup. Default: 0")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args.latency, args.rpm_limit, args.outage))
+    print(f"Fake OpenAI API on http://127.0.0.1:{args.port}/v1 (latency {args.latency}s); call stats at /stats")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
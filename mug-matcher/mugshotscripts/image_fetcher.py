@@ -0,0 +1,246 @@
+import csv
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from scrape import HEADERS, PHOTO_BASE, TIMEOUT, RateLimiter
+from scrape_session import create_session
+
+# Downloads the mugshot behind every MugshotURL in a scraped CSV into a local image store, so the
+# game can serve its own images instead of hotlinking apps.sheriff.org on every round.
+#
+# Store layout (default: mug-matcher/public/mugshots, served by Next.js as /mugshots/...):
+#
+#   originals/<sha256>.jpg    The downloaded image, stored once per distinct content
+#   192/<sha256>.webp         Re-encoded derivatives, one directory per size (longest side in px).
+#   384/<sha256>.webp         The game draws mugshots at up to w-48 (192 CSS px); 384 covers 2x screens.
+#   manifest.json             {MugshotURL: {"sha256", "ext", "bytes", "status"}}
+#
+# URLs already in the manifest are not downloaded again, and identical images (the same photo under
+# two bookings, the sheriff's "no photo" placeholder) share one set of files. Derivatives need
+# Pillow (pip install Pillow); without it only originals are stored.
+#
+# The CSV gets a LocalMugshotPath column with the URL of the --default-size derivative (or of the
+# original), left empty when the image could not be fetched so the game falls back to MugshotURL.
+# By default that is the CSV the game loads (MUGSHOTS_CSV_PATH, as lib/csv-database.ts resolves
+# it); the game only sees the column in that file.
+
+DEFAULT_SIZES = [192, 384]
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RATE = 10.0
+LOCAL_PATH_FIELD = "LocalMugshotPath"
+MANIFEST_FILENAME = "manifest.json"
+APP_CSV_PATH = "./data/sorted_mugshots.csv"  # MUGSHOTS_CSV_PATH in render.yaml
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+def write_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, mode="wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def image_extension(data, url):
+    if data[:3] == b"\xff\xd8\xff":
+        return ".jpg"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return ".png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp"
+    return os.path.splitext(url)[1].lower() or ".jpg"
+
+class ImageStore:
+    def __init__(self, path, sizes, quality=80):
+        self.path = path
+        self.sizes = sizes if Image is not None else []
+        self.quality = quality
+        self.manifest_path = os.path.join(path, MANIFEST_FILENAME)
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, mode="r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        os.makedirs(os.path.join(path, "originals"), exist_ok=True)
+        for size in self.sizes:
+            os.makedirs(os.path.join(path, str(size)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._claimed = set()  # sha256 of images written (or being written) this run
+        self.downloaded_bytes = 0
+        self.new_images = 0
+        self.duplicate_images = 0
+
+    def original_path(self, sha256, ext):
+        return os.path.join(self.path, "originals", sha256 + ext)
+
+    def derivative_path(self, sha256, size):
+        return os.path.join(self.path, str(size), sha256 + ".webp")
+
+    def is_stored(self, url):
+        entry = self.manifest.get(url)
+        if not entry or entry["status"] != "ok":
+            return False
+        if not os.path.exists(self.original_path(entry["sha256"], entry["ext"])):
+            return False
+        return all(os.path.exists(self.derivative_path(entry["sha256"], size)) for size in self.sizes)
+
+    def make_derivatives(self, sha256, data):
+        with Image.open(BytesIO(data)) as image:
+            image = image.convert("RGB")
+            for size in self.sizes:
+                path = self.derivative_path(sha256, size)
+                if os.path.exists(path):
+                    continue
+                resized = image.copy()
+                resized.thumbnail((size, size), Image.LANCZOS)  # Keeps the aspect ratio; never upscales
+                out = BytesIO()
+                resized.save(out, format="WEBP", quality=self.quality, method=6)
+                write_atomic(path, out.getvalue())
+
+    def put(self, url, data):
+        """Stores one downloaded image (runs on a fetch thread). Returns its manifest entry."""
+        sha256 = hashlib.sha256(data).hexdigest()
+        ext = image_extension(data, url)
+        path = self.original_path(sha256, ext)
+        with self._lock:
+            self.downloaded_bytes += len(data)
+            is_new = sha256 not in self._claimed
+            self._claimed.add(sha256)
+            if is_new:
+                self.new_images += 1
+            else:
+                self.duplicate_images += 1
+        if is_new:
+            # Files left by an earlier run are reused; make_derivatives only fills in missing sizes
+            if not os.path.exists(path):
+                write_atomic(path, data)
+            if self.sizes:
+                self.make_derivatives(sha256, data)
+        return {"sha256": sha256, "ext": ext, "bytes": len(data), "status": "ok"}
+
+    def local_url(self, url, url_prefix, size):
+        entry = self.manifest.get(url)
+        if not entry or entry["status"] != "ok":
+            return ""
+        if size in self.sizes:
+            return f"{url_prefix}/{size}/{entry['sha256']}.webp"
+        return f"{url_prefix}/originals/{entry['sha256']}{entry['ext']}"
+
+    def save(self):
+        data = json.dumps(self.manifest, indent=1, sort_keys=True).encode("utf-8")
+        write_atomic(self.manifest_path, data)
+
+def fetch_image(session, store, url, source_url):
+    resp = session.get(source_url, timeout=TIMEOUT)
+    if resp.status_code != 200:
+        return {"status": f"http {resp.status_code}"}
+    return store.put(url, resp.content)
+
+async def fetch_images(session, store, urls, concurrency, rate, photo_base):
+    """Downloads `urls` with up to `concurrency` requests in flight. Returns {url: manifest entry}."""
+    limiter = RateLimiter(rate)
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    results = {}
+
+    async def worker(url):
+        source_url = photo_base + url[len(PHOTO_BASE):] if photo_base and url.startswith(PHOTO_BASE) else url
+        async with semaphore:
+            await limiter.wait()
+            try:
+                entry = await loop.run_in_executor(executor, fetch_image, session, store, url, source_url)
+            except Exception as e:
+                entry = {"status": f"error {type(e).__name__}"}
+        results[url] = entry
+        if entry["status"] != "ok":
+            print(f"Failed: {url} ({entry['status']})")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        await asyncio.gather(*(worker(url) for url in urls))
+    return results
+
+def read_rows(csv_path):
+    with open(csv_path, mode="r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        return reader.fieldnames, list(reader)
+
+def write_rows(csv_path, fieldnames, rows):
+    tmp_path = f"{csv_path}.tmp"
+    with open(tmp_path, mode="w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, csv_path)
+
+def app_csv_path(app_dir):
+    """The CSV the game loads: MUGSHOTS_CSV_PATH (relative paths are relative to mug-matcher/) or render.yaml's default."""
+    csv_path = os.environ.get("MUGSHOTS_CSV_PATH") or APP_CSV_PATH
+    return csv_path if os.path.isabs(csv_path) else os.path.normpath(os.path.join(app_dir, csv_path))
+
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Download mugshot images into a local store and add a LocalMugshotPath column.")
+    parser.add_argument('--input', default=app_csv_path(os.path.join(script_dir, "..")), help=f"CSV with a MugshotURL column. Default: the CSV the game loads ($MUGSHOTS_CSV_PATH, else {APP_CSV_PATH} in mug-matcher/)")
+    parser.add_argument('--output', help="CSV to write with the added column. Default: overwrite --input")
+    parser.add_argument('--store', default=os.path.join(script_dir, "..", "public", "mugshots"), help="Image store directory. Default: public/mugshots")
+    parser.add_argument('--url-prefix', default="/mugshots", help="URL the store is served under. Default: /mugshots")
+    parser.add_argument('--sizes', default=",".join(str(s) for s in DEFAULT_SIZES), help="Comma-separated derivative sizes in px. Default: 192,384")
+    parser.add_argument('--default-size', type=int, default=DEFAULT_SIZES[-1], help=f"Derivative written to {LOCAL_PATH_FIELD}. Default: {DEFAULT_SIZES[-1]}")
+    parser.add_argument('--quality', type=int, default=80, help="WebP quality for derivatives. Default: 80")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help=f"Downloads in flight. Default: {DEFAULT_CONCURRENCY}")
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help=f"Maximum downloads started per second (0 = unlimited). Default: {DEFAULT_RATE}")
+    parser.add_argument('--photo-base', help=f"Fetch images from this host instead of {PHOTO_BASE} (e.g. a local mirror).")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"Error: Input file not found: {args.input}")
+        print("Set MUGSHOTS_CSV_PATH to the CSV the game loads, or pass --input (the game only sees the column in its own CSV).")
+        sys.exit(1)
+    fieldnames, rows = read_rows(args.input)
+    if not fieldnames or "MugshotURL" not in fieldnames:
+        print("Error: Input CSV has no MugshotURL column.")
+        sys.exit(1)
+
+    sizes = sorted(int(s) for s in args.sizes.split(",") if s.strip())
+    store = ImageStore(args.store, sizes, args.quality)
+    if Image is None:
+        print("Pillow is not installed; storing originals only (pip install Pillow for WebP derivatives).")
+
+    urls = sorted({row["MugshotURL"] for row in rows if row.get("MugshotURL")})
+    pending = [url for url in urls if not store.is_stored(url)]
+    print(f"{len(rows)} rows, {len(urls)} distinct image URLs, {len(urls) - len(pending)} already stored, {len(pending)} to fetch")
+
+    if pending:
+        session = create_session(HEADERS, pool_size=args.concurrency)
+        started = time.perf_counter()
+        try:
+            results = asyncio.run(fetch_images(session, store, pending, args.concurrency, args.rate, args.photo_base))
+        finally:
+            session.close()
+        store.manifest.update(results)
+        store.save()
+        elapsed = time.perf_counter() - started
+        fetched = sum(1 for entry in results.values() if entry["status"] == "ok")
+        print(f"Fetched {fetched}/{len(pending)} images in {elapsed:.1f}s "
+              f"({store.downloaded_bytes / 1024:.0f} KB; {store.new_images} new, {store.duplicate_images} duplicate content)")
+        print(session.connection_stats.summary())
+
+    if LOCAL_PATH_FIELD not in fieldnames:
+        fieldnames = fieldnames + [LOCAL_PATH_FIELD]
+    for row in rows:
+        row[LOCAL_PATH_FIELD] = store.local_url(row.get("MugshotURL", ""), args.url_prefix.rstrip("/"), args.default_size)
+    output = args.output or args.input
+    write_rows(output, fieldnames, rows)
+    local = sum(1 for row in rows if row[LOCAL_PATH_FIELD])
+    print(f"Wrote {output}: {local}/{len(rows)} rows have a {LOCAL_PATH_FIELD}")
+
+if __name__ == "__main__":
+    main()
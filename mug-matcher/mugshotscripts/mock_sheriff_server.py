@@ -0,0 +1,134 @@
+import csv
+import os
+import time
+import argparse
+import html
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for apps.sheriff.org/ArrestSearch/InmateDetail/<id>.
+# Pages are rendered from a scraped CSV so scrape.py can be exercised without touching the real site:
+#   python mock_sheriff_server.py --port 8765
+#   python scrape.py --base-url http://127.0.0.1:8765/ArrestSearch/InmateDetail/ --start-id 502500409 --count 50 --concurrency 8
+
+DETAIL_PATH = "/ArrestSearch/InmateDetail/"
+PHOTO_BASE = "https://apps.sheriff.org"
+
+PERSON_FIELDS = ["Race", "Sex", "DOB", "Height", "Weight", "Hair", "Eyes", "Location"]
+CHARGE_FIELDS = ["Statute", "Charge Comments", "Case Number", "Description", "Bond Amount", "Bond Type"]
+
+def render_inmate_page(row):
+    """
+    Renders an InmateDetail page with the same markup scrape.py's extractor looks for.
+    """
+    esc = lambda v: html.escape(v or "", quote=True)
+    photo_src = (row.get("MugshotURL") or "").replace(PHOTO_BASE, "")
+
+    person = "\n".join(
+        f'<div class="col-md-3"><label>{field}</label><span class="form-control"><span>{esc(row.get(field))}</span></span></div>'
+        for field in PERSON_FIELDS
+    )
+
+    split = {field: (row.get(field) or "").split(" | ") for field in CHARGE_FIELDS}
+    num_charges = max(len(values) for values in split.values()) if row.get("Description") else 0
+    panels = []
+    for i in range(num_charges):
+        cells = "\n".join(
+            f'<div class="col-md-4"><label>{field}</label><span class="inputWarning">{esc(split[field][i] if i < len(split[field]) else "")}</span></div>'
+            for field in CHARGE_FIELDS
+        )
+        panels.append(
+            '<div class="panel panel-warning">\n'
+            '<div class="panel-heading">Charge</div>\n'
+            f'<div class="panel-body"><div class="row">\n{cells}\n</div></div>\n'
+            '</div>'
+        )
+
+    return (
+        "<!DOCTYPE html>\n<html><head><title>Inmate Detail</title></head><body>\n"
+        '<div class="container">\n'
+        '<div class="panel panel-default">\n'
+        '<div class="panel-heading">Inmate Information</div>\n'
+        '<div class="panel-body">\n'
+        f'<img src="{esc(photo_src)}" alt="photo" />\n'
+        f'<h3>{esc(row.get("Name"))}</h3>\n'
+        f'<div class="row">\n{person}\n</div>\n'
+        '</div>\n</div>\n'
+        + "\n".join(panels) +
+        "\n</div>\n</body></html>\n"
+    )
+
+def load_pages(csv_path):
+    pages = {}
+    with open(csv_path, mode="r", encoding="utf-8", newline="") as infile:
+        for row in csv.DictReader(infile):
+            try:
+                pages[int(row["InmateID"])] = render_inmate_page(row)
+            except (KeyError, ValueError):
+                continue
+    return pages
+
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+
+def make_handler(pages, latency=0.0):
+    class InmateDetailHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like the real server
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+            inmate_id = None
+            if self.path.startswith(DETAIL_PATH):
+                try:
+                    inmate_id = int(self.path[len(DETAIL_PATH):].strip("/"))
+                except ValueError:
+                    pass
+            body = pages.get(inmate_id)
+            status = 200
+            if body is None:
+                status, body = 404, "<html><body>Not Found</body></html>"
+            payload = body.encode("utf-8")
+            etag = f'"{hashlib.sha256(payload).hexdigest()[:16]}"'
+            if status == 200 and self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            if status == 200:
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", LAST_MODIFIED)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass  # Keep the console quiet; scrape.py prints per-ID results
+
+    return InmateDetailHandler
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve canned InmateDetail pages for testing scrape.py locally.")
+    parser.add_argument('--csv', help="CSV to render pages from. Default: mugshots_data.csv in the script directory.")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="Artificial delay per request in seconds.")
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    csv_path = args.csv or os.path.join(script_dir, "mugshots_data.csv")
+    pages = load_pages(csv_path)
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(pages, args.latency))
+    print(f"Serving {len(pages)} inmate pages on http://{args.host}:{args.port}{DETAIL_PATH}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down.")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
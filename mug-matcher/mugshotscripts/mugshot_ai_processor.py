@@ -5,9 +5,16 @@ import time
 import datetime
 import io
 import argparse
-from openai import OpenAI # You'll need to install this: pip install openai
+import asyncio
+from openai import OpenAI, AsyncOpenAI # You'll need to install this: pip install openai
 from dotenv import load_dotenv
 import pkg_resources  # To check installed packages
+from charge_cache import ChargeCache, prompt_version, normalize_charge, DEFAULT_CACHE_FILENAME, DEFAULT_MAX_ENTRIES, DEFAULT_MAX_AGE_DAYS
+from openai_async import AsyncChatRunner, run_ordered, DEFAULT_RPM, DEFAULT_TPM
+from statute_lookup import StatuteLookup, split_statutes, DEFAULT_LOOKUP_FILENAME
+from run_ledger import RunLedger
+from openai_retry import CircuitBreaker, call_with_retries, DEFAULT_RETRIES
+from stream_writer import StreamingCSVWriter, partial_path
 
 # Helper function for logging with timestamps
 def log_message(message):
@@ -48,9 +55,26 @@ if not api_key:
 else:
     log_message("OpenAI API Key loaded successfully.")
 
-client = OpenAI(api_key=api_key)
+client = OpenAI(api_key=api_key, max_retries=0)  # get_plain_english_charge does the retrying
+api_breaker = CircuitBreaker(log=log_message)  # Shared by every API call in the run
 EXPECTED_MODEL = "gpt-4.1-mini"
 
+SYSTEM_PROMPT = "You are a legal expert hired by Law and Order. Your job is to receive criminal charges and charge descriptions and decide on a short summary of what the crime is (MAX: 50 characters) in plain English for the average person to understand. Never include any explanations, disclaimers, or text outside of the single String structure."
+USER_PROMPT_TEMPLATE = "Explain this charge so viewers can understand, use a max of 50 characters to descript the charge: \"{charge}\""
+TEMPERATURE = 0.1
+MAX_TOKENS = 50
+# Changes whenever the prompt or generation settings change, so cached explanations are never reused across prompts
+PROMPT_VERSION = prompt_version(SYSTEM_PROMPT, USER_PROMPT_TEMPLATE, TEMPERATURE, MAX_TOKENS)
+
+# Persistent explanation cache (charge_cache.py); opened in __main__ once the model is known
+charge_cache = None
+# Curated explanations for fixed procedural charges (statute_lookup.py), consulted before the cache and the API
+statute_lookup = None
+api_call_count = 0
+api_seconds = 0.0
+# Tokens, latency, retries and cache status of every call (run_ledger.py); written next to the output CSV
+run_ledger = RunLedger(os.path.basename(__file__), EXPECTED_MODEL)
+
 
 # Function already defined above, removing duplicate
 
@@ -61,34 +85,177 @@ def get_plain_english_charge(charge_description):
     # Check for empty charge first
     if not charge_description or charge_description.isspace():
         return "No specific charge provided"
+
+    if charge_cache:
+        cached = charge_cache.get(charge_description)
+        run_ledger.record_cache("miss" if cached is None else "hit")
+        if cached is not None:
+            log_message(f"Cache hit, skipping API call")
+            return cached
         
+    global api_call_count, api_seconds
+    attempts = 0
+    request_seconds = 0.0
+
+    def send(attempt):
+        nonlocal attempts, request_seconds
+        attempts += 1
+        started = time.time()
+        try:
+            # Set a timeout for the API call
+            return client.chat.completions.create(
+                model=EXPECTED_MODEL,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": USER_PROMPT_TEMPLATE.format(charge=charge_description)}
+                ],
+                temperature=TEMPERATURE, # Adjust for creativity vs. factuality
+                max_tokens=MAX_TOKENS,   # Adjust based on expected length
+                timeout=30        # Add 30 second timeout
+            )
+        finally:
+            request_seconds += time.time() - started
+
     try:
-        start_time = time.time()
         log_message(f"Calling OpenAI API with timeout of 30 seconds...")
-        
-        # Set a timeout for the API call
-        response = client.chat.completions.create(
-            model=EXPECTED_MODEL,
-            messages=[
-                {"role": "system", "content": "You are a legal expert hired by Law and Order. Your job is to receive criminal charges and charge descriptions and decide on a short summary of what the crime is (MAX: 50 characters) in plain English for the average person to understand. Never include any explanations, disclaimers, or text outside of the single String structure."},
-                {"role": "user", "content": f"Explain this charge so viewers can understand, use a max of 50 characters to descript the charge: \"{charge_description}\""}
-            ],
-            temperature=0.1, # Adjust for creativity vs. factuality
-            max_tokens=50,   # Adjust based on expected length
-            timeout=30        # Add 30 second timeout
-        )
+        api_call_count += 1
+        response = call_with_retries(send, api_breaker, DEFAULT_RETRIES, log_message)
         explanation = response.choices[0].message.content.strip()
         
-        elapsed = time.time() - start_time
-        log_message(f"API call completed in {elapsed:.2f} seconds")
+        api_seconds += request_seconds
+        run_ledger.record_call("explain", response.usage, request_seconds, attempts)
+        log_message(f"API call completed in {request_seconds:.2f} seconds")
+
+        # Only successful responses are cached; errors below are retried on the next run
+        if charge_cache:
+            charge_cache.put(charge_description, explanation)
         
         # Small delay to avoid rate limiting
         time.sleep(0.5)
         
         return explanation
+    except Exception as e:
+        run_ledger.record_call("explain", None, request_seconds, attempts, ok=False)
+        log_message(f"Error calling OpenAI API for '{charge_description[:30]}...': {e}")
+        return f"Error: Could not get explanation for '{charge_description[:50]}...'"
+
+async def get_plain_english_charge_async(runner, charge_description):
+    """
+    get_plain_english_charge for the async mode: no fixed sleep, pacing comes from the runner's RPM/TPM budget.
+    """
+    global api_call_count
+    if charge_cache:
+        cached = charge_cache.get(charge_description)
+        run_ledger.record_cache("miss" if cached is None else "hit")
+        if cached is not None:
+            return cached
+    api_call_count += 1
+    try:
+        explanation = await runner.complete(
+            [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": USER_PROMPT_TEMPLATE.format(charge=charge_description)}
+            ],
+            max_tokens=MAX_TOKENS,
+            temperature=TEMPERATURE,
+            timeout=30,
+            purpose="explain"
+        )
     except Exception as e:
         log_message(f"Error calling OpenAI API for '{charge_description[:30]}...': {e}")
         return f"Error: Could not get explanation for '{charge_description[:50]}...'"
+    if charge_cache:
+        charge_cache.put(charge_description, explanation)
+    return explanation
+
+async def translate_charges_async(charges, concurrency, rpm, tpm):
+    """
+    Translates `charges` with up to `concurrency` API calls in flight. Returns explanations in the same order.
+    """
+    runner = AsyncChatRunner(AsyncOpenAI(api_key=api_key, max_retries=0), EXPECTED_MODEL, concurrency, rpm, tpm,
+                             breaker=api_breaker, ledger=run_ledger, log=log_message)
+    global api_seconds
+    try:
+        return await run_ordered(charges, lambda charge: get_plain_english_charge_async(runner, charge), log=log_message)
+    finally:
+        api_seconds += runner.seconds
+        log_message(f"Async mode: {runner.summary()}")
+        await runner.client.close()
+
+def row_charges(row):
+    """
+    (statute, charge) pairs for a row's pipe-separated Description, or [] when it has none.
+    The statute is None when the Statute column doesn't line up with the charges.
+    """
+    description_text = row.get("Description", "")
+    if not description_text or description_text.isspace():
+        return []
+    charges = [charge.strip() for charge in description_text.split('|')]
+    return list(zip(split_statutes(row.get("Statute", ""), len(charges)), charges))
+
+def plan_distinct_charges(rows):
+    """
+    Collects the distinct charges across all rows that the statute lookup can't answer.
+    Returns ({normalized charge: first spelling seen}, total number of non-empty charges,
+    {(statute, normalized charge): curated explanation}).
+    """
+    distinct = {}
+    looked_up = {}
+    total = 0
+    for row in rows:
+        for statute, charge_cleaned in row_charges(row):
+            if not charge_cleaned:
+                continue
+            total += 1
+            key = normalize_charge(charge_cleaned)
+            if statute_lookup:
+                explanation = statute_lookup.get(charge_cleaned, statute)
+                if explanation is not None:
+                    looked_up[(statute, key)] = explanation
+                    run_ledger.record_cache("lookup")
+                    continue
+            distinct.setdefault(key, charge_cleaned)
+    return distinct, total, looked_up
+
+def translate_distinct(distinct_charges, concurrency=0, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM):
+    """
+    Explanations for the output of plan_distinct_charges, as {normalized charge: explanation}.
+    With concurrency > 0 the charges are translated concurrently (openai_async.py).
+    """
+    explanations = {}
+    if concurrency > 0:
+        results = asyncio.run(translate_charges_async(list(distinct_charges.values()), concurrency, rpm, tpm))
+        explanations = dict(zip(distinct_charges.keys(), results))
+    for n, (key, charge) in enumerate(distinct_charges.items(), start=1):
+        if key in explanations:
+            continue
+        charge_preview = charge[:30] + ('...' if len(charge) > 30 else '')
+        log_message(f"Translating distinct charge {n}/{len(distinct_charges)}: '{charge_preview}'")
+        explanations[key] = get_plain_english_charge(charge)  # Retries inside; errors come back as text
+        explanation_preview = explanations[key][:30] + ('...' if len(explanations[key]) > 30 else '')
+        log_message(f"  Explanation: {explanation_preview}")
+    return explanations
+
+def explain_row(row, looked_up, explanations):
+    """
+    The AI_Description_Explanation value of a row: the explanation of each of its charges, in
+    order, joined with " | ".
+    """
+    ai_explanations = []
+    charges = row_charges(row)
+    if charges:
+        for statute, charge_cleaned in charges:
+            if charge_cleaned:
+                key = normalize_charge(charge_cleaned)
+                # An empty curated explanation still counts: such charges were never sent to the API
+                ai_explanation = looked_up[(statute, key)] if (statute, key) in looked_up else explanations[key]
+                if ai_explanation:
+                    ai_explanations.append(ai_explanation)
+            else:
+                ai_explanations.append("No specific charge provided") # Handle empty charge after split
+    else:
+        ai_explanations.append("No description provided")
+    return " | ".join(ai_explanations)
 
 def peek_csv_file(file_path, num_lines=5):
     """
@@ -114,11 +281,21 @@ def peek_csv_file(file_path, num_lines=5):
     except Exception as e:
         log_message(f"Error examining CSV file: {e}")
 
-def process_mugshots(input_csv_path, output_csv_path, max_rows=None):
+def read_rows(input_csv_path, encoding, delimiter, max_rows=None):
+    """Yields the input rows one at a time (at most max_rows), so the file is never held in memory."""
+    with open(input_csv_path, mode='r', encoding=encoding, newline='') as infile:
+        for n, row in enumerate(csv.DictReader(infile, delimiter=delimiter)):
+            if max_rows and n >= max_rows:
+                break
+            yield row
+
+def process_mugshots(input_csv_path, output_csv_path, max_rows=None, concurrency=0, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM):
     """
     Reads mugshot data, gets AI explanations for charges, and writes to a new CSV.
+    The input is read twice, once to plan the distinct charges and once to write the output rows
+    as they are filled in (stream_writer.py), so memory only grows with the number of distinct charges.
+    With concurrency > 0 the distinct charges are translated concurrently (openai_async.py).
     """
-    processed_rows = []
     header = []
     
     log_message(f"Starting to process mugshots from: {input_csv_path}")
@@ -183,103 +360,42 @@ def process_mugshots(input_csv_path, output_csv_path, max_rows=None):
             else:
                 log_message(f"'Description' column found in CSV")
 
-            processed_rows.append(header + ["AI_Description_Explanation"])
-            log_message("Starting row processing...")
-            
-            # Instead of counting rows (which can be slow for large files),
-            # we'll just track the current position
             log_message("Press Ctrl+C to abort if processing takes too long...")
             
-            # Try to count rows for small files, skip for large ones
-            file_size = os.path.getsize(input_csv_path)
-            if file_size < 1024 * 1024:  # 1MB
-                infile.seek(0)
-                next(infile)  # Skip header
-                row_count_estimate = sum(1 for _ in infile)
-                log_message(f"File size: {file_size/1024:.1f}KB, Estimated rows: {row_count_estimate}")
-                infile.seek(0)  # Reset file pointer
-                next(infile)    # Skip header again
-            else:
-                log_message(f"Large file detected ({file_size/1024/1024:.1f}MB). Not counting rows.")
-                
-            row_count = 0
-            max_rows_info = f"(limited to {max_rows} rows)" if max_rows else "(processing all rows)"
-            log_message(f"Starting row processing {max_rows_info}")
+        max_rows_info = f"(limited to {max_rows} rows)" if max_rows else "(processing all rows)"
+        log_message(f"Planning charges {max_rows_info}")
 
-            for i, row in enumerate(reader):
-                row_count += 1
-                
-                # Stop processing if max_rows limit is reached
-                if max_rows and row_count > max_rows:
-                    log_message(f"Reached maximum row limit ({max_rows}). Stopping processing.")
-                    break
-                    
-                log_message(f"\nProcessing row {row_count}...")
-                start_row_time = time.time()
-                
+        # Planning pass: every distinct charge is translated once, however many inmates share it
+        distinct_charges, total_charges, looked_up = plan_distinct_charges(read_rows(input_csv_path, encoding, delimiter, max_rows))
+        lookup_hits = statute_lookup.hits if statute_lookup else 0
+        log_message(f"Found {total_charges} charges: {lookup_hits} answered by the statute lookup, "
+                    f"{len(distinct_charges)} distinct charges left for the API")
+
+        api_calls_before = api_call_count
+        if concurrency > 0:
+            log_message(f"Async mode: {concurrency} requests in flight, {rpm} requests/min, {tpm} tokens/min")
+        explanations = translate_distinct(distinct_charges, concurrency, rpm, tpm)
+        api_calls = api_call_count - api_calls_before
+
+        # Fan the explanations back out to every row, in the original order, appending each to the output
+        log_message(f"Writing results to {output_csv_path} (in progress: {partial_path(output_csv_path)})...")
+        with StreamingCSVWriter(output_csv_path, header + ["AI_Description_Explanation"]) as writer:
+            for row in read_rows(input_csv_path, encoding, delimiter, max_rows):
                 # Ensure all header fields are present in the row, fill with empty string if not
                 current_row_values = [row.get(col, '') for col in header]
-                
-                description_text = row.get("Description", "")
-                desc_preview = description_text[:50] + ('...' if len(description_text) > 50 else '')
-                log_message(f"Row {row_count} description: {desc_preview}")
-                ai_explanations = []
-
-                if description_text and not description_text.isspace():
-                    individual_charges = description_text.split('|')
-                    log_message(f"Found {len(individual_charges)} charges in this row")
-                    
-                    for j, charge in enumerate(individual_charges):
-                        charge_cleaned = charge.strip()
-                        if charge_cleaned: # Ensure charge is not empty after stripping
-                            charge_preview = charge_cleaned[:30] + ('...' if len(charge_cleaned) > 30 else '')
-                            log_message(f"  Processing charge {j+1}/{len(individual_charges)}: '{charge_preview}'")
-                            
-                            # Try to get AI explanation with timeout/retry
-                            retry_count = 0
-                            max_retries = 3
-                            ai_explanation = None
-                            
-                            while retry_count < max_retries and ai_explanation is None:
-                                try:
-                                    ai_explanation = get_plain_english_charge(charge_cleaned)
-                                except Exception as e:
-                                    retry_count += 1
-                                    log_message(f"  API error on attempt {retry_count}/{max_retries}: {e}")
-                                    if retry_count < max_retries:
-                                        log_message(f"  Retrying in 2 seconds...")
-                                        time.sleep(2)
-                                    else:
-                                        ai_explanation = f"Error after {max_retries} attempts: Could not get explanation"
-                            
-                            if ai_explanation:
-                                explanation_preview = ai_explanation[:30] + ('...' if len(ai_explanation) > 30 else '')
-                                log_message(f"  API response received: {explanation_preview}")
-                                ai_explanations.append(ai_explanation)
-                        else:
-                            log_message(f"  Charge {j+1} is empty after stripping")
-                            ai_explanations.append("No specific charge provided") # Handle empty charge after split
-                else:
-                    log_message(f"  No description found for this row")
-                    ai_explanations.append("No description provided")
-
-                processed_rows.append(current_row_values + [" | ".join(ai_explanations)])
-                
-                row_time = time.time() - start_row_time
-                log_message(f"Row {row_count} completed in {row_time:.2f} seconds.")
-                
-                # Save intermediate results every 10 rows
-                if row_count % 10 == 0:
-                    try:
-                        temp_output = f"{output_csv_path}.partial"
-                        log_message(f"Saving intermediate results to {temp_output}...")
-                        with open(temp_output, mode='w', encoding='utf-8', newline='') as outfile:
-                            writer = csv.writer(outfile)
-                            writer.writerows(processed_rows)
-                        log_message(f"Intermediate results saved successfully")
-                    except Exception as e:
-                        log_message(f"Error saving intermediate results: {e}")
+                writer.writerow(current_row_values + [explain_row(row, looked_up, explanations)])
+        log_message(f"Successfully processed {writer.rows_written} rows and saved to {output_csv_path}")
 
+        log_message(f"Charge summary: {total_charges} charges, {len(distinct_charges)} distinct sent for translation, "
+                    f"{api_calls} API calls made, {total_charges - api_calls} calls saved "
+                    f"({lookup_hits} by the statute lookup, "
+                    f"{total_charges - lookup_hits - len(distinct_charges)} by deduplication, "
+                    f"{len(distinct_charges) - api_calls} by the explanation cache)")
+        if statute_lookup:
+            # Each distinct charge answered only by the lookup is a call that deduplication alone would have made
+            calls_avoided = len({key for _, key in looked_up} - distinct_charges.keys())
+            log_message(f"Statute lookup: {statute_lookup.summary(api_seconds / api_calls if api_calls else None, calls_avoided)}")
+        run_ledger.finish(output_csv_path, writer.rows_written, log=log_message)
     except FileNotFoundError:
         print(f"Error: Input file not found at {input_csv_path}")
         return
@@ -289,17 +405,6 @@ def process_mugshots(input_csv_path, output_csv_path, max_rows=None):
         traceback.print_exc()  # Print full stack trace
         return
 
-    try:
-        print(f"Processing complete. Writing results to {output_csv_path}...")
-        with open(output_csv_path, mode='w', encoding='utf-8', newline='') as outfile:
-            writer = csv.writer(outfile)
-            writer.writerows(processed_rows)
-        print(f"Successfully processed data and saved to {output_csv_path}")
-    except Exception as e:
-        print(f"Error writing to output file {output_csv_path}: {e}")
-        import traceback
-        traceback.print_exc()  # Print full stack trace
-
 if __name__ == "__main__":
     # Set up argument parsing
     parser = argparse.ArgumentParser(description='Process mugshot data with AI explanations.')
@@ -307,6 +412,15 @@ if __name__ == "__main__":
     parser.add_argument('--output', type=str, help='Output CSV file path')
     parser.add_argument('--max-rows', type=int, help='Maximum number of rows to process (for testing)')
     parser.add_argument('--model', type=str, help=f'OpenAI model to use (default: {EXPECTED_MODEL})')
+    parser.add_argument('--concurrency', type=int, default=0, help='Translate charges with this many API calls in flight (default: 0, one call at a time)')
+    parser.add_argument('--rpm', type=int, default=DEFAULT_RPM, help=f'Requests-per-minute budget for --concurrency (default: {DEFAULT_RPM})')
+    parser.add_argument('--tpm', type=int, default=DEFAULT_TPM, help=f'Tokens-per-minute budget for --concurrency (default: {DEFAULT_TPM})')
+    parser.add_argument('--cache', type=str, help=f'Explanation cache file (default: {DEFAULT_CACHE_FILENAME} in the script directory)')
+    parser.add_argument('--no-cache', action='store_true', help='Call the API for every charge without using the explanation cache')
+    parser.add_argument('--cache-max-entries', type=int, default=DEFAULT_MAX_ENTRIES, help=f'Evict least recently used explanations beyond this many (default: {DEFAULT_MAX_ENTRIES})')
+    parser.add_argument('--lookup', type=str, help=f'Curated statute lookup table (default: {DEFAULT_LOOKUP_FILENAME} in the script directory)')
+    parser.add_argument('--no-lookup', action='store_true', help='Send every charge to the API (or cache) without consulting the statute lookup')
+    parser.add_argument('--cache-max-age-days', type=float, default=DEFAULT_MAX_AGE_DAYS, help=f'Evict explanations older than this (default: {DEFAULT_MAX_AGE_DAYS})')
     
     args = parser.parse_args()
     
@@ -318,6 +432,7 @@ if __name__ == "__main__":
     # Use specified model if provided
     if args.model:
         EXPECTED_MODEL = args.model
+        run_ledger.model = EXPECTED_MODEL
         log_message(f"Using custom model: {EXPECTED_MODEL}")
 
     # For local execution, construct paths relative to the script's directory
@@ -336,6 +451,16 @@ if __name__ == "__main__":
     
     log_message(f"Input CSV: {input_csv_full_path}")
     log_message(f"Output CSV: {output_csv_full_path}")
+
+    if not args.no_cache:
+        cache_path = args.cache or os.path.join(script_dir, DEFAULT_CACHE_FILENAME)
+        charge_cache = ChargeCache(cache_path, EXPECTED_MODEL, PROMPT_VERSION,
+                                   args.cache_max_entries, args.cache_max_age_days)
+        log_message(f"Explanation cache: {cache_path} ({charge_cache.size()} entries, prompt version {PROMPT_VERSION})")
+    if not args.no_lookup:
+        lookup_path = args.lookup or os.path.join(script_dir, DEFAULT_LOOKUP_FILENAME)
+        statute_lookup = StatuteLookup(lookup_path)
+        log_message(f"Statute lookup: {lookup_path} (version {statute_lookup.version}, {len(statute_lookup)} entries)")
     log_message("Starting processing...")
     
     # Check if the input file exists before proceeding
@@ -358,13 +483,13 @@ if __name__ == "__main__":
         log_message(f"Verifying OpenAI model '{EXPECTED_MODEL}'...")
         start_time = time.time()
         
-        # Simple test call to verify the model exists and is accessible
-        test_response = client.chat.completions.create(
+        # Simple test call to verify the model exists and is accessible (retried like every other call)
+        test_response = call_with_retries(lambda attempt: client.chat.completions.create(
             model=EXPECTED_MODEL,
             messages=[{"role": "user", "content": "Test"}],
             max_tokens=5,
             timeout=20  # Add timeout
-        )
+        ), api_breaker, DEFAULT_RETRIES, log_message)
         
         elapsed = time.time() - start_time
         log_message(f"OpenAI model '{EXPECTED_MODEL}' verified successfully in {elapsed:.2f} seconds")
@@ -380,26 +505,21 @@ if __name__ == "__main__":
             log_message(f"TEST MODE: Processing only {max_rows} rows for testing")
             
         log_message("Running process_mugshots function with the provided paths...")
-        process_mugshots(input_csv_full_path, output_csv_full_path, max_rows)
+        process_mugshots(input_csv_full_path, output_csv_full_path, max_rows, args.concurrency, args.rpm, args.tpm)
         
         log_message("Processing completed successfully!")
         
     except KeyboardInterrupt:
-        log_message("\nOperation interrupted by user. Saving partial results if available...")
-        
-        if 'processed_rows' in locals() and len(processed_rows) > 1:
-            try:
-                temp_output = f"{output_csv_full_path}.interrupted"
-                with open(temp_output, mode='w', encoding='utf-8', newline='') as outfile:
-                    writer = csv.writer(outfile)
-                    writer.writerows(processed_rows)
-                log_message(f"Partial results saved to {temp_output}")
-            except Exception as e:
-                log_message(f"Error saving partial results: {e}")
-        
+        log_message("\nOperation interrupted by user.")
+        if os.path.exists(partial_path(output_csv_full_path)):
+            log_message(f"Rows written so far are in {partial_path(output_csv_full_path)}")
         log_message("Script terminated by user.")
     except Exception as e:
         log_message(f"Unexpected error: {e}")
         import traceback
         traceback.print_exc()
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
+    finally:
+        if charge_cache:
+            log_message(f"Explanation cache: {charge_cache.summary()}")
+            charge_cache.close()
\ No newline at end of file
@@ -7,6 +7,9 @@ import argparse
 from openai import OpenAI # You'll need to install this: pip install openai
 from dotenv import load_dotenv
 import pkg_resources  # To check installed packages
+from charge_ranker import ranked_rows
+from run_ledger import RunLedger
+from stream_writer import StreamingCSVWriter
 
 # Helper function for logging with timestamps
 def log_message(message):
@@ -16,7 +19,8 @@ def log_message(message):
 # Check for required packages
 required_packages = {
     "openai": ">=1.0.0",
-    "python-dotenv": ">=0.19.0"
+    "python-dotenv": ">=0.19.0",
+    "pandas": ">=1.0.0"
 }
 
 for package, version in required_packages.items():
@@ -48,6 +52,8 @@ else:
 
 client = OpenAI(api_key=api_key)
 EXPECTED_MODEL = "gpt-4.1-mini" # Default model, can be overridden by --model arg
+# Tokens and latency of every call (run_ledger.py); written next to the output CSV
+run_ledger = RunLedger(os.path.basename(__file__), EXPECTED_MODEL)
 
 def get_most_exciting_crime(ai_explanations_string):
     """
@@ -65,6 +71,7 @@ def get_most_exciting_crime(ai_explanations_string):
     if len(individual_explanations) == 1:
         return individual_explanations[0] # If only one, it's the most exciting by default
 
+    response = None
     try:
         start_time = time.time()
         log_message(f"Calling OpenAI API to determine most exciting crime from: {ai_explanations_string[:100]}...")
@@ -92,6 +99,7 @@ def get_most_exciting_crime(ai_explanations_string):
         exciting_crime = response.choices[0].message.content.strip()
         
         elapsed = time.time() - start_time
+        run_ledger.record_call("select", response.usage, elapsed)
         log_message(f"API call for exciting crime completed in {elapsed:.2f} seconds. Result: {exciting_crime}")
         
         time.sleep(0.5) # Avoid rate limiting
@@ -115,12 +123,26 @@ def get_most_exciting_crime(ai_explanations_string):
 
         return exciting_crime
     except Exception as e:
+        if response is None:
+            run_ledger.record_call("select", None, time.time() - start_time, ok=False)
         log_message(f"Error calling OpenAI API for exciting crime selection ('{ai_explanations_string[:50]}...'): {e}")
         # Fallback to the first explanation in case of error
         if individual_explanations:
             return individual_explanations[0]
         return "Error: Could not determine exciting crime"
 
+def ranked_explanation(row, position, explanations_column):
+    """
+    The explanation of the charge the local ranker picked, or None when the explanations don't line
+    up one-to-one with the row's Description column.
+    """
+    if position is None:
+        return None
+    explanations = (row.get(explanations_column) or "").split('|')
+    if len(explanations) != len((row.get("Description") or "").split('|')):
+        return None
+    return explanations[position].strip() or None
+
 def peek_csv_file(file_path, num_lines=5):
     """
     Function to examine the first few lines of a CSV file to help with debugging
@@ -144,11 +166,13 @@ def peek_csv_file(file_path, num_lines=5):
     except Exception as e:
         log_message(f"Error examining CSV file: {e}")
 
-def process_exciting_crimes(input_csv_path, output_csv_path, max_rows=None):
+def process_exciting_crimes(input_csv_path, output_csv_path, max_rows=None, ai_select=False):
     """
     Reads mugshot data with AI explanations, determines the most exciting crime, and writes to a new CSV.
+    The crime is picked by the local charge ranker unless `ai_select` is set or the input has no
+    Description column; rows whose explanations don't line up with their charges still ask the API.
     """
-    processed_rows = []
+    writer = None
     header = []
     
     log_message(f"Starting to process exciting crimes from: {input_csv_path}")
@@ -215,8 +239,13 @@ def process_exciting_crimes(input_csv_path, output_csv_path, max_rows=None):
             else:
                 log_message(f"'{required_column}' column found in CSV.")
 
-            output_header = header + ["Display_Crime"]
-            processed_rows.append(output_header)
+            use_ranker = not ai_select and "Description" in header
+            if use_ranker:
+                log_message("Picking display crimes with the local charge ranker.")
+
+            # Rows are appended to <output>.partial as they finish and renamed into place at the end
+            writer = StreamingCSVWriter(output_csv_path, header + ["Display_Crime"])
+            log_message(f"Writing rows to {writer.partial_path} as they are processed")
             log_message("Starting row processing...")
             
             file_size = os.path.getsize(input_csv_path)
@@ -240,7 +269,9 @@ def process_exciting_crimes(input_csv_path, output_csv_path, max_rows=None):
             max_rows_info = f"(limited to {max_rows} rows)" if max_rows else "(processing all rows)"
             log_message(f"Starting row processing {max_rows_info}")
 
-            for i, row in enumerate(reader):
+            ranker_picks = 0
+            rows = ranked_rows(reader) if use_ranker else ((row, None) for row in reader)
+            for i, (row, best_position) in enumerate(rows):
                 row_count += 1
                 
                 if max_rows and row_count > max_rows:
@@ -257,27 +288,26 @@ def process_exciting_crimes(input_csv_path, output_csv_path, max_rows=None):
                 log_message(f"Row {row_count} '{required_column}': {desc_preview}")
                 
                 display_crime = ""
-                if ai_explanations_text and not ai_explanations_text.isspace():
+                ranked = ranked_explanation(row, best_position, required_column)
+                if ranked is not None:
+                    display_crime = ranked
+                    ranker_picks += 1
+                elif ai_explanations_text and not ai_explanations_text.isspace():
                     display_crime = get_most_exciting_crime(ai_explanations_text)
                 else:
                     log_message(f"  No '{required_column}' found for this row, or it is empty.")
                     display_crime = "No AI explanation available"
 
-                processed_rows.append(current_row_values + [display_crime])
+                writer.writerow(current_row_values + [display_crime])
                 
                 row_time = time.time() - start_row_time
                 log_message(f"Row {row_count} completed in {row_time:.2f} seconds. Display Crime: {display_crime}")
-                
-                if row_count % 10 == 0:
-                    try:
-                        temp_output = f"{output_csv_path}.partial"
-                        log_message(f"Saving intermediate results to {temp_output}...")
-                        with open(temp_output, mode='w', encoding='utf-8', newline='') as outfile_temp:
-                            writer_temp = csv.writer(outfile_temp)
-                            writer_temp.writerows(processed_rows)
-                        log_message(f"Intermediate results saved successfully")
-                    except Exception as e:
-                        log_message(f"Error saving intermediate results: {e}")
+
+            if use_ranker:
+                log_message(f"Local charge ranker picked the display crime for {ranker_picks} rows.")
+
+            log_message(f"Processing complete. Moving final results into place at {output_csv_path}...")
+            writer.commit()
 
     except FileNotFoundError:
         log_message(f"Error: Input file not found at {input_csv_path}")
@@ -287,23 +317,12 @@ def process_exciting_crimes(input_csv_path, output_csv_path, max_rows=None):
         import traceback
         traceback.print_exc()
         return
+    finally:
+        if writer:
+            writer.abort()  # Keeps the rows written so far in .partial; does nothing once committed
 
-    try:
-        log_message(f"Processing complete. Writing final results to {output_csv_path}...")
-        with open(output_csv_path, mode='w', encoding='utf-8', newline='') as outfile_final:
-            writer_final = csv.writer(outfile_final)
-            writer_final.writerows(processed_rows)
-        log_message(f"Successfully processed data and saved to {output_csv_path}")
-        # Clean up partial file if main save is successful
-        partial_file = f"{output_csv_path}.partial"
-        if os.path.exists(partial_file):
-            os.remove(partial_file)
-            log_message(f"Removed partial file: {partial_file}")
-
-    except Exception as e:
-        log_message(f"Error writing to output file {output_csv_path}: {e}")
-        import traceback
-        traceback.print_exc()
+    log_message(f"Successfully processed {writer.rows_written} rows and saved to {output_csv_path}")
+    run_ledger.finish(output_csv_path, writer.rows_written, log=log_message)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Process mugshot data to find the most "exciting" crime for display.')
@@ -311,6 +330,7 @@ if __name__ == "__main__":
     parser.add_argument('--output', type=str, help='Output CSV file path for results')
     parser.add_argument('--max-rows', type=int, help='Maximum number of rows to process (for testing)')
     parser.add_argument('--model', type=str, help=f'OpenAI model to use (default: {EXPECTED_MODEL})')
+    parser.add_argument('--ai-select', action='store_true', help='Let the model pick the most exciting crime instead of the local charge ranker')
     
     args = parser.parse_args()
     
@@ -320,6 +340,7 @@ if __name__ == "__main__":
     
     if args.model:
         EXPECTED_MODEL = args.model
+        run_ledger.model = EXPECTED_MODEL
         log_message(f"Using custom model: {EXPECTED_MODEL}")
 
     script_dir = os.path.dirname(__file__)
@@ -362,7 +383,7 @@ if __name__ == "__main__":
             log_message(f"TEST MODE: Processing only {max_rows_to_process} rows.")
             
         log_message("Running process_exciting_crimes function...")
-        process_exciting_crimes(input_csv_full_path, output_csv_full_path, max_rows_to_process)
+        process_exciting_crimes(input_csv_full_path, output_csv_full_path, max_rows_to_process, args.ai_select)
         
         log_message("Exciting crime processing completed successfully!")
         
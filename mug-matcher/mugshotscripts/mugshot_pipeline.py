@@ -0,0 +1,396 @@
+import argparse
+import csv
+import heapq
+import os
+import queue
+import sys
+import threading
+import time
+
+import scrape
+import mugshot_ai_processor as ai
+import mugshot_exciting_crime_processor as display
+from charge_cache import ChargeCache, DEFAULT_CACHE_FILENAME, DEFAULT_MAX_ENTRIES, DEFAULT_MAX_AGE_DAYS
+from charge_ranker import ranked_rows
+from openai_async import DEFAULT_RPM, DEFAULT_TPM
+from page_archive import PageArchive
+from run_ledger import RunLedger
+from scrape_pipeline import DEFAULT_QUEUE_SIZE
+from scrape_session import create_session
+from statute_lookup import StatuteLookup, DEFAULT_LOOKUP_FILENAME
+from stream_writer import StreamingCSVWriter
+
+# End-to-end run of the data pipeline as one process, without the intermediate CSVs:
+#
+#   scrape.py -> mugshots_data.csv -> sort_mugshots.py -> sorted_mugshots.csv
+#     -> mugshot_ai_processor.py -> mugshot_ai_v1.csv -> mugshot_exciting_crime_processor.py
+#     -> mugshot_display_crimes.csv
+#
+# becomes a chain of generator stages that pass batches of rows along:
+#
+#   source      scrape (or --replay an archive, or read --input) on a background thread, feeding a
+#               bounded buffer; the scrape blocks when the buffer is full instead of running ahead
+#   sort        reorders rows by InmateID within --sort-window rows (a scrape already emits rows in
+#               ID order, so the default window of 0 only checks the order)
+#   explain     AI_Description_Explanation, as mugshot_ai_processor.py: statute lookup, explanation
+#               cache, then the API for distinct charges not explained earlier in the run
+#   display     Display_Crime, as mugshot_exciting_crime_processor.py: the local charge ranker
+#               (or the API with --ai-select)
+#
+# Each batch is whatever the source has buffered (up to --batch-rows), so the first rows are
+# explained and written while later IDs are still being scraped. The final output is streamed
+# through stream_writer.py; --scrape-output, --sorted-output and --ai-output also write a stage's
+# rows to disk, in the same format as the standalone scripts, for debugging or reuse.
+#
+# The progress journal of scrape.py is not used: rerun a range, or use scrape.py for long crawls.
+
+DEFAULT_BATCH_ROWS = 100
+DEFAULT_BUFFER_ROWS = 1000
+EXPLANATION_COLUMN = "AI_Description_Explanation"
+DISPLAY_COLUMN = "Display_Crime"
+
+log_message = ai.log_message
+
+_DONE = object()
+
+class StageStopped(Exception):
+    """Raised inside a source thread when the stages after it have stopped reading."""
+
+class StageBuffer:
+    """
+    Runs `produce(emit)` on a background thread and keeps at most `size` emitted rows buffered, so
+    the producer waits (rather than filling memory) when the stages after it fall behind.
+    An exception in `produce` is raised again in the consuming thread.
+    """
+
+    def __init__(self, produce, size=DEFAULT_BUFFER_ROWS):
+        self.queue = queue.Queue(maxsize=size)
+        self.error = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(produce,), daemon=True)
+        self.thread.start()
+
+    def _run(self, produce):
+        try:
+            produce(self._emit)
+        except StageStopped:
+            pass
+        except BaseException as e:
+            self.error = e
+        finally:
+            self._put(_DONE)
+
+    def _emit(self, row):
+        if self.stopped.is_set():
+            raise StageStopped()
+        self._put(row)
+
+    def _put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+        if item is not _DONE:
+            raise StageStopped()
+
+    def batches(self, max_rows):
+        """
+        Yields lists of up to max_rows rows: waits for the first row of a batch, then takes
+        whatever else is already buffered.
+        """
+        done = False
+        try:
+            while not done:
+                batch = []
+                item = self.queue.get()
+                while item is not _DONE:
+                    batch.append(item)
+                    if len(batch) >= max_rows:
+                        break
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                else:
+                    done = True
+                if batch:
+                    yield batch
+        finally:
+            self.stopped.set()
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+class RowSink:
+    """
+    scrape.py's ResultSink for the pipeline: found rows go to the next stage instead of a CSV.
+    Raw pages are still stored in the archive, if any.
+    """
+
+    def __init__(self, emit, archive=None):
+        self.emit = emit
+        self.archive = archive
+        self.metrics = None
+        self.counts = {"found": 0, "not_found": 0, "invalid": 0, "error": 0}
+
+    def add(self, inmate_id, outcome, row=None, page=None):
+        self.counts[outcome] += 1
+        if self.archive and page:
+            self.archive.put(inmate_id, *page)
+        if row:
+            self.emit(row)
+
+    def summary(self):
+        c = self.counts
+        return f"{c['found']} found, {c['not_found']} not found, {c['invalid']} invalid, {c['error']} errors"
+
+def scrape_source(args, ids, archive=None):
+    """Fetches and parses `ids` like scrape.py (same --concurrency/--rate/--workers modes)."""
+    def produce(emit):
+        sink = RowSink(emit, archive)
+        session = create_session(scrape.HEADERS, pool_size=args.pool_size or max(args.concurrency, 1))
+        started = time.time()
+        try:
+            scrape.fetch_ids(session, ids, sink, args)
+        finally:
+            session.close()
+            if archive:
+                archive.close()
+            log_message(f"Scrape stage done in {time.time() - started:.1f}s: {sink.summary()}")
+    return produce
+
+def replay_source(archive, ids=None):
+    def produce(emit):
+        sink = RowSink(emit)
+        try:
+            scrape.replay_archive(archive, sink, ids)
+        finally:
+            archive.close()
+            log_message(f"Replay stage done: {sink.summary()}")
+    return produce
+
+def csv_source(input_csv_path, max_rows=None):
+    def produce(emit):
+        for row in ai.read_rows(input_csv_path, "utf-8", ",", max_rows):
+            emit(row)
+    return produce
+
+def csv_fields(input_csv_path):
+    with open(input_csv_path, mode="r", encoding="utf-8", newline="") as infile:
+        return next(csv.reader(infile), [])
+
+def inmate_key(row):
+    """The row's InmateID as an int, or None when it is blank or not a number."""
+    try:
+        return int(float(row.get("InmateID")))
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+def sorted_by_id(batches, window=0):
+    """
+    Reorders rows by InmateID, holding back at most `window` rows (sort_mugshots.py sorts the whole
+    file). Rows further out of order than that are passed on late and counted in the log.
+    Rows without a numeric InmateID (e.g. from a hand-edited --input) are logged and dropped.
+    """
+    heap = []
+    sequence = 0
+    last_key = None
+    out_of_order = 0
+    skipped = 0
+
+    def release(keep):
+        nonlocal last_key, out_of_order
+        ready = []
+        while len(heap) > keep:
+            key, _, row = heapq.heappop(heap)
+            if last_key is not None and key < last_key:
+                out_of_order += 1
+            else:
+                last_key = key
+            ready.append(row)
+        return ready
+
+    for batch in batches:
+        for row in batch:
+            key = inmate_key(row)
+            if key is None:
+                skipped += 1
+                log_message(f"Skipping row with a blank or non-numeric InmateID: {row.get('InmateID')!r}")
+                continue
+            heapq.heappush(heap, (key, sequence, row))
+            sequence += 1
+        ready = release(window)
+        if ready:
+            yield ready
+    ready = release(0)
+    if ready:
+        yield ready
+    if skipped:
+        log_message(f"Warning: skipped {skipped} rows without a numeric InmateID")
+    if out_of_order:
+        log_message(f"Warning: {out_of_order} rows were more than --sort-window {window} rows out of InmateID order "
+                    f"and were written out of order")
+
+def explained(batches, concurrency=0, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM):
+    """
+    Adds AI_Description_Explanation to every row. Each distinct charge is translated once per run,
+    however many batches it appears in.
+    """
+    explanations = {}
+    for batch in batches:
+        distinct_charges, _, looked_up = ai.plan_distinct_charges(batch)
+        new_charges = {key: charge for key, charge in distinct_charges.items() if key not in explanations}
+        if new_charges:
+            explanations.update(ai.translate_distinct(new_charges, concurrency, rpm, tpm))
+        for row in batch:
+            row[EXPLANATION_COLUMN] = ai.explain_row(row, looked_up, explanations)
+        yield batch
+
+def with_display_crime(batches, ai_select=False):
+    """Adds Display_Crime to every row, picked by the local charge ranker unless ai_select is set."""
+    for batch in batches:
+        rows = ((row, None) for row in batch) if ai_select else ranked_rows(batch, len(batch))
+        for row, best_position in rows:
+            crime = display.ranked_explanation(row, best_position, EXPLANATION_COLUMN)
+            if crime is None:
+                explanations_text = row.get(EXPLANATION_COLUMN, "")
+                if explanations_text and not explanations_text.isspace():
+                    crime = display.get_most_exciting_crime(explanations_text)
+                else:
+                    crime = "No AI explanation available"
+            row[DISPLAY_COLUMN] = crime
+        yield batch
+
+def saved(batches, output_csv_path, fields):
+    """Passes batches on unchanged, also writing their rows to output_csv_path when it is set."""
+    if not output_csv_path:
+        yield from batches
+        return
+    with StreamingCSVWriter(output_csv_path, fields) as writer:
+        for batch in batches:
+            for row in batch:
+                writer.writerow([row.get(field, '') for field in fields])
+            yield batch
+    log_message(f"Saved {writer.rows_written} rows to {output_csv_path}")
+
+def run_pipeline(produce, fields, output_csv_path, args):
+    buffer = StageBuffer(produce, args.buffer_rows)
+    batches = saved(buffer.batches(args.batch_rows), args.scrape_output, fields)
+    batches = saved(sorted_by_id(batches, args.sort_window), args.sorted_output, fields)
+    fields = fields + [EXPLANATION_COLUMN]
+    batches = saved(explained(batches, args.ai_concurrency, args.rpm, args.tpm), args.ai_output, fields)
+    batches = with_display_crime(batches, args.ai_select)
+    fields = fields + [DISPLAY_COLUMN]
+
+    started = time.time()
+    first_row_seconds = None
+    log_message(f"Writing rows to {output_csv_path} as they are processed")
+    try:
+        with StreamingCSVWriter(output_csv_path, fields) as writer:
+            for batch in batches:
+                for row in batch:
+                    writer.writerow([row.get(field, '') for field in fields])
+                if first_row_seconds is None:
+                    first_row_seconds = time.time() - started
+                log_message(f"{writer.rows_written} rows written ({time.time() - started:.1f}s)")
+    finally:
+        batches.close()
+    log_message(f"Pipeline done in {time.time() - started:.1f}s: {writer.rows_written} rows saved to {output_csv_path}"
+                + (f", first row after {first_row_seconds:.1f}s" if first_row_seconds is not None else ""))
+    return writer.rows_written
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape, explain and pick display crimes in one streaming run.")
+    parser.add_argument('--input', help="Read rows from this CSV (e.g. mugshots_data.csv) instead of scraping.")
+    parser.add_argument('--max-rows', type=int, help="Maximum number of --input rows to process (for testing).")
+    parser.add_argument('--start-id', type=int, help=f"First ID to scrape. Default: {scrape.START_ID}")
+    parser.add_argument('--count', type=int, default=scrape.SEARCH_COUNT, help=f"Number of IDs to scan after the start ID. Default: {scrape.SEARCH_COUNT}")
+    parser.add_argument('--concurrency', type=int, default=0, help="Scrape with this many requests in flight. Default: 0 (sequential crawl).")
+    parser.add_argument('--rate', type=float, default=scrape.DEFAULT_RATE, help=f"Requests per second for --concurrency. Default: {scrape.DEFAULT_RATE}")
+    parser.add_argument('--base-url', default=scrape.BASE_URL, help="InmateDetail URL prefix; point this at a local stand-in server for testing.")
+    parser.add_argument('--pool-size', type=int, help="Maximum number of pooled keep-alive connections. Default: the --concurrency value.")
+    parser.add_argument('--workers', type=int, default=0, help="Parse pages on this many worker processes. Default: 0 (parse inline).")
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE, help=f"Fetched pages buffered ahead of the parse stage with --workers. Default: {DEFAULT_QUEUE_SIZE}")
+    parser.add_argument('--archive', help="Directory of the raw-page archive. Fetched pages are stored there when set.")
+    parser.add_argument('--replay', action='store_true', help="Read rows from --archive instead of scraping (all archived IDs, or --start-id/--count).")
+    parser.add_argument('--output', help="Output CSV. Default: mugshot_display_crimes.csv in the script directory.")
+    parser.add_argument('--scrape-output', help="Also save the scraped rows here (format of mugshots_data.csv).")
+    parser.add_argument('--sorted-output', help="Also save the sorted rows here (format of sorted_mugshots.csv).")
+    parser.add_argument('--ai-output', help="Also save the explained rows here (format of mugshot_ai_v1.csv).")
+    parser.add_argument('--sort-window', type=int, default=0, help="Rows held back to reorder by InmateID. Default: 0 (rows are expected in ID order).")
+    parser.add_argument('--batch-rows', type=int, default=DEFAULT_BATCH_ROWS, help=f"Maximum rows per batch passed between stages. Default: {DEFAULT_BATCH_ROWS}")
+    parser.add_argument('--buffer-rows', type=int, default=DEFAULT_BUFFER_ROWS, help=f"Maximum rows buffered between the source and the AI stages. Default: {DEFAULT_BUFFER_ROWS}")
+    parser.add_argument('--model', default=ai.EXPECTED_MODEL, help=f"OpenAI model to use. Default: {ai.EXPECTED_MODEL}")
+    parser.add_argument('--ai-concurrency', type=int, default=0, help="Translate charges with this many API calls in flight. Default: 0 (one call at a time).")
+    parser.add_argument('--rpm', type=int, default=DEFAULT_RPM, help=f"Requests-per-minute budget for --ai-concurrency. Default: {DEFAULT_RPM}")
+    parser.add_argument('--tpm', type=int, default=DEFAULT_TPM, help=f"Tokens-per-minute budget for --ai-concurrency. Default: {DEFAULT_TPM}")
+    parser.add_argument('--ai-select', action='store_true', help="Let the model pick the display crime instead of the local charge ranker.")
+    parser.add_argument('--cache', help=f"Explanation cache file. Default: {DEFAULT_CACHE_FILENAME} in the script directory.")
+    parser.add_argument('--no-cache', action='store_true', help="Call the API for every charge without using the explanation cache.")
+    parser.add_argument('--cache-max-entries', type=int, default=DEFAULT_MAX_ENTRIES, help=f"Evict least recently used explanations beyond this many. Default: {DEFAULT_MAX_ENTRIES}")
+    parser.add_argument('--cache-max-age-days', type=float, default=DEFAULT_MAX_AGE_DAYS, help=f"Evict explanations older than this. Default: {DEFAULT_MAX_AGE_DAYS}")
+    parser.add_argument('--lookup', help=f"Curated statute lookup table. Default: {DEFAULT_LOOKUP_FILENAME} in the script directory.")
+    parser.add_argument('--no-lookup', action='store_true', help="Send every charge to the API (or cache) without consulting the statute lookup.")
+    args = parser.parse_args()
+
+    if args.replay and not args.archive:
+        parser.error("--replay requires --archive")
+    if args.input and args.replay:
+        parser.error("--input and --replay are alternative sources")
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    output_csv_path = args.output or os.path.join(script_dir, "mugshot_display_crimes.csv")
+
+    # The two AI scripts share the model and one ledger for the whole run
+    ai.EXPECTED_MODEL = display.EXPECTED_MODEL = args.model
+    ai.run_ledger = display.run_ledger = RunLedger(os.path.basename(__file__), args.model)
+    if not args.no_cache:
+        cache_path = args.cache or os.path.join(script_dir, DEFAULT_CACHE_FILENAME)
+        ai.charge_cache = ChargeCache(cache_path, args.model, ai.PROMPT_VERSION,
+                                      args.cache_max_entries, args.cache_max_age_days)
+        log_message(f"Explanation cache: {cache_path} ({ai.charge_cache.size()} entries, prompt version {ai.PROMPT_VERSION})")
+    if not args.no_lookup:
+        lookup_path = args.lookup or os.path.join(script_dir, DEFAULT_LOOKUP_FILENAME)
+        ai.statute_lookup = StatuteLookup(lookup_path)
+        log_message(f"Statute lookup: {lookup_path} (version {ai.statute_lookup.version}, {len(ai.statute_lookup)} entries)")
+
+    try:
+        ai.client.models.retrieve(args.model)
+        log_message(f"OpenAI model '{args.model}' verified")
+    except Exception as e:
+        log_message(f"Error: Could not access OpenAI model '{args.model}'. Error: {e}")
+        sys.exit(1)
+
+    start_id = args.start_id if args.start_id is not None else scrape.START_ID
+    ids = range(start_id, start_id + args.count + 1)
+    if args.input:
+        log_message(f"Source: {args.input}")
+        produce = csv_source(args.input, args.max_rows)
+        fields = csv_fields(args.input)
+    elif args.replay:
+        archive = PageArchive(args.archive)
+        log_message(f"Source: archived pages in {args.archive}")
+        produce = replay_source(archive, ids if args.start_id is not None else None)
+        fields = scrape.FIELDNAMES
+    else:
+        archive = PageArchive(args.archive) if args.archive else None
+        log_message(f"Source: scraping IDs {ids.start} to {ids.stop - 1} from {args.base_url}")
+        produce = scrape_source(args, ids, archive)
+        fields = scrape.FIELDNAMES
+
+    try:
+        rows = run_pipeline(produce, fields, output_csv_path, args)
+        if ai.statute_lookup:
+            log_message(f"Statute lookup: {ai.statute_lookup.summary()}")
+        ai.run_ledger.finish(output_csv_path, rows, log=log_message)
+    except KeyboardInterrupt:
+        log_message("Operation interrupted by user. Rows written so far are in the .partial files.")
+    finally:
+        if ai.charge_cache:
+            log_message(f"Explanation cache: {ai.charge_cache.summary()}")
+            ai.charge_cache.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import asyncio
+import time
+
+from openai_retry import CircuitBreaker, call_with_retries_async, DEFAULT_RETRIES
+
+# Concurrent chat-completion calls for the AI enrichment scripts.
+# Instead of one blocking call followed by a fixed sleep, up to `concurrency` requests are kept in
+# flight on an AsyncOpenAI client. Two token buckets keep the run inside the account's limits:
+#
+#   requests per minute   one token per call
+#   tokens per minute     estimated prompt tokens + max_tokens per call, reserved before sending;
+#                         corrected to the reported usage (handed back or charged) afterwards
+#
+# Failed calls are retried under openai_retry's policy (error classification, Retry-After, jittered
+# backoff and a shared circuit breaker).
+#
+# With a run_ledger.RunLedger every call is recorded with its purpose, tokens, latency and retries.
+#
+# Results come back in the order the jobs were given (run_ordered), so output rows are identical
+# to a serial run whatever order the responses arrive in.
+#
+# Point OPENAI_BASE_URL at fake_openai_server.py to exercise this without an API key.
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RPM = 500
+DEFAULT_TPM = 200000
+
+def estimate_tokens(messages, max_tokens):
+    # ~4 characters per token for English text, plus a few tokens of overhead per message
+    prompt_tokens = sum(len(m["content"]) // 4 + 4 for m in messages)
+    return prompt_tokens + max_tokens
+
+class TokenBucket:
+    """
+    Refills continuously at `per_minute` units per minute. Holds at most one second's worth, so a run
+    never bursts a minute's budget up front and then trips the server's sliding-window limit.
+    A call larger than that waits for a full bucket and then takes the bucket into debt, which
+    later callers wait out, so the long-run rate stays at `per_minute` whatever the call sizes.
+    """
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self.capacity = max(per_minute / 60.0, 1.0)
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.per_minute / 60.0)
+        self.updated = now
+
+    async def acquire(self, amount):
+        if not self.per_minute:
+            return
+        needed = min(amount, self.capacity)  # An oversized call waits for a full bucket, not forever
+        async with self._lock:  # First come, first served: later callers queue behind a waiting one
+            self._refill()
+            while self.available < needed:
+                await asyncio.sleep((needed - self.available) * 60.0 / self.per_minute)
+                self._refill()
+            self.available -= amount  # Charged in full; may go below zero
+
+    def adjust(self, amount):
+        """Charges `amount` more (or, when negative, hands it back) once a call's actual usage is known."""
+        if self.per_minute and amount:
+            self._refill()
+            self.available = min(self.capacity, self.available - amount)
+
+class AsyncChatRunner:
+    """
+    Sends chat completions with bounded concurrency under RPM/TPM budgets.
+    `client` is an openai.AsyncOpenAI (created with max_retries=0); `log` is the calling script's log_message.
+    """
+
+    def __init__(self, client, model, concurrency=DEFAULT_CONCURRENCY, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM,
+                 retries=DEFAULT_RETRIES, breaker=None, ledger=None, log=print):
+        self.client = client
+        self.model = model
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.retries = retries
+        self.breaker = breaker or CircuitBreaker(log=log)
+        self.ledger = ledger
+        self.log = log
+        self.calls = 0
+        self.failures = 0
+        self.tokens_used = 0
+        self.seconds = 0.0  # Time spent in requests, not waiting for a slot or a token bucket
+
+    async def complete(self, messages, max_tokens=150, temperature=0.2, timeout=30, purpose="chat"):
+        """Returns the stripped response text. Raises the last error once all retries have failed."""
+        estimate = estimate_tokens(messages, max_tokens)
+        attempts = 0
+        request_seconds = 0.0
+
+        async def send(attempt):
+            nonlocal attempts, request_seconds
+            await self.requests.acquire(1)
+            await self.tokens.acquire(estimate)
+            try:
+                async with self.semaphore:
+                    paused = self.breaker.pause_remaining()
+                    if paused:  # A Retry-After arrived while this call waited for a slot
+                        await asyncio.sleep(paused)
+                    self.calls += 1
+                    attempts += 1
+                    started = time.monotonic()
+                    try:
+                        response = await self.client.chat.completions.create(
+                            model=self.model,
+                            messages=messages,
+                            max_tokens=max_tokens,
+                            temperature=temperature,
+                            timeout=timeout
+                        )
+                    finally:
+                        elapsed = time.monotonic() - started
+                        self.seconds += elapsed
+                        request_seconds += elapsed
+            except Exception:
+                self.failures += 1
+                raise
+            usage = getattr(response, "usage", None)
+            if usage and usage.total_tokens:
+                self.tokens_used += usage.total_tokens
+                self.tokens.adjust(usage.total_tokens - estimate)
+            if self.ledger:
+                self.ledger.record_call(purpose, usage, request_seconds, attempts)
+            return response.choices[0].message.content.strip()
+
+        try:
+            return await call_with_retries_async(send, self.breaker, self.retries, self.log)
+        except Exception:
+            if self.ledger:
+                self.ledger.record_call(purpose, None, request_seconds, attempts, ok=False)
+            raise
+
+    def summary(self):
+        return (f"{self.calls} API calls, {self.failures} failed attempts, {self.tokens_used} tokens used, "
+                f"{self.breaker.summary()}")
+
+async def run_ordered(jobs, worker, log=print, progress_every=25):
+    """
+    Runs `await worker(job)` for every job concurrently (the runner's semaphore bounds the actual
+    requests) and returns the results in the order of `jobs`.
+    """
+    done = 0
+    started = time.time()
+
+    async def run(job):
+        nonlocal done
+        result = await worker(job)
+        done += 1
+        if done % progress_every == 0 or done == len(jobs):
+            elapsed = time.time() - started
+            log(f"Completed {done}/{len(jobs)} ({done / elapsed if elapsed else 0:.1f}/s)")
+        return result
+
+    return await asyncio.gather(*(run(job) for job in jobs))
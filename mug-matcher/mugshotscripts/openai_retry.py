@@ -0,0 +1,248 @@
+import asyncio
+import email.utils
+import random
+import threading
+import time
+
+import openai
+
+# Retry policy shared by the AI enrichment scripts' API calls.
+#
+# classify_error() decides from the exception type (not its message) whether a failed call is
+# worth repeating:
+#
+#   rate_limit   429 rate limits                                  retry, honoring Retry-After
+#   transient    connection errors, timeouts, 408/409/5xx         retry with jittered backoff
+#   fatal        bad requests, auth, unknown model, used-up quota return the error straight away
+#
+# backoff_delay() waits at least as long as the server asked for, otherwise a random share of an
+# exponentially growing delay ("full jitter"), so concurrent callers don't retry in lockstep.
+#
+# One CircuitBreaker is shared by every call in a process. After `failure_threshold` transient
+# failures in a row it opens and all callers pause for `cooldown` seconds instead of each row
+# spending its retries against an API that is down. Then a single trial call is let through:
+# success closes the breaker, failure reopens it for twice as long (up to `max_cooldown`).
+# A Retry-After on a 429 also pauses every caller, not only the one that received it.
+#
+# Failures while the breaker is open don't use up a request's retries: during an outage rows
+# wait for the API to come back rather than being marked as errors one after another. Likewise a
+# 429 that says when to come back costs a wait, not an attempt. Both kinds of free wait together
+# are capped at MAX_FREE_WAITS per request; after that every failure counts against `retries`
+# again, so a permanent 5xx or an outage that never ends still fails the request instead of
+# looping forever.
+#
+# The OpenAI clients are created with max_retries=0 so this is the only retry layer.
+
+RATE_LIMIT = "rate_limit"
+TRANSIENT = "transient"
+FATAL = "fatal"
+
+RETRYABLE_STATUS_CODES = {408, 409}
+DEFAULT_RETRIES = 3
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 60.0
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_COOLDOWN = 30.0
+DEFAULT_MAX_COOLDOWN = 300.0
+MAX_FREE_WAITS = 10  # Retry-After waits and open-breaker waits per request that cost no attempt
+HALF_OPEN_POLL = 1.0  # How often callers re-check while another caller makes the trial call
+
+def classify_error(error):
+    if isinstance(error, openai.RateLimitError):
+        if getattr(error, "code", None) == "insufficient_quota":
+            return FATAL  # Billing, not pacing: waiting won't help
+        return RATE_LIMIT
+    if isinstance(error, openai.APIConnectionError):  # Includes APITimeoutError
+        return TRANSIENT
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500:
+            return TRANSIENT
+        return FATAL
+    return FATAL
+
+def retry_after_seconds(error):
+    """The delay the server asked for in Retry-After-Ms / Retry-After, or None."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return max(float(headers["retry-after-ms"]) / 1000.0, 0.0)
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            retry_at = email.utils.parsedate_to_datetime(value)  # HTTP-date form
+            return max(retry_at.timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt, retry_after=None, base=DEFAULT_BASE_DELAY, cap=DEFAULT_MAX_DELAY):
+    """Seconds to wait before retry number `attempt + 1`."""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after is not None:
+        delay = retry_after + random.uniform(0, base)  # Spread callers released by the same hint
+    return delay
+
+class CircuitBreaker:
+    """Thread-safe; call wait() (or wait_async()) before each request and record the outcome after it."""
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, cooldown=DEFAULT_COOLDOWN,
+                 max_cooldown=DEFAULT_MAX_COOLDOWN, log=print):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.log = log
+        self.state = "closed"
+        self.failures = 0
+        self.cooldown = cooldown
+        self.open_until = 0.0
+        self.paused_until = 0.0
+        self.trips = 0
+        self.paused_seconds = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def _delay(self):
+        """Seconds the caller must still wait, or 0 when it may send its request now."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == "open":
+                if now < self.open_until:
+                    return self.open_until - now
+                self.state = "half_open"
+                self._trial_in_flight = False
+                self.log("Circuit breaker half-open: sending one trial request.")
+            if now < self.paused_until:
+                return self.paused_until - now
+            if self.state == "half_open":
+                if self._trial_in_flight:
+                    return HALF_OPEN_POLL
+                self._trial_in_flight = True
+            return 0.0
+
+    def wait(self):
+        while True:
+            delay = self._delay()
+            if not delay:
+                return
+            time.sleep(delay)
+
+    async def wait_async(self):
+        while True:
+            delay = self._delay()
+            if not delay:
+                return
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds):
+        """Holds back every caller for `seconds` (a server Retry-After hint)."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def pause_remaining(self):
+        """Seconds left of a Retry-After pause, for callers that were already past wait()."""
+        with self._lock:
+            return max(self.paused_until - time.monotonic(), 0.0)
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                self.log("Circuit breaker closed: API calls are succeeding again.")
+            self.state = "closed"
+            self.failures = 0
+            self.cooldown = self.base_cooldown
+            self._trial_in_flight = False
+
+    def record_neutral(self):
+        """An error that says nothing about an outage (bad request, rate limit): frees the trial slot only."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """Counts a retryable failure. Returns True if the breaker is open afterwards."""
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open":
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            elif self.state == "open" or self.failures < self.failure_threshold:
+                return self.state == "open"
+            self.state = "open"
+            self.trips += 1
+            self.paused_seconds += self.cooldown
+            self._trial_in_flight = False
+            self.open_until = time.monotonic() + self.cooldown
+            self.log(f"Circuit breaker open after {self.failures} consecutive failures: "
+                     f"pausing all API calls for {self.cooldown:.0f}s.")
+            return True
+
+    def summary(self):
+        return f"circuit breaker tripped {self.trips} times ({self.paused_seconds:.0f}s paused)"
+
+def _next_attempt(error, attempt, waits, breaker, retries, log):
+    """
+    After a failed attempt: None to give up, or (attempt number, free waits so far, seconds to
+    wait) for the next try. Free waits (Retry-After hints, open breaker) don't advance the attempt.
+    """
+    log(f"OpenAI API error ({type(error).__name__}, attempt {attempt + 1}/{retries}): {error}")
+    kind = classify_error(error)
+    if kind == FATAL:
+        breaker.record_neutral()
+        log(f"Non-retryable API error: {type(error).__name__}.")
+        return None
+    retry_after = retry_after_seconds(error)
+    if retry_after is not None:
+        breaker.pause(retry_after)
+    if kind == RATE_LIMIT:
+        breaker.record_neutral()  # The API is up, just busy: the pause above is the global response
+        if retry_after is not None and waits < MAX_FREE_WAITS:
+            delay = backoff_delay(attempt, retry_after)
+            log(f"Rate limited; retrying in {delay:.2f} seconds as the server asked...")
+            return attempt, waits + 1, delay
+    elif breaker.record_failure() and waits < MAX_FREE_WAITS:
+        return attempt, waits + 1, 0.0  # The outage, not this request, is to blame: wait on the breaker for free
+    if attempt + 1 >= retries:
+        log("Max retries reached.")
+        return None
+    delay = backoff_delay(attempt, retry_after)
+    log(f"Retrying in {delay:.2f} seconds...")
+    return attempt + 1, waits, delay
+
+def call_with_retries(send, breaker, retries=DEFAULT_RETRIES, log=print):
+    """
+    Returns send(attempt). Re-raises the last error once it is fatal or `retries` attempts have failed.
+    """
+    attempt = waits = 0
+    while True:
+        breaker.wait()
+        try:
+            result = send(attempt)
+        except Exception as e:
+            step = _next_attempt(e, attempt, waits, breaker, retries, log)
+            if step is None:
+                raise
+            attempt, waits, delay = step
+            time.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
+
+async def call_with_retries_async(send, breaker, retries=DEFAULT_RETRIES, log=print):
+    """call_with_retries for coroutines: `send(attempt)` is awaited."""
+    attempt = waits = 0
+    while True:
+        await breaker.wait_async()
+        try:
+            result = await send(attempt)
+        except Exception as e:
+            step = _next_attempt(e, attempt, waits, breaker, retries, log)
+            if step is None:
+                raise
+            attempt, waits, delay = step
+            await asyncio.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
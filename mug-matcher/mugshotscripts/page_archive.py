@@ -0,0 +1,146 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Compressed, content-addressed archive of raw InmateDetail pages for scrape.py.
+# Every fetched page (including 404 bodies) is stored once per distinct content, so a later change
+# to the extractor or the CSV schema can be replayed from disk instead of re-crawling at 3 s per ID.
+#
+# Layout of an archive directory:
+#
+#   segments/segment-000001.zst   Compressed blobs appended back to back, each compressed on its
+#   segments/segment-000002.zst   own so it can be read with a single seek. zstd when the
+#   ...                           `zstandard` package is installed, gzip otherwise.
+#   index.jsonl                   One line per fetched page:
+#                                 {"id", "status", "sha256", "segment", "offset", "length", "fetched_at"}
+#
+# Pages with identical content (every 404, unchanged re-fetches) share one blob. The latest index
+# line for an InmateID wins.
+
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+INDEX_FILENAME = "index.jsonl"
+SEGMENTS_DIRNAME = "segments"
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+def _compressor_for(extension):
+    if extension == ".zst":
+        if zstandard is None:
+            raise RuntimeError("This archive segment is zstd-compressed; install it with: pip install zstandard")
+        return zstandard.ZstdCompressor(level=10).compress, zstandard.ZstdDecompressor().decompress
+    return (lambda data: gzip.compress(data, compresslevel=6)), gzip.decompress
+
+class PageArchive:
+    def __init__(self, path):
+        self.path = path
+        self.segments_dir = os.path.join(path, SEGMENTS_DIRNAME)
+        self.index_path = os.path.join(path, INDEX_FILENAME)
+        os.makedirs(self.segments_dir, exist_ok=True)
+        self.extension = ".zst" if zstandard is not None else ".gz"
+        self._lock = threading.Lock()
+        self.pages = {}  # inmate_id -> latest index record
+        self.blobs = {}  # sha256 -> (segment, offset, length)
+        self.stored_bytes = 0
+        self.raw_bytes = 0
+        self._load_index()
+        self._index_file = open(self.index_path, mode="a", encoding="utf-8")
+        self._segment_name = None
+        self._segment_file = None
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, mode="r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Half-written last line from a crash
+                self.pages[record["id"]] = record
+                self.blobs[record["sha256"]] = (record["segment"], record["offset"], record["length"])
+
+    def _open_segment(self):
+        existing = sorted(n for n in os.listdir(self.segments_dir) if n.startswith("segment-"))
+        if existing and existing[-1].endswith(self.extension):
+            name = existing[-1]
+            if os.path.getsize(os.path.join(self.segments_dir, name)) < SEGMENT_MAX_BYTES:
+                return name
+        number = int(existing[-1].split("-")[1].split(".")[0]) + 1 if existing else 1
+        return f"segment-{number:06d}{self.extension}"
+
+    def _append_blob(self, data):
+        if self._segment_file is None or self._segment_file.tell() >= SEGMENT_MAX_BYTES:
+            if self._segment_file is not None:
+                self._segment_file.close()
+            self._segment_name = self._open_segment()
+            self._segment_file = open(os.path.join(self.segments_dir, self._segment_name), mode="ab")
+        compress, _ = _compressor_for(self.extension)
+        blob = compress(data)
+        offset = self._segment_file.tell()
+        self._segment_file.write(blob)
+        self._segment_file.flush()
+        self.stored_bytes += len(blob)
+        return self._segment_name, offset, len(blob)
+
+    def put(self, inmate_id, status_code, html):
+        """Stores one fetched page. Returns True if its content was new to the archive."""
+        data = html.encode("utf-8")
+        sha256 = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            is_new = sha256 not in self.blobs
+            if is_new:
+                self.blobs[sha256] = self._append_blob(data)
+            self.raw_bytes += len(data)
+            segment, offset, length = self.blobs[sha256]
+            record = {
+                "id": inmate_id,
+                "status": status_code,
+                "sha256": sha256,
+                "segment": segment,
+                "offset": offset,
+                "length": length,
+                "fetched_at": round(time.time(), 3),
+            }
+            self.pages[inmate_id] = record
+            # The blob is flushed before its index line, so the index never points past a segment's end
+            self._index_file.write(json.dumps(record) + "\n")
+            self._index_file.flush()
+        return is_new
+
+    def _read_blob(self, segment, offset, length, handles):
+        handle = handles.get(segment)
+        if handle is None:
+            handle = handles[segment] = open(os.path.join(self.segments_dir, segment), mode="rb")
+        handle.seek(offset)
+        _, decompress = _compressor_for(os.path.splitext(segment)[1])
+        return decompress(handle.read(length)).decode("utf-8")
+
+    def iter_pages(self, ids=None):
+        """Yields (inmate_id, status_code, html) in InmateID order, optionally restricted to `ids`."""
+        wanted = sorted(self.pages) if ids is None else sorted(i for i in ids if i in self.pages)
+        handles = {}
+        try:
+            for inmate_id in wanted:
+                record = self.pages[inmate_id]
+                html = self._read_blob(record["segment"], record["offset"], record["length"], handles)
+                yield inmate_id, record["status"], html
+        finally:
+            for handle in handles.values():
+                handle.close()
+
+    def summary(self):
+        return (f"{len(self.pages)} pages, {len(self.blobs)} distinct blobs, "
+                f"{self.stored_bytes / 1024:.0f} KB written this run for {self.raw_bytes / 1024:.0f} KB of HTML")
+
+    def close(self):
+        with self._lock:
+            self._index_file.close()
+            if self._segment_file is not None:
+                self._segment_file.close()
+                self._segment_file = None
@@ -0,0 +1,238 @@
+from bs4 import BeautifulSoup
+
+# InmateDetail extraction.
+# The original extractor (extract_inmate_data) runs a full-tree soup.find for the name, the photo,
+# each of the eight labelled fields and the validity check, then a find_all over every panel.
+# When lxml is installed, parse_inmate_page instead walks lxml's element tree once, picking each
+# of those up as it passes, and only reads charge panels from their own (small) subtrees. Helpers
+# reproduce get_text(strip=True), .string and class_ matching, so the output is identical.
+#
+# Building a BeautifulSoup tree costs far more than the lookups, so a single walk over a soup
+# tree is no faster than the original (bench_extract.py). Without lxml, and for documents lxml
+# refuses, parse_inmate_page runs the original extractor on html.parser.
+
+PHOTO_BASE = "https://apps.sheriff.org"
+
+PERSON_FIELDS = ["Race", "Sex", "DOB", "Height", "Weight", "Hair", "Eyes", "Location"]
+
+try:
+    import lxml.html
+    from lxml.etree import ParserError
+    DEFAULT_PARSER = "lxml"
+except ImportError:
+    lxml = None
+    DEFAULT_PARSER = "html.parser"
+
+def _class_matches(classes, class_string):
+    # Same rule as soup.find(..., class_="a b"): match one class value or the whole attribute string
+    if not classes:
+        return False
+    return class_string in classes or " ".join(classes) == class_string
+
+def _build_data(inmate_id, name, mugshot_url, fields, charges):
+    data = {
+        "InmateID": inmate_id,
+        "Name": name or "",
+        "MugshotURL": mugshot_url or "",
+    }
+    for field in PERSON_FIELDS:
+        data[field] = fields.get(field, "")
+    data["Charges"] = charges
+    return data
+
+# --- lxml element tree ---
+
+# libxml2 turns CR LF into LF, html.parser keeps it (the site serves CR LF line endings). CRs are
+# swapped for a private-use character before parsing and put back in every string read.
+CR_STAND_IN = "\ue000"
+
+def _lx_restore(text):
+    return text.replace(CR_STAND_IN, "\r") if text else text
+
+def _lx_classes(el):
+    value = el.get("class")
+    return value.split() if value else None
+
+def _lx_text(el):
+    # BeautifulSoup's get_text(strip=True): every text node stripped, empties dropped, no separator
+    return "".join(_lx_restore(s).strip() for s in el.itertext())
+
+def _lx_string(el):
+    # BeautifulSoup's .string: the text of a tag whose only child is a single string (recursively)
+    children = list(el)
+    if not children:
+        return _lx_restore(el.text)
+    if len(children) == 1 and not el.text and not children[0].tail:
+        child = children[0]
+        return _lx_string(child) if isinstance(child.tag, str) else _lx_restore(child.text)
+    return None
+
+def _lx_nested_span_text(label):
+    span = next(label.itersiblings("span"), None)
+    if span is None:
+        return ""
+    inner_span = next(span.iterdescendants("span"), None)
+    return _lx_text(inner_span if inner_span is not None else span)
+
+def _lx_read_charge_panel(panel):
+    has_heading = False
+    rows = []
+    for div in panel.iterdescendants("div"):
+        classes = _lx_classes(div)
+        if not has_heading and _class_matches(classes, "panel-heading") and _lx_string(div) == "Charge":
+            has_heading = True
+        if _class_matches(classes, "row"):
+            rows.append(div)
+    if not has_heading:
+        return None
+    charge = {}
+    for row in rows:
+        labels = []
+        spans = []
+        for el in row.iterdescendants("label", "span"):
+            if el.tag == "label":
+                labels.append(el)
+            elif _class_matches(_lx_classes(el), "inputWarning"):
+                spans.append(el)
+        for lbl, spn in zip(labels, spans):
+            charge[_lx_text(lbl)] = _lx_text(spn)
+    return charge
+
+def _parse_lxml(html, inmate_id):
+    if CR_STAND_IN in html:
+        return reference_parse(html, inmate_id)
+    try:
+        root = lxml.html.document_fromstring(html.replace("\r", CR_STAND_IN))
+    except (ParserError, ValueError):
+        # Empty document, or an XML encoding declaration lxml refuses on str input
+        return reference_parse(html, inmate_id)
+
+    name = None
+    mugshot_url = None
+    fields = {}
+    valid = False
+    charges = []
+
+    for el in root.iter("label", "div", "h3", "img"):
+        tag = el.tag
+        if tag == "label":
+            text = _lx_string(el)
+            if text in PERSON_FIELDS and text not in fields:
+                fields[text] = _lx_nested_span_text(el)
+        elif tag == "div":
+            classes = _lx_classes(el)
+            if not valid and _class_matches(classes, "panel-heading") and _lx_string(el) == "Inmate Information":
+                valid = True
+            elif _class_matches(classes, "panel panel-warning"):
+                charge = _lx_read_charge_panel(el)
+                if charge:
+                    charges.append(charge)
+        elif tag == "h3":
+            if name is None:
+                name = _lx_text(el)
+        elif mugshot_url is None:
+            src = _lx_restore(el.get("src"))
+            if src and src.startswith("/thumbs/"):
+                mugshot_url = PHOTO_BASE + src
+
+    if not valid:
+        return None
+    return _build_data(inmate_id, name, mugshot_url, fields, charges)
+
+# --- Reference extractor (BeautifulSoup) ---
+
+def extract_inmate_data(soup, inmate_id):
+    # Extract inmate name from h3 tag
+    name_tag = soup.find("h3")
+    name = name_tag.get_text(strip=True) if name_tag else ""
+
+    # Extract mugshot photo
+    photo_tag = soup.find("img", {"src": lambda x: x and x.startswith("/thumbs/")})
+    mugshot_url = PHOTO_BASE + photo_tag["src"] if photo_tag else ""
+
+    # Extract fields
+    def get_label_value(label):
+        lbl = soup.find("label", string=label)
+        if not lbl:
+            return ""
+        span = lbl.find_next_sibling("span")
+        if not span:
+            return ""
+        val = span.get_text(strip=True)
+        return val
+
+    # Some fields are in nested spans
+    def get_label_value_nested(label):
+        lbl = soup.find("label", string=label)
+        if not lbl:
+            return ""
+        span = lbl.find_next_sibling("span")
+        if not span:
+            return ""
+        inner_span = span.find("span")
+        if inner_span:
+            return inner_span.get_text(strip=True)
+        return span.get_text(strip=True)
+
+    race = get_label_value_nested("Race")
+    sex = get_label_value_nested("Sex")
+    dob = get_label_value_nested("DOB")
+    height = get_label_value_nested("Height")
+    weight = get_label_value_nested("Weight")
+    hair = get_label_value_nested("Hair")
+    eyes = get_label_value_nested("Eyes")
+    location = get_label_value_nested("Location")
+
+    # Extract all charges
+    charges = []
+    for panel in soup.find_all("div", class_="panel panel-warning"):
+        if not panel.find("div", class_="panel-heading", string="Charge"):
+            continue
+        charge = {}
+        rows = panel.find_all("div", class_="row")
+        for row in rows:
+            labels = row.find_all("label")
+            spans = row.find_all("span", class_="inputWarning")
+            for lbl, spn in zip(labels, spans):
+                key = lbl.get_text(strip=True)
+                val = spn.get_text(strip=True)
+                charge[key] = val
+        if charge:
+            charges.append(charge)
+
+    return {
+        "InmateID": inmate_id,
+        "Name": name,
+        "MugshotURL": mugshot_url,
+        "Race": race,
+        "Sex": sex,
+        "DOB": dob,
+        "Height": height,
+        "Weight": weight,
+        "Hair": hair,
+        "Eyes": eyes,
+        "Location": location,
+        "Charges": charges
+    }
+
+def is_valid_inmate_page(soup):
+    # Heuristic: must have "Inmate Information" panel
+    return soup.find("div", class_="panel-heading", string="Inmate Information") is not None
+
+def reference_parse(html, inmate_id):
+    """The original extractor on html.parser: one soup.find per field, then a find_all for charges."""
+    soup = BeautifulSoup(html, "html.parser")
+    if not is_valid_inmate_page(soup):
+        return None
+    return extract_inmate_data(soup, inmate_id)
+
+def parse_inmate_page(html, inmate_id, parser=None):
+    """
+    Parses an InmateDetail page. Returns the same dict as extract_inmate_data, or None when the
+    page is not a valid inmate page (no "Inmate Information" panel). `parser` is "lxml" (the
+    single walk, the default when lxml is installed) or "html.parser" (the reference extractor).
+    """
+    parser = parser or DEFAULT_PARSER
+    if parser == "lxml" and lxml is not None:
+        return _parse_lxml(html, inmate_id)
+    return reference_parse(html, inmate_id)
@@ -1,13 +1,24 @@
-import pandas as pd
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 import os
 import csv
+import heapq
+import itertools
+import tempfile
+from collections import deque
 from dotenv import load_dotenv
 import time
 import datetime
 import argparse
 import sys
+import asyncio
 import pkg_resources
+from openai_async import AsyncChatRunner, DEFAULT_RPM, DEFAULT_TPM
+from openai_retry import CircuitBreaker, call_with_retries, DEFAULT_RETRIES
+from statute_lookup import StatuteLookup, DEFAULT_LOOKUP_FILENAME
+from charge_cache import ChargeCache, prompt_version, DEFAULT_CACHE_FILENAME
+from charge_ranker import ranked_rows
+from run_ledger import RunLedger
+from stream_writer import StreamingCSVWriter
 
 # Helper function for logging with timestamps
 def log_message(message):
@@ -48,18 +59,33 @@ if not api_key:
 else:
     log_message("OpenAI API Key loaded successfully.")
 
-client = OpenAI(api_key=api_key)
+client = OpenAI(api_key=api_key, max_retries=0)  # call_openai_api does the retrying
+api_breaker = CircuitBreaker(log=log_message)  # Shared by every API call in the run
 DEFAULT_MODEL = "gpt-4.1-mini"
 current_model = DEFAULT_MODEL
-
-def call_openai_api(messages, max_tokens=150, temperature=0.2, timeout=30):
-    """Helper function to call OpenAI API with error handling and retries."""
-    global current_model
-    retries = 3
-    for attempt in range(retries):
+# Curated explanations for fixed procedural charges (statute_lookup.py); a hit skips the reword call
+statute_lookup = None
+# Reworded charges from earlier runs (charge_cache.py); opened in main() once the model is known
+reword_cache = None
+api_calls = 0
+api_seconds = 0.0
+# Tokens, latency, retries and cache status of every call (run_ledger.py); written next to the output CSV
+run_ledger = RunLedger(os.path.basename(__file__), DEFAULT_MODEL)
+
+def call_openai_api(messages, max_tokens=150, temperature=0.2, timeout=30, purpose="chat"):
+    """Helper function to call OpenAI API with error handling and retries (see openai_retry)."""
+    retries = DEFAULT_RETRIES
+    attempts = 0
+    request_seconds = 0.0
+
+    def send(attempt):
+        global api_calls, api_seconds
+        nonlocal attempts, request_seconds
+        log_message(f"Calling OpenAI API (model: {current_model}, attempt {attempt+1}/{retries})...")
+        api_calls += 1
+        attempts += 1
+        start_time = time.time()
         try:
-            log_message(f"Calling OpenAI API (model: {current_model}, attempt {attempt+1}/{retries})...")
-            start_time = time.time()
             response = client.chat.completions.create(
                 model=current_model,
                 messages=messages,
@@ -67,75 +93,282 @@ def call_openai_api(messages, max_tokens=150, temperature=0.2, timeout=30):
                 temperature=temperature,
                 timeout=timeout
             )
+        finally:
             elapsed = time.time() - start_time
-            log_message(f"API call successful in {elapsed:.2f} seconds.")
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            log_message(f"OpenAI API error (attempt {attempt+1}/{retries}): {str(e)}")
-            if attempt < retries - 1:
-                time.sleep(2 ** attempt) # Exponential backoff
-            else:
-                log_message("Max retries reached. API call failed.")
-                return f"Error: API call failed after {retries} attempts."
+            request_seconds += elapsed
+        api_seconds += elapsed
+        log_message(f"API call successful in {elapsed:.2f} seconds.")
+        run_ledger.record_call(purpose, response.usage, request_seconds, attempts)
+        return response.choices[0].message.content.strip()
 
-def identify_most_interesting_raw_charge(raw_description_string):
+    try:
+        return call_with_retries(send, api_breaker, retries, log_message)
+    except Exception as e:
+        log_message("API call failed.")
+        run_ledger.record_call(purpose, None, request_seconds, attempts, ok=False)
+        return f"Error: API call failed due to: {type(e).__name__}."
+
+async def call_openai_api_async(runner, messages, max_tokens=150, temperature=0.2, timeout=30, purpose="chat"):
+    """call_openai_api for the async mode; retries and pacing are handled by the runner."""
+    try:
+        return await runner.complete(messages, max_tokens=max_tokens, temperature=temperature, timeout=timeout, purpose=purpose)
+    except Exception as e:
+        log_message("API call failed.")
+        return f"Error: API call failed due to: {type(e).__name__}."
+
+def split_raw_charges(raw_description_string):
     """
-    Identifies the most interesting charge from a pipe-separated string of raw charge descriptions.
+    Returns (charges, None), or (None, placeholder) when there is nothing to send to the API.
     """
     if not raw_description_string or raw_description_string.isspace():
-        return "No raw charges provided"
+        return None, "No raw charges provided"
 
     charges = [charge.strip() for charge in raw_description_string.split('|') if charge.strip()]
     if not charges:
-        return "No valid charges found after parsing"
+        return None, "No valid charges found after parsing"
     
     if len(charges) == 1:
-        return charges[0]
+        return None, charges[0]
+    return charges, None
 
+def interesting_charge_messages(charges):
     charge_list_str = "\n".join([f"{i+1}. {charge}" for i, charge in enumerate(charges)])
     
     system_prompt = "You are an assistant that analyzes criminal charge descriptions. Given a list of charge descriptions for an individual, identify and return only the text of the single most interesting, unusual, or serious charge. Do not add any extra explanation, disclaimers, or commentary."
     user_prompt = f"From the following list of charge descriptions, select and return the text of the single most interesting, unusual, or serious one:\n{charge_list_str}"
 
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt}
     ]
-    
-    selected_charge = call_openai_api(messages, max_tokens=200) # Increased max_tokens for potentially long charge descriptions
 
+def check_selected_charge(selected_charge, charges):
     if selected_charge.startswith("Error:") or selected_charge not in charges:
          # Fallback: if AI fails or returns something not in the list, pick the first one.
         log_message(f"AI selection error or invalid response ('{selected_charge}'). Defaulting to the first charge.")
         return charges[0]
     return selected_charge
 
+def identify_most_interesting_raw_charge(raw_description_string):
+    """
+    Identifies the most interesting charge from a pipe-separated string of raw charge descriptions.
+    """
+    charges, answer = split_raw_charges(raw_description_string)
+    if charges is None:
+        return answer
+    selected_charge = call_openai_api(interesting_charge_messages(charges), max_tokens=200, purpose="select") # Increased max_tokens for potentially long charge descriptions
+    return check_selected_charge(selected_charge, charges)
+
+def can_reword(charge_text):
+    return not (not charge_text or charge_text.isspace() or charge_text.startswith("Error:") or charge_text == "No raw charges provided" or charge_text == "No valid charges found after parsing")
+
+def reword_messages(charge_text):
+    return [
+        {"role": "system", "content": "You are a helpful assistant that rewrites legal charge descriptions into plain, concise English suitable for an average person to understand. Aim for clarity and brevity, ideally under 15 words. Return only the rephrased charge description. For example, 'UTTERING FORGED INSTRUMENT' could be 'Using a fake document'. 'FAILURE TO APPEAR - MISDEMEANOR' could be 'Missed court for a minor offense'."},
+        {"role": "user", "content": f"Rewrite this charge description in plain English: \"{{{charge_text}}}\""}
+    ]
+
+def lookup_charge(charge_text):
+    """The statute lookup's curated explanation for a charge, or None."""
+    if statute_lookup is None:
+        return None
+    return statute_lookup.get(charge_text)
+
+REWORD_MAX_TOKENS = 60
+REWORD_TEMPERATURE = 0.1
+# Changes whenever the reword prompt or its settings change, so cached rewordings are never reused across prompts
+REWORD_PROMPT_VERSION = prompt_version(*[m["content"] for m in reword_messages("{charge}")], REWORD_TEMPERATURE, REWORD_MAX_TOKENS)
+
+def known_rewording(charge_text):
+    """A rewording that needs no API call, from the statute lookup or the reword cache, or None."""
+    looked_up = lookup_charge(charge_text)
+    if looked_up is not None:
+        run_ledger.record_cache("lookup")
+        return looked_up
+    if reword_cache:
+        cached = reword_cache.get(charge_text)
+        run_ledger.record_cache("miss" if cached is None else "hit")
+        return cached
+    return None
+
+def remember_rewording(charge_text, reworded):
+    # Only successful responses are cached; errors are retried on the next run
+    if reword_cache and not reworded.startswith("Error:"):
+        reword_cache.put(charge_text, reworded)
+    return reworded
 
 def reword_single_charge(charge_text):
     """
     Rewords a single charge description into plain English.
     """
-    if not charge_text or charge_text.isspace() or charge_text.startswith("Error:") or charge_text == "No raw charges provided" or charge_text == "No valid charges found after parsing":
+    if not can_reword(charge_text):
         return "Cannot reword invalid/empty charge"
+    known = known_rewording(charge_text)
+    if known is not None:
+        return known
+    reworded = call_openai_api(reword_messages(charge_text), max_tokens=REWORD_MAX_TOKENS, temperature=REWORD_TEMPERATURE,
+                               purpose="reword")
+    return remember_rewording(charge_text, reworded)
 
-    messages = [
-        {"role": "system", "content": "You are a helpful assistant that rewrites legal charge descriptions into plain, concise English suitable for an average person to understand. Aim for clarity and brevity, ideally under 15 words. Return only the rephrased charge description. For example, 'UTTERING FORGED INSTRUMENT' could be 'Using a fake document'. 'FAILURE TO APPEAR - MISDEMEANOR' could be 'Missed court for a minor offense'."},
-        {"role": "user", "content": f"Rewrite this charge description in plain English: \"{{{charge_text}}}\""}
-    ]
-    
-    return call_openai_api(messages, max_tokens=60, temperature=0.1)
+SORT_CHUNK_ROWS = 10000
+ASYNC_WINDOW_PER_CALL = 4  # Rows started per request in flight; bounds the rows held by the async mode
+
+def parse_inmate_id(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return None
 
+def read_sorted_rows(reader, chunksize=SORT_CHUNK_ROWS):
+    """
+    Returns (rows of a csv.DictReader sorted by InmateID, number of rows). The input is sorted a
+    chunk at a time; when it is larger than one chunk the sorted chunks are spilled to temporary
+    files and merged, so at most one chunk is held in memory. Equal IDs keep their input order.
+    Rows with more fields than the header or without a numeric InmateID are skipped.
+    """
+    fields = reader.fieldnames
+    runs = []
+    chunk = []
+    total = skipped = 0
+
+    def spill(chunk):
+        run = tempfile.TemporaryFile(mode="w+", encoding="utf-8", newline="")
+        writer = csv.writer(run)
+        for key, row in chunk:
+            writer.writerow([key] + [row.get(field) or "" for field in fields])
+        run.seek(0)
+        runs.append(run)
+
+    for row in reader:
+        key = parse_inmate_id(row.get("InmateID"))
+        if key is None or None in row:
+            skipped += 1
+            continue
+        row["InmateID"] = str(key)
+        chunk.append((key, row))
+        total += 1
+        if len(chunk) >= chunksize:
+            chunk.sort(key=lambda item: item[0])
+            spill(chunk)
+            chunk = []
+    chunk.sort(key=lambda item: item[0])
+    if skipped:
+        log_message(f"Skipped {skipped} rows with a missing or non-numeric InmateID or too many fields.")
+    if not runs:
+        return (row for _, row in chunk), total
+    if chunk:
+        spill(chunk)
+    log_message(f"Sorting {total} rows in {len(runs)} chunks of {chunksize}.")
+
+    def read_run(run):
+        for values in csv.reader(run):
+            yield int(values[0]), dict(zip(fields, values[1:]))
+
+    def merged():
+        try:
+            for _, row in heapq.merge(*(read_run(run) for run in runs), key=lambda item: item[0]):
+                yield row
+        finally:
+            for run in runs:
+                run.close()
+
+    return merged(), total
+
+def has_raw_charges(raw_charges):
+    return bool(raw_charges) and not raw_charges.isspace()
+
+def ranked_charge(row, best_position):
+    """The charge the local ranker picked (ranked_rows' position in Description) as text."""
+    if best_position is None:
+        return "No valid charges found after parsing"
+    return row['Description'].split('|')[best_position].strip()
+
+async def process_charges_async(rows, write_row, concurrency, rpm, tpm):
+    """
+    Runs the identify + reword steps for (row, locally ranked charge or None) pairs concurrently.
+    Without a ranked charge the model picks one first. Each row is handed to write_row(row, result)
+    in input order as soon as it and every row before it are done; at most
+    concurrency * ASYNC_WINDOW_PER_CALL rows are in progress at a time.
+    """
+    runner = AsyncChatRunner(AsyncOpenAI(api_key=api_key, max_retries=0), current_model, concurrency, rpm, tpm,
+                             breaker=api_breaker, ledger=run_ledger, log=log_message)
+
+    async def process_one(raw_charges, interesting_charge_raw):
+        if not has_raw_charges(raw_charges):
+            return "No raw charges listed"
+        if interesting_charge_raw is None:
+            charges, interesting_charge_raw = split_raw_charges(raw_charges)
+            if charges is not None:
+                selected_charge = await call_openai_api_async(runner, interesting_charge_messages(charges), max_tokens=200,
+                                                              purpose="select")
+                interesting_charge_raw = check_selected_charge(selected_charge, charges)
+        if not can_reword(interesting_charge_raw):
+            return "Cannot reword invalid/empty charge"
+        known = known_rewording(interesting_charge_raw)
+        if known is not None:
+            return known
+        reworded = await call_openai_api_async(runner, reword_messages(interesting_charge_raw),
+                                               max_tokens=REWORD_MAX_TOKENS, temperature=REWORD_TEMPERATURE, purpose="reword")
+        return remember_rewording(interesting_charge_raw, reworded)
+
+    global api_calls, api_seconds
+    window = max(concurrency * ASYNC_WINDOW_PER_CALL, 1)
+    in_flight = deque()
+    done = 0
+    started = time.time()
+
+    async def write_oldest():
+        nonlocal done
+        row, task = in_flight.popleft()
+        write_row(row, await task)
+        done += 1
+        if done % 25 == 0:
+            elapsed = time.time() - started
+            log_message(f"Completed {done} inmates ({done / elapsed if elapsed else 0:.1f}/s)")
+
+    try:
+        for row, interesting_charge_raw in rows:
+            raw_charges = row.get('Description') or ''
+            in_flight.append((row, asyncio.create_task(process_one(raw_charges, interesting_charge_raw))))
+            if len(in_flight) >= window:
+                await write_oldest()
+        while in_flight:
+            await write_oldest()
+    finally:
+        for _, task in in_flight:
+            task.cancel()
+        api_calls += runner.calls
+        api_seconds += runner.seconds
+        log_message(f"Async mode: {runner.summary()}")
+        await runner.client.close()
+
+def log_run_summary(output_csv_path, inmates):
+    if statute_lookup:
+        seconds_per_call = api_seconds / api_calls if api_calls else None
+        log_message(f"Statute lookup: {statute_lookup.summary(seconds_per_call, statute_lookup.hits)}")
+    if reword_cache:
+        log_message(f"Reword cache: {reword_cache.summary()}")
+    run_ledger.finish(output_csv_path, inmates, log=log_message)
 
 def main():
-    global current_model
+    global current_model, statute_lookup, reword_cache
     parser = argparse.ArgumentParser(description='Sorts inmate data, identifies the most interesting charge using AI, rewrites it in plain English, and adds it as a new column.')
     parser.add_argument('--input', type=str, default='mugshots_data.csv', help='Input CSV file path (default: mugshots_data.csv from scrape.py).')
     parser.add_argument('--output', type=str, default='processed_inmate_charges.csv', help='Output CSV file path (default: processed_inmate_charges.csv).')
     parser.add_argument('--max-rows', type=int, help='Maximum number of rows to process (for testing).')
     parser.add_argument('--model', type=str, default=DEFAULT_MODEL, help=f'OpenAI model to use (default: {DEFAULT_MODEL}).')
+    parser.add_argument('--concurrency', type=int, default=0, help='Process inmates with this many API calls in flight (default: 0, one inmate at a time with a 1.5s pause).')
+    parser.add_argument('--rpm', type=int, default=DEFAULT_RPM, help=f'Requests-per-minute budget for --concurrency (default: {DEFAULT_RPM}).')
+    parser.add_argument('--tpm', type=int, default=DEFAULT_TPM, help=f'Tokens-per-minute budget for --concurrency (default: {DEFAULT_TPM}).')
+    parser.add_argument('--lookup', type=str, help=f'Curated statute lookup table (default: {DEFAULT_LOOKUP_FILENAME} in the script directory).')
+    parser.add_argument('--no-lookup', action='store_true', help='Reword every selected charge with the API instead of consulting the statute lookup.')
+    parser.add_argument('--cache', type=str, help=f'Cache of reworded charges (default: {DEFAULT_CACHE_FILENAME} in the script directory).')
+    parser.add_argument('--no-cache', action='store_true', help='Reword every selected charge with the API without using the cache.')
+    parser.add_argument('--ai-select', action='store_true', help='Let the model pick the most interesting charge (one more API call per inmate) instead of the local charge ranker.')
     
     args = parser.parse_args()
     current_model = args.model
+    run_ledger.model = current_model
 
     script_dir = os.path.dirname(__file__)
     input_csv_path = args.input if os.path.isabs(args.input) else os.path.join(script_dir, args.input)
@@ -144,6 +377,14 @@ def main():
     log_message(f"Input CSV: {input_csv_path}")
     log_message(f"Output CSV: {output_csv_path}")
     log_message(f"Using OpenAI model: {current_model}")
+    if not args.no_lookup:
+        lookup_path = args.lookup or os.path.join(script_dir, DEFAULT_LOOKUP_FILENAME)
+        statute_lookup = StatuteLookup(lookup_path)
+        log_message(f"Statute lookup: {lookup_path} (version {statute_lookup.version}, {len(statute_lookup)} entries)")
+    if not args.no_cache:
+        cache_path = args.cache or os.path.join(script_dir, DEFAULT_CACHE_FILENAME)
+        reword_cache = ChargeCache(cache_path, current_model, REWORD_PROMPT_VERSION)
+        log_message(f"Reword cache: {cache_path} ({reword_cache.size()} entries, prompt version {REWORD_PROMPT_VERSION})")
 
     if not os.path.exists(input_csv_path):
         log_message(f"Error: Input file '{input_csv_path}' does not exist!")
@@ -167,89 +408,105 @@ def main():
         log_message("Please check your API key, organization ID (if applicable), and model availability.")
         sys.exit(1)
 
+    writer = None
     try:
         log_message(f"Reading CSV file: {input_csv_path}")
-        # Detect delimiter by peeking at the first line
-        with open(input_csv_path, 'r', encoding='utf-8') as f_peek:
-            first_line = f_peek.readline()
+        with open(input_csv_path, 'r', encoding='utf-8', newline='') as infile:
+            # Detect delimiter by peeking at the first line
+            first_line = infile.readline()
             dialect = csv.Sniffer().sniff(first_line, delimiters=[',',';','\\t','|'])
             delimiter = dialect.delimiter
             log_message(f"Detected delimiter: '{delimiter}'")
-        
-        df = pd.read_csv(input_csv_path, delimiter=delimiter, on_bad_lines='skip')
-        log_message(f"Successfully read {len(df)} rows from {input_csv_path}.")
+            infile.seek(0)
+            reader = csv.DictReader(infile, delimiter=delimiter)
+            fields = reader.fieldnames or []
 
-        if 'InmateID' not in df.columns:
-            log_message("Error: 'InmateID' column not found in input CSV. Cannot sort.")
-            sys.exit(1)
-        if 'Description' not in df.columns:
-            log_message("Error: 'Description' column (for raw charges) not found in input CSV.")
-            sys.exit(1)
+            if 'InmateID' not in fields:
+                log_message("Error: 'InmateID' column not found in input CSV. Cannot sort.")
+                sys.exit(1)
+            if 'Description' not in fields:
+                log_message("Error: 'Description' column (for raw charges) not found in input CSV.")
+                sys.exit(1)
 
-        log_message("Sorting data by 'InmateID'...")
-        df['InmateID'] = pd.to_numeric(df['InmateID'], errors='coerce')
-        df.dropna(subset=['InmateID'], inplace=True) # Remove rows where InmateID couldn't be converted
-        df['InmateID'] = df['InmateID'].astype(int)
-        df.sort_values(by='InmateID', inplace=True)
-        log_message("Data sorted successfully.")
+            log_message("Sorting data by 'InmateID'...")
+            rows, rows_to_process = read_sorted_rows(reader)
+            log_message(f"Successfully read and sorted {rows_to_process} rows from {input_csv_path}.")
 
         output_column_name = 'Interesting_Charge_Plain_English'
-        df[output_column_name] = None # Initialize new column
-
-        rows_to_process = len(df)
         if args.max_rows and args.max_rows < rows_to_process:
-            df = df.head(args.max_rows)
+            rows = itertools.islice(rows, args.max_rows)
             rows_to_process = args.max_rows
             log_message(f"Processing a maximum of {args.max_rows} rows.")
         
         log_message(f"Starting processing of {rows_to_process} inmates...")
-        
-        # Using .iterrows() is not the most performant for pandas, but given the API calls,
-        # the iteration overhead is minor compared to network latency.
-        # For very large datasets without external calls, df.apply() would be better.
-        for index, row in df.iterrows():
-            log_message(f"Processing inmate {index + 1}/{rows_to_process}, ID: {row.get('InmateID', 'N/A')}, Name: {row.get('Name', 'N/A')}")
+
+        if args.ai_select:
+            rows = ((row, None) for row in rows)
+        else:
+            # Charges are scored a chunk of rows at a time instead of an API call per inmate (charge_ranker.py)
+            rows = ((row, ranked_charge(row, best_position)) for row, best_position in ranked_rows(rows))
+            log_message("Ranking charges locally.")
+
+        # Each finished row is appended to <output>.partial (stream_writer.py) and the file is
+        # renamed into place at the end, so an interrupted run keeps every row done so far.
+        writer = StreamingCSVWriter(output_csv_path, fields + [output_column_name], quoting=csv.QUOTE_ALL, lineterminator='\n')
+        log_message(f"Writing rows to {writer.partial_path} as they are processed")
+
+        def write_row(row, plain_english_charge):
+            writer.writerow([row.get(field) or '' for field in fields] + [plain_english_charge])
+
+        if args.concurrency > 0:
+            log_message(f"Async mode: {args.concurrency} requests in flight, {args.rpm} requests/min, {args.tpm} tokens/min")
+            asyncio.run(process_charges_async(rows, write_row, args.concurrency, args.rpm, args.tpm))
+            log_message("Processing complete.")
+            writer.commit()
+            log_message(f"Results saved to {output_csv_path}")
+            log_run_summary(output_csv_path, rows_to_process)
+            return
+
+        for number, (row, interesting_charge_raw) in enumerate(rows, start=1):
+            log_message(f"Processing inmate {number}/{rows_to_process}, ID: {row.get('InmateID', 'N/A')}, Name: {row.get('Name', 'N/A')}")
             
-            raw_charges = row.get('Description', '')
+            raw_charges = row.get('Description') or ''
             
-            if pd.isna(raw_charges) or not raw_charges.strip():
+            if not has_raw_charges(raw_charges):
                 log_message("  No raw charges found for this inmate. Skipping AI processing.")
-                df.loc[index, output_column_name] = "No raw charges listed"
+                write_row(row, "No raw charges listed")
                 continue
 
-            log_message(f'  Identifying most interesting charge from: "{str(raw_charges)[:100]}..."')
-            interesting_charge_raw = identify_most_interesting_raw_charge(str(raw_charges))
+            calls_before = api_calls
+            if interesting_charge_raw is None:
+                log_message(f'  Identifying most interesting charge from: "{raw_charges[:100]}..."')
+                interesting_charge_raw = identify_most_interesting_raw_charge(raw_charges)
             log_message(f'  Identified raw interesting charge: "{interesting_charge_raw}"')
             
             plain_english_charge = reword_single_charge(interesting_charge_raw)
             log_message(f'  Reworded to plain English: "{plain_english_charge}"')
             
-            df.loc[index, output_column_name] = plain_english_charge
+            write_row(row, plain_english_charge)
             
-            time.sleep(1.5) # Respect API rate limits
-
-            if (index + 1) % 10 == 0:
-                log_message(f"Processed {index + 1} inmates. Saving intermediate progress...")
-                try:
-                    df.to_csv(output_csv_path, index=False, quoting=csv.QUOTE_ALL)
-                    log_message(f"Intermediate progress saved to {output_csv_path}")
-                except Exception as e_save:
-                    log_message(f"Error saving intermediate progress: {e_save}")
-
+            if api_calls > calls_before:
+                time.sleep(1.5) # Respect API rate limits
 
         log_message("Processing complete.")
-        df.to_csv(output_csv_path, index=False, quoting=csv.QUOTE_ALL)
+        writer.commit()
         log_message(f"Results saved to {output_csv_path}")
+        log_run_summary(output_csv_path, rows_to_process)
 
     except FileNotFoundError:
         log_message(f"Error: Input file not found. Path: {input_csv_path}")
-    except pd.errors.EmptyDataError:
+    except csv.Error:
         log_message(f"Error: Input file {input_csv_path} is empty or not valid CSV.")
     except Exception as e:
         log_message(f"An unexpected error occurred: {str(e)}")
         import traceback
         traceback.print_exc()
     finally:
+        if writer and not writer.committed:
+            writer.abort()  # Keeps the rows written so far in .partial
+            log_message(f"Rows written so far are in {writer.partial_path}")
+        if reword_cache:
+            reword_cache.close()
         log_message("Script finished.")
 
 if __name__ == "__main__":
@@ -0,0 +1,99 @@
+import json
+import os
+
+import pandas as pd
+
+# Index of earlier enrichment results, for incremental reruns of consolidated_mugshot_processor.py.
+#
+# An inmate's result only depends on its charges, so a row is identified by its InmateID plus a
+# hash of the charge columns. Rows of the new input whose (InmateID, hash) is in the previous
+# output reuse its value; only new inmates and inmates whose charges changed go to the API.
+#
+# The hashes are computed from both files in the same run and never stored, so the hash function
+# only needs to be stable within a process. Values that record a failure are not reused.
+#
+# CheckpointLog keeps the same kind of index for a run in progress: every finished batch of rows
+# is appended to <output>.checkpoint.jsonl (one JSON object per row, fsync'd per batch), so a save
+# costs O(batch) and a crashed run can --resume by skipping the rows already in the log.
+
+RECORD_COLUMNS = ["Description", "Statute", "Charge Comments"]
+FAILED_VALUES = {"", "Could not determine best crime"}
+
+def record_hashes(df, columns=RECORD_COLUMNS):
+    """A 64-bit hash of the charge columns of every row of df (missing columns count as empty)."""
+    frame = pd.DataFrame(index=df.index)
+    for column in columns:
+        values = df[column].fillna("").astype(str) if column in df.columns else pd.Series("", index=df.index)
+        frame[column] = values.replace("nan", "")  # NaN read back from a file that stored it as "nan"
+    return pd.util.hash_pandas_object(frame, index=False)
+
+def record_keys(df):
+    """(InmateID, charge hash) for every row of df, in row order."""
+    inmate_ids = pd.to_numeric(df["InmateID"], errors="coerce")
+    return list(zip(inmate_ids, record_hashes(df)))
+
+def is_reusable(value):
+    return isinstance(value, str) and value.strip() not in FAILED_VALUES and not value.startswith("Error:")
+
+def load_index(path, column):
+    """{(InmateID, charge hash): value of `column`} from an earlier output CSV; {} when there is none."""
+    if not os.path.exists(path):
+        return {}
+    previous = pd.read_csv(path, dtype=str, keep_default_na=False, on_bad_lines="warn")
+    if column not in previous.columns or "InmateID" not in previous.columns:
+        return {}
+    return {key: value for key, value in zip(record_keys(previous), previous[column]) if is_reusable(value)}
+
+def reused_values(df, index):
+    """The indexed value for every row of df, or None where the row is new or its charges changed."""
+    return pd.Series([index.get(key) for key in record_keys(df)], index=df.index, dtype=object)
+
+class CheckpointLog:
+    """Append-only log of the finished rows of a run: InmateID, charge columns and `column`."""
+
+    def __init__(self, path, column):
+        self.path = path
+        self.column = column
+        self.rows = 0
+        self._torn = False
+
+    def load(self):
+        """{(InmateID, charge hash): value} of the rows logged so far. A torn last line is ignored."""
+        if not os.path.exists(self.path):
+            return {}
+        records = []
+        with open(self.path, mode="r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+                finally:
+                    self._torn = not line.endswith("\n")
+        self.rows = len(records)
+        if not records:
+            return {}
+        logged = pd.DataFrame(records)
+        if self.column not in logged.columns:
+            return {}
+        return {key: value for key, value in zip(record_keys(logged), logged[self.column]) if is_reusable(value)}
+
+    def append(self, df):
+        """Logs the InmateID, charge columns and result of every row of df."""
+        columns = ["InmateID"] + [c for c in RECORD_COLUMNS if c in df.columns] + [self.column]
+        records = df[columns].astype(object).where(df[columns].notna(), None).to_dict("records")
+        text = "".join(json.dumps(record, default=int) + "\n" for record in records)
+        if self._torn:
+            text = "\n" + text  # Ends a line left half-written by a crash, so the new rows parse
+            self._torn = False
+        with open(self.path, mode="a", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        self.rows += len(records)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.rows = 0
+        self._torn = False
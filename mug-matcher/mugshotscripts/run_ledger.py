@@ -0,0 +1,153 @@
+import datetime
+import json
+import math
+import os
+import time
+
+# Per-run accounting for the AI enrichment scripts: what a run cost and where its time went.
+#
+# Every chat completion is recorded with its purpose (e.g. "reword", "best_crime"), prompt and
+# completion tokens, latency and retry count; answers served without a call (cache or statute
+# lookup hits) are counted by status. At the end of a run the script logs a summary and writes it
+# as JSON next to its output CSV (<output>.run.json), so runs can be compared:
+#
+#   calls, failed calls, retries     per run and per purpose
+#   tokens                           prompt / completion / total, and per inmate
+#   estimated cost                   from PRICES_PER_MILLION; Batch API calls at half price
+#   latency                          p50 / p95 / max of the time spent in requests, all attempts
+#                                    of a call together (backoff sleeps and queueing not included)
+#   cache                            hits, misses and lookup answers
+#
+# Latency is only known for live calls; batch results are counted for tokens and cost only.
+
+# USD per million (prompt, completion) tokens. The longest matching model prefix wins.
+PRICES_PER_MILLION = {
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+BATCH_DISCOUNT = 0.5
+
+def model_prices(model):
+    """(prompt, completion) USD per million tokens for `model`, or None when it isn't in the table."""
+    matches = [prefix for prefix in PRICES_PER_MILLION if model.startswith(prefix)]
+    if not matches:
+        return None
+    return PRICES_PER_MILLION[max(matches, key=len)]
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list, or None when it is empty."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(fraction * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+def ledger_path(output_csv_path):
+    return f"{os.path.splitext(output_csv_path)[0]}.run.json"
+
+class RunLedger:
+    def __init__(self, script, model):
+        self.script = script
+        self.model = model
+        self.started = time.time()
+        self.calls = []  # (purpose, prompt tokens, completion tokens, seconds or None, retries, ok, batch)
+        self.cache = {}
+
+    def record_call(self, purpose, usage=None, seconds=None, attempts=1, ok=True, batch=False):
+        """
+        One chat completion. `usage` is the response's usage object (or a dict with the same keys),
+        None when the call failed; `attempts` counts the first try and every retry.
+        """
+        prompt_tokens = completion_tokens = 0
+        if usage is not None:
+            if isinstance(usage, dict):
+                prompt_tokens = usage.get("prompt_tokens") or 0
+                completion_tokens = usage.get("completion_tokens") or 0
+            else:
+                prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+                completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        self.calls.append((purpose, prompt_tokens, completion_tokens, seconds, max(attempts - 1, 0), ok, batch))
+
+    def record_cache(self, status):
+        """An answer looked up instead of (or before) calling the API: "hit", "miss" or "lookup"."""
+        self.cache[status] = self.cache.get(status, 0) + 1
+
+    def _totals(self, calls):
+        latencies = sorted(c[3] for c in calls if c[3] is not None)
+        prompt_tokens = sum(c[1] for c in calls)
+        completion_tokens = sum(c[2] for c in calls)
+        totals = {
+            "calls": len(calls),
+            "failed_calls": sum(1 for c in calls if not c[5]),
+            "retries": sum(c[4] for c in calls),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "estimated_cost_usd": None,
+            "latency_p50": _round(percentile(latencies, 0.50)),
+            "latency_p95": _round(percentile(latencies, 0.95)),
+            "latency_max": _round(latencies[-1] if latencies else None),
+            "request_seconds": round(sum(latencies), 3),
+        }
+        prices = model_prices(self.model)
+        if prices:
+            cost = sum((c[1] * prices[0] + c[2] * prices[1]) * (BATCH_DISCOUNT if c[6] else 1.0) for c in calls)
+            totals["estimated_cost_usd"] = round(cost / 1e6, 6)
+        return totals
+
+    def summary(self, units=None):
+        """The run summary as a dict; `units` is the number of inmates (rows) the run processed."""
+        finished = time.time()
+        summary = {
+            "script": self.script,
+            "model": self.model,
+            "started": datetime.datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "finished": datetime.datetime.fromtimestamp(finished).isoformat(timespec="seconds"),
+            "wall_seconds": round(finished - self.started, 3),
+            "inmates": units,
+        }
+        summary.update(self._totals(self.calls))
+        if units:
+            summary["calls_per_inmate"] = round(len(self.calls) / units, 4)
+            summary["tokens_per_inmate"] = round(summary["total_tokens"] / units, 1)
+        summary["cache"] = dict(self.cache)
+        summary["by_purpose"] = {purpose: self._totals([c for c in self.calls if c[0] == purpose])
+                                 for purpose in sorted({c[0] for c in self.calls})}
+        return summary
+
+    def finish(self, output_csv_path, units=None, log=print):
+        """Logs the summary and writes it next to the output CSV. Returns the summary dict."""
+        summary = self.summary(units)
+        log(f"Run ledger: {format_summary(summary)}")
+        path = ledger_path(output_csv_path)
+        try:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, mode="w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=1)
+                f.write("\n")
+            os.replace(tmp_path, path)
+            log(f"Run ledger saved to {path}")
+        except OSError as e:
+            log(f"Warning: could not write run ledger {path}: {e}")
+        return summary
+
+def _round(value):
+    return None if value is None else round(value, 3)
+
+def _seconds(value):
+    return "n/a" if value is None else f"{value:.2f}s"
+
+def format_summary(summary):
+    cost = summary["estimated_cost_usd"]
+    text = (f"{summary['calls']} calls ({summary['failed_calls']} failed, {summary['retries']} retries), "
+            f"{summary['total_tokens']} tokens ({summary['prompt_tokens']} prompt + {summary['completion_tokens']} completion), "
+            f"est. cost {'n/a' if cost is None else f'${cost:.4f}'}, "
+            f"latency p50 {_seconds(summary['latency_p50'])} / p95 {_seconds(summary['latency_p95'])}")
+    if summary.get("calls_per_inmate") is not None:
+        text += f", {summary['calls_per_inmate']:.2f} calls and {summary['tokens_per_inmate']:.0f} tokens per inmate"
+    if summary["cache"]:
+        text += ", cache " + ", ".join(f"{status} {count}" for status, count in sorted(summary["cache"].items()))
+    return text + f", {summary['wall_seconds']:.1f}s wall time"
@@ -1,9 +1,18 @@
-import requests
-from bs4 import BeautifulSoup
 import csv
 import time
 import os
 import argparse
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from scrape_session import create_session
+from scrape_journal import ScrapeJournal
+from scrape_probe import IdSpaceProber, DEFAULT_BUCKET_SIZE
+from page_extract import parse_inmate_page
+from page_archive import PageArchive
+from scrape_refresh import RefreshState, RefreshSink, load_known_rows
+from scrape_pipeline import run_pipeline, QueueSink, DEFAULT_QUEUE_SIZE
+from scrape_metrics import ScrapeMetrics, MetricsWriter, DEFAULT_INTERVAL as DEFAULT_METRICS_INTERVAL
 
 BASE_URL = "https://apps.sheriff.org/ArrestSearch/InmateDetail/"
 PHOTO_BASE = "https://apps.sheriff.org"
@@ -17,83 +26,16 @@ HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
 }
 
-def extract_inmate_data(soup, inmate_id):
-    # Extract inmate name from h3 tag
-    name_tag = soup.find("h3")
-    name = name_tag.get_text(strip=True) if name_tag else ""
-
-    # Extract mugshot photo
-    photo_tag = soup.find("img", {"src": lambda x: x and x.startswith("/thumbs/")})
-    mugshot_url = PHOTO_BASE + photo_tag["src"] if photo_tag else ""
-
-    # Extract fields
-    def get_label_value(label):
-        lbl = soup.find("label", string=label)
-        if not lbl:
-            return ""
-        span = lbl.find_next_sibling("span")
-        if not span:
-            return ""
-        val = span.get_text(strip=True)
-        return val
-
-    # Some fields are in nested spans
-    def get_label_value_nested(label):
-        lbl = soup.find("label", string=label)
-        if not lbl:
-            return ""
-        span = lbl.find_next_sibling("span")
-        if not span:
-            return ""
-        inner_span = span.find("span")
-        if inner_span:
-            return inner_span.get_text(strip=True)
-        return span.get_text(strip=True)
-
-    race = get_label_value_nested("Race")
-    sex = get_label_value_nested("Sex")
-    dob = get_label_value_nested("DOB")
-    height = get_label_value_nested("Height")
-    weight = get_label_value_nested("Weight")
-    hair = get_label_value_nested("Hair")
-    eyes = get_label_value_nested("Eyes")
-    location = get_label_value_nested("Location")
-
-    # Extract all charges
-    charges = []
-    for panel in soup.find_all("div", class_="panel panel-warning"):
-        if not panel.find("div", class_="panel-heading", string="Charge"):
-            continue
-        charge = {}
-        rows = panel.find_all("div", class_="row")
-        for row in rows:
-            labels = row.find_all("label")
-            spans = row.find_all("span", class_="inputWarning")
-            for lbl, spn in zip(labels, spans):
-                key = lbl.get_text(strip=True)
-                val = spn.get_text(strip=True)
-                charge[key] = val
-        if charge:
-            charges.append(charge)
-
-    return {
-        "InmateID": inmate_id,
-        "Name": name,
-        "MugshotURL": mugshot_url,
-        "Race": race,
-        "Sex": sex,
-        "DOB": dob,
-        "Height": height,
-        "Weight": weight,
-        "Hair": hair,
-        "Eyes": eyes,
-        "Location": location,
-        "Charges": charges
-    }
-
-def is_valid_inmate_page(soup):
-    # Heuristic: must have "Inmate Information" panel
-    return soup.find("div", class_="panel-heading", string="Inmate Information") is not None
+FIELDNAMES = [
+    "InmateID", "Name", "MugshotURL", "Race", "Sex", "DOB", "Height", "Weight", "Hair", "Eyes", "Location",
+    "Statute", "Charge Comments", "Case Number", "Description", "Bond Amount", "Bond Type"
+]
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RATE = 2.0  # Requests per second across all in-flight fetches
+
+# Only these statuses mean the ID has no booking; anything else (429, 5xx, ...) is an error and retried
+NOT_FOUND_STATUSES = {404, 410}
 
 def flatten_charges(charges):
     # Flatten all charges into a single string per field, separated by ' | '
@@ -103,7 +45,318 @@ def flatten_charges(charges):
         result[field] = " | ".join([c.get(field, "") for c in charges])
     return result
 
-# Function removed as we now always use the configured START_ID and END_ID
+def process_page(inmate_id, status_code, html):
+    """
+    Classifies a fetched page and builds its CSV row.
+    Returns (outcome, row) where outcome is "found", "not_found", "invalid" or "error" (any status
+    other than 200, 404 and 410, e.g. throttling or an outage, so --resume fetches the ID again).
+    """
+    if status_code in NOT_FOUND_STATUSES:
+        return "not_found", None
+    if status_code != 200:
+        return "error", None
+    data = parse_inmate_page(html, inmate_id)
+    if data is None:
+        return "invalid", None
+    flat_charges = flatten_charges(data["Charges"])
+    row = {**{k: data[k] for k in FIELDNAMES if k in data}, **flat_charges}
+    return "found", row
+
+def report_outcome(inmate_id, outcome, status_code=None, error=None):
+    if outcome == "found":
+        print(f"ID {inmate_id}: Data extracted")
+    elif outcome == "not_found":
+        print(f"ID {inmate_id}: Not found (status {status_code})")
+    elif outcome == "invalid":
+        print(f"ID {inmate_id}: Not a valid inmate page")
+    elif outcome == "not_modified":
+        print(f"ID {inmate_id}: Not modified since the last refresh")
+    elif error is None and status_code is not None:
+        print(f"ID {inmate_id}: Error - status {status_code}")
+    else:
+        print(f"ID {inmate_id}: Error - {error}")
+
+class ResultSink:
+    """
+    Stores the raw page in the archive (if any), writes found rows to the CSV, records every
+    outcome in the progress journal (if any) and keeps per-outcome counts for the end-of-run summary.
+    Write time and outcomes also go to `metrics` (a ScrapeMetrics), if given.
+    """
+
+    def __init__(self, file, journal=None, archive=None, metrics=None):
+        self.file = file
+        self.writer = csv.DictWriter(file, fieldnames=FIELDNAMES)
+        self.journal = journal
+        self.archive = archive
+        self.metrics = metrics
+        self.counts = {"found": 0, "not_found": 0, "invalid": 0, "error": 0}
+
+    def add(self, inmate_id, outcome, row=None, page=None):
+        started = time.perf_counter()
+        self.counts[outcome] += 1
+        if self.archive and page:
+            self.archive.put(inmate_id, *page)
+        if row:
+            self.writer.writerow(row)
+            self.file.flush()  # The row must be on disk before the journal marks the ID as found
+        if self.journal:
+            self.journal.record(inmate_id, outcome)
+        if self.metrics:
+            self.metrics.record_write(outcome, bool(row), time.perf_counter() - started)
+
+    def summary(self):
+        c = self.counts
+        return f"{c['found']} found, {c['not_found']} not found, {c['invalid']} invalid, {c['error']} errors"
+
+def fetch_page(session, inmate_id, base_url=BASE_URL):
+    resp = session.get(base_url + str(inmate_id), timeout=TIMEOUT)
+    return resp.status_code, resp.text
+
+def fetch_page_conditional(refresh_state, session, inmate_id, base_url=BASE_URL):
+    # Sends the validators from the last refresh; a 304 comes back with an empty body
+    headers = refresh_state.conditional_headers(inmate_id)
+    resp = session.get(base_url + str(inmate_id), headers=headers, timeout=TIMEOUT)
+    # The validators are only kept once RefreshSink has stored the record (commit_validators)
+    if resp.status_code == 200:
+        refresh_state.stage_validators(inmate_id, resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+    return resp.status_code, resp.text
+
+def process_refresh_page(inmate_id, status_code, html):
+    """process_page for conditional fetches: a 304 means the page hasn't changed since the last refresh."""
+    if status_code == 304:
+        return "not_modified", None
+    return process_page(inmate_id, status_code, html)
+
+def scrape_sequential(session, ids, sink, base_url=BASE_URL, fetch=fetch_page, process=process_page):
+    # Original one-at-a-time crawl with a fixed sleep after every ID.
+    # With process=None pages are handed to the sink unparsed (fetch stage of the --workers pipeline).
+    outcomes = {}
+    for inmate_id in ids:
+        page = None
+        outcome, row = None, None
+        try:
+            page = fetch(session, inmate_id, base_url)
+            if process:
+                outcome, row = process(inmate_id, *page)
+                report_outcome(inmate_id, outcome, page[0])
+        except Exception as e:
+            outcome, row = "error", None
+            report_outcome(inmate_id, outcome, error=e)
+        sink.add(inmate_id, outcome, row, page)
+        outcomes[inmate_id] = outcome
+        time.sleep(TIMEOUT)  # Be polite to the server
+    return outcomes
+
+class RateLimiter:
+    """Spaces request starts evenly so the crawl never exceeds `rate` requests per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+async def scrape_async(session, ids, sink, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE, base_url=BASE_URL,
+                       fetch=fetch_page, process=process_page):
+    """
+    Keeps up to `concurrency` fetches in flight, paced by a requests-per-second budget
+    instead of a fixed sleep. Rows are written in ID order so the CSV matches a sequential run.
+    With process=None pages are handed to the sink unparsed (fetch stage of the --workers pipeline).
+    Returns {inmate_id: outcome}.
+    """
+    ids = list(ids)
+    loop = asyncio.get_running_loop()
+    limiter = RateLimiter(rate)
+    queue = asyncio.Queue()
+    for position, inmate_id in enumerate(ids):
+        queue.put_nowait((position, inmate_id))
+
+    results = {}
+    outcomes = {}
+    next_to_write = 0
+
+    def flush_ready():
+        nonlocal next_to_write
+        while next_to_write in results:
+            sink.add(*results.pop(next_to_write))
+            next_to_write += 1
+
+    async def worker(executor):
+        while True:
+            try:
+                position, inmate_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await limiter.wait()
+            page = None
+            outcome, row = None, None
+            try:
+                page = await loop.run_in_executor(executor, fetch, session, inmate_id, base_url)
+                if process:
+                    outcome, row = process(inmate_id, *page)
+                    report_outcome(inmate_id, outcome, page[0])
+            except Exception as e:
+                outcome, row = "error", None
+                report_outcome(inmate_id, outcome, error=e)
+            results[position] = (inmate_id, outcome, row, page)
+            outcomes[inmate_id] = outcome
+            flush_ready()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        workers = [asyncio.create_task(worker(executor)) for _ in range(min(concurrency, len(ids)) or 1)]
+        await asyncio.gather(*workers)
+    flush_ready()
+    return outcomes
+
+def fetch_ids(session, ids, sink, args, fetch=fetch_page, process_function=process_page, pool=None):
+    process = process_function
+    parse_timer = None
+    if sink.metrics:
+        fetch = sink.metrics.timed_fetch(fetch)
+        process = sink.metrics.timed_process(process_function)
+        parse_timer = sink.metrics.observe_parse
+    if args.workers > 0:
+        # Fetch on this process, parse on a pool of worker processes, write in order here
+        def produce(emit):
+            fetch_sink = QueueSink(emit)
+            if args.concurrency > 0:
+                asyncio.run(scrape_async(session, ids, fetch_sink, args.concurrency, args.rate, args.base_url,
+                                         fetch, process=None))
+            else:
+                scrape_sequential(session, ids, fetch_sink, args.base_url, fetch, process=None)
+        return run_pipeline(produce, sink, process_function, args.workers, args.queue_size,
+                            report=report_outcome, parse_timer=parse_timer, pool=pool)
+    if args.concurrency > 0:
+        return asyncio.run(scrape_async(session, ids, sink, args.concurrency, args.rate, args.base_url, fetch, process))
+    return scrape_sequential(session, ids, sink, args.base_url, fetch, process)
+
+def run_discovery(session, sink, journal, lo, hi, args):
+    """Samples [lo, hi] for live booking ranges, then fills in only the dense ones."""
+    if args.workers > 0:
+        # One parse pool for every probe and fill batch, instead of new worker processes per batch
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            return discover_and_fill(session, sink, journal, lo, hi, args, pool)
+    return discover_and_fill(session, sink, journal, lo, hi, args)
+
+def discover_and_fill(session, sink, journal, lo, hi, args, pool=None):
+    known = journal.known_outcomes() if journal else {}
+    prober = IdSpaceProber(
+        lambda batch: fetch_ids(session, batch, sink, args, pool=pool),
+        known=known,
+        bucket_size=args.bucket_size,
+        min_hit_rate=args.min_hit_rate,
+    )
+    print(f"Discovery: sampling IDs {lo} to {hi}")
+    frontier, buckets = prober.discover(lo, hi)
+    if frontier is None:
+        print(f"Discovery: no live records found in {lo}-{hi} after {prober.requests} probes")
+        return
+    print(f"Discovery: newest-ID frontier at {frontier} after {prober.requests} probes")
+    for bucket in buckets:
+        print(f"  {bucket.describe()}")
+
+    dense = sum(1 for b in buckets if b.dense)
+    print(f"Discovery: filling {len(prober.fill_ids(buckets))} unprobed IDs in {dense} dense ranges")
+    prober.fill(buckets)
+
+    print("Discovery: hit rate per range after fill")
+    for bucket, found, probed in prober.actual_hit_rates(buckets):
+        rate = found / probed if probed else 0.0
+        print(f"  {bucket.start}-{bucket.end}: {found}/{probed} probed IDs live ({rate:.1%})")
+    linear = sum(1 for i in range(lo, hi + 1) if i not in known or known[i] == "error")
+    print(f"Discovery: {prober.requests} requests in total (a linear scan would have made {linear})")
+
+def replay_archive(archive, sink, ids=None):
+    """Rebuilds CSV rows from archived pages with no network access."""
+    process = sink.metrics.timed_process(process_page) if sink.metrics else process_page
+    for count, (inmate_id, status_code, html) in enumerate(archive.iter_pages(ids), start=1):
+        try:
+            outcome, row = process(inmate_id, status_code, html)
+        except Exception as e:
+            outcome, row = "error", None
+            report_outcome(inmate_id, outcome, error=e)
+        sink.add(inmate_id, outcome, row)
+        if count % 1000 == 0:
+            print(f"Replayed {count} pages...")
+
+def report_replay_error(inmate_id, outcome, status_code, error):
+    if outcome == "error":
+        report_outcome(inmate_id, outcome, error=error)
+
+def run_replay(args, csv_filepath, metrics=None):
+    archive = PageArchive(args.archive)
+    ids = None
+    if args.start_id is not None:
+        ids = range(args.start_id, args.start_id + args.count + 1)
+    print(f"Replaying {len(archive.pages)} archived pages from {args.archive} into {csv_filepath}")
+
+    # Write to a temporary file and swap it in, so a failed replay never leaves a half-built CSV
+    tmp_filepath = f"{csv_filepath}.replay.tmp"
+    started = time.time()
+    with open(tmp_filepath, mode="w", newline="", encoding="utf-8") as file:
+        sink = ResultSink(file, metrics=metrics)
+        sink.writer.writeheader()
+        if args.workers > 0:
+            def produce(emit):
+                for inmate_id, status_code, html in archive.iter_pages(ids):
+                    emit((inmate_id, (status_code, html)))
+            print(f"Parsing on {args.workers} worker processes")
+            run_pipeline(produce, sink, process_page, args.workers, args.queue_size, report=report_replay_error,
+                         parse_timer=metrics.observe_parse if metrics else None)
+        else:
+            replay_archive(archive, sink, ids)
+    os.replace(tmp_filepath, csv_filepath)
+    archive.close()
+    elapsed = time.time() - started
+    total = sum(sink.counts.values())
+    print(f"Replay done in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} pages/s): {sink.summary()}")
+
+def run_refresh(args, session, csv_filepath, metrics=None):
+    """Re-fetches already-scraped IDs and writes only the records whose data changed."""
+    baseline_hashes = load_known_rows(csv_filepath, FIELDNAMES)
+    state = RefreshState(f"{csv_filepath}.refresh.json")
+    ids = sorted(baseline_hashes)
+    if args.start_id is not None:
+        ids = [i for i in ids if args.start_id <= i <= args.start_id + args.count]
+    skipped_released = [i for i in ids if state.is_released(i)]
+    ids = [i for i in ids if not state.is_released(i)]
+
+    changes_filepath = args.changes_output or f"{os.path.splitext(csv_filepath)[0]}_changes.csv"
+    print(f"Refreshing {len(ids)} known inmates from {csv_filepath} "
+          f"(skipping {len(skipped_released)} already released)")
+    print(f"Changed records will be written to {changes_filepath}")
+
+    archive = PageArchive(args.archive) if args.archive else None
+    started = time.time()
+    with open(changes_filepath, mode="w", newline="", encoding="utf-8") as file:
+        sink = RefreshSink(file, FIELDNAMES, state, baseline_hashes, archive, metrics)
+        sink.writer.writeheader()
+        try:
+            fetch_ids(session, ids, sink, args, fetch=functools.partial(fetch_page_conditional, state),
+                      process_function=process_refresh_page)
+        finally:
+            state.save()
+            if archive:
+                archive.close()
+    print(f"Refresh done in {time.time() - started:.1f}s: {sink.summary()}")
+    if sink.released_ids:
+        print(f"Released: {', '.join(str(i) for i in sink.released_ids)}")
+
+def finish_metrics(metrics, metrics_writer):
+    print(f"Latency: {metrics.summary()}")
+    if metrics_writer:
+        metrics_writer.close()
+        print(f"Metrics: {metrics_writer.prefix}.json, {metrics_writer.prefix}.prom")
 
 def main():
     parser = argparse.ArgumentParser(description="Scrape inmate data.")
@@ -112,12 +365,121 @@ def main():
         type=int,
         help="Explicitly set the starting ID for scraping. If not provided, will use the configured START_ID."
     )
+    parser.add_argument(
+        '--count',
+        type=int,
+        default=SEARCH_COUNT,
+        help=f"Number of IDs to scan after the start ID. Default: {SEARCH_COUNT}"
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=0,
+        help=f"Enable the async fetch mode with this many requests in flight (e.g. {DEFAULT_CONCURRENCY}). Default: 0 (sequential crawl with a {TIMEOUT}s sleep per ID)."
+    )
+    parser.add_argument(
+        '--rate',
+        type=float,
+        default=DEFAULT_RATE,
+        help=f"Politeness budget for the async fetch mode in requests per second. Default: {DEFAULT_RATE}"
+    )
+    parser.add_argument(
+        '--base-url',
+        default=BASE_URL,
+        help="InmateDetail URL prefix; point this at a local stand-in server for testing."
+    )
+    parser.add_argument('--output', help="Output CSV file path. Default: mugshots_data.csv in the script directory.")
+    parser.add_argument(
+        '--pool-size',
+        type=int,
+        help="Maximum number of pooled keep-alive connections. Default: the --concurrency value (1 for the sequential crawl)."
+    )
+    parser.add_argument('--no-keep-alive', action='store_true', help="Close the connection after every request.")
+    parser.add_argument('--no-gzip', action='store_true', help="Ask the server for uncompressed responses.")
+    parser.add_argument(
+        '--journal',
+        help="Progress journal path. Default: <output>.journal. IDs already found/not found/invalid are skipped; errored IDs are retried."
+    )
+    parser.add_argument('--no-journal', action='store_true', help="Do not read or write the progress journal.")
+    parser.add_argument(
+        '--discover',
+        action='store_true',
+        help="Sample the ID range for live booking blocks and the newest-ID frontier, then fetch only the dense ranges."
+    )
+    parser.add_argument(
+        '--bucket-size',
+        type=int,
+        default=DEFAULT_BUCKET_SIZE,
+        help=f"Range size used for hit-rate estimates in --discover mode. Default: {DEFAULT_BUCKET_SIZE}"
+    )
+    parser.add_argument(
+        '--min-hit-rate',
+        type=float,
+        default=0.0,
+        help="Minimum sampled hit rate (0-1) for a range to be filled in --discover mode. Default: any hit."
+    )
+    parser.add_argument(
+        '--archive',
+        help="Directory of the compressed raw-page archive. Every fetched page is stored there when set."
+    )
+    parser.add_argument(
+        '--replay',
+        action='store_true',
+        help="Rebuild the output CSV from --archive without network access (all archived IDs, or --start-id/--count)."
+    )
+    parser.add_argument(
+        '--refresh',
+        action='store_true',
+        help="Re-fetch IDs already in the output CSV and write only records whose data changed."
+    )
+    parser.add_argument('--changes-output', help="CSV for changed records in --refresh mode. Default: <output>_changes.csv")
+    parser.add_argument('--metrics', metavar='PREFIX', help="Periodically write run metrics to PREFIX.json and PREFIX.prom (Prometheus text format).")
+    parser.add_argument(
+        '--metrics-interval',
+        type=float,
+        default=DEFAULT_METRICS_INTERVAL,
+        help=f"Seconds between metrics snapshots. Default: {DEFAULT_METRICS_INTERVAL:g}"
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=0,
+        help="Parse pages on this many worker processes, pipelined behind the fetch stage (or --replay). Default: 0 (parse inline)."
+    )
+    parser.add_argument(
+        '--queue-size',
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        help=f"Maximum fetched pages buffered ahead of the parse stage with --workers. Default: {DEFAULT_QUEUE_SIZE}"
+    )
     args = parser.parse_args()
 
     # Use the script's directory for file paths
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    csv_filepath = os.path.join(script_dir, "mugshots_data.csv")
+    csv_filepath = args.output or os.path.join(script_dir, "mugshots_data.csv")
+
+    if args.replay and not args.archive:
+        parser.error("--replay requires --archive")
+
+    metrics = ScrapeMetrics()
+    metrics_writer = MetricsWriter(metrics, args.metrics, args.metrics_interval) if args.metrics else None
+
+    if args.replay:
+        run_replay(args, csv_filepath, metrics)
+        finish_metrics(metrics, metrics_writer)
+        return
     
+    pool_size = args.pool_size or max(args.concurrency, 1)
+    session = create_session(HEADERS, pool_size=pool_size, keep_alive=not args.no_keep_alive, gzip=not args.no_gzip)
+    metrics.attach_session(session)
+
+    if args.refresh:
+        run_refresh(args, session, csv_filepath, metrics)
+        print(f"Connections: {session.connection_stats.summary()}")
+        finish_metrics(metrics, metrics_writer)
+        session.close()
+        return
+
     # Determine the starting ID for scraping
     start_scrape_id = args.start_id if args.start_id is not None else START_ID
     print(f"Starting scrape from ID: {start_scrape_id}")
@@ -126,41 +488,51 @@ def main():
     file_exists = os.path.exists(csv_filepath)
     is_empty = not file_exists or os.path.getsize(csv_filepath) == 0
 
+    journal = None
+    if not args.no_journal:
+        journal_path = args.journal or f"{csv_filepath}.journal"
+        journal = ScrapeJournal(journal_path, seed_csv=csv_filepath)
+        print(f"Progress journal: {journal_path}")
+
+    archive = PageArchive(args.archive) if args.archive else None
+
     with open(csv_filepath, mode="a", newline="", encoding="utf-8") as file:
-        fieldnames = [
-            "InmateID", "Name", "MugshotURL", "Race", "Sex", "DOB", "Height", "Weight", "Hair", "Eyes", "Location",
-            "Statute", "Charge Comments", "Case Number", "Description", "Bond Amount", "Bond Type"
-        ]
-        writer = csv.DictWriter(file, fieldnames=fieldnames)
+        sink = ResultSink(file, journal, archive, metrics)
 
         if is_empty:
-            writer.writeheader()
+            sink.writer.writeheader()
             print("CSV header written.")
 
         # Calculate end ID based on the start ID to maintain consistent search count
-        end_scrape_id = END_ID if args.start_id is None else start_scrape_id + SEARCH_COUNT
+        end_scrape_id = start_scrape_id + args.count
         print(f"Will scrape IDs from {start_scrape_id} to {end_scrape_id}")
-        
-        for inmate_id in range(start_scrape_id, end_scrape_id + 1):
-            url = BASE_URL + str(inmate_id)
-            try:
-                resp = requests.get(url, headers=HEADERS, timeout=TIMEOUT)
-                if resp.status_code != 200:
-                    print(f"ID {inmate_id}: Not found (status {resp.status_code})")
-                    time.sleep(TIMEOUT)  # Be polite to the server
-                    continue
-                soup = BeautifulSoup(resp.text, "html.parser")
-                if not is_valid_inmate_page(soup):
-                    print(f"ID {inmate_id}: Not a valid inmate page")
-                    continue
-                data = extract_inmate_data(soup, inmate_id)
-                flat_charges = flatten_charges(data["Charges"])
-                row = {**{k: data[k] for k in fieldnames if k in data}, **flat_charges}
-                writer.writerow(row)
-                print(f"ID {inmate_id}: Data extracted")
-            except Exception as e:
-                print(f"ID {inmate_id}: Error - {e}")
-            time.sleep(TIMEOUT)  # Be polite to the server
+        ids = range(start_scrape_id, end_scrape_id + 1)
+        if journal and not args.discover:
+            ids = journal.pending(ids)
+            skipped = end_scrape_id + 1 - start_scrape_id - len(ids)
+            if skipped:
+                print(f"Skipping {skipped} IDs already completed in the journal; {len(ids)} left to fetch")
+
+        if args.concurrency > 0:
+            print(f"Async fetch mode: {args.concurrency} in flight, {args.rate} requests/second")
+        started = time.time()
+        try:
+            if args.discover:
+                run_discovery(session, sink, journal, start_scrape_id, end_scrape_id, args)
+            else:
+                fetch_ids(session, ids, sink, args)
+        finally:
+            if journal:
+                journal.close()
+            if archive:
+                archive.close()
+        print(f"Done in {time.time() - started:.1f}s: {sink.summary()}")
+        if archive:
+            print(f"Archive: {archive.summary()}")
+
+    print(f"Connections: {session.connection_stats.summary()}")
+    finish_metrics(metrics, metrics_writer)
+    session.close()
 
 if __name__ == "__main__":
     main()
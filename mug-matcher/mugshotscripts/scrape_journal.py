@@ -0,0 +1,115 @@
+import csv
+import os
+
+# On-disk progress journal for scrape.py.
+# Records the outcome of every probed InmateID so a restarted crawl skips IDs it already paid for
+# and only retries the ones that errored. The file is plain text, one run per line:
+#
+#   <first_id> <last_id> <code>
+#
+# where code is F (found), N (not found: 404 or 410), I (invalid page) or E (error, including any
+# other non-200 status). New outcomes are appended one line per ID as they happen; on open the
+# journal is compacted back into maximal runs, so the file stays a run-length set no matter how
+# many times a crawl is restarted. Later lines win.
+
+JOURNAL_HEADER = "# scrape-journal v1"
+
+OUTCOME_CODES = {"found": "F", "not_found": "N", "invalid": "I", "error": "E"}
+CODE_OUTCOMES = {code: outcome for outcome, code in OUTCOME_CODES.items()}
+
+# IDs with these outcomes are never fetched again; errors are retried
+COMPLETED_CODES = {"F", "N", "I"}
+
+def read_journal(path):
+    """Returns {inmate_id: code} from a journal file, later entries overriding earlier ones."""
+    outcomes = {}
+    with open(path, mode="r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) != 3 or line.startswith("#"):
+                continue  # Header, or a half-written last line from a crash
+            try:
+                first_id, last_id = int(parts[0]), int(parts[1])
+            except ValueError:
+                continue
+            code = parts[2]
+            if code not in CODE_OUTCOMES:
+                continue
+            for inmate_id in range(first_id, last_id + 1):
+                outcomes[inmate_id] = code
+    return outcomes
+
+def compact_runs(outcomes):
+    """Collapses {inmate_id: code} into sorted (first_id, last_id, code) runs of consecutive IDs."""
+    runs = []
+    for inmate_id in sorted(outcomes):
+        code = outcomes[inmate_id]
+        if runs and runs[-1][2] == code and runs[-1][1] == inmate_id - 1:
+            runs[-1][1] = inmate_id
+        else:
+            runs.append([inmate_id, inmate_id, code])
+    return [tuple(run) for run in runs]
+
+def ids_in_csv(csv_path):
+    """InmateIDs already present in a scraped CSV, used to seed a journal for an existing output file."""
+    found = set()
+    if not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0:
+        return found
+    with open(csv_path, mode="r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            try:
+                found.add(int(row.get("InmateID", "")))
+            except ValueError:
+                continue
+    return found
+
+class ScrapeJournal:
+    """Append-only outcome log for probed IDs, compacted to run-length form on open."""
+
+    def __init__(self, path, seed_csv=None):
+        self.path = path
+        if os.path.exists(path):
+            self.outcomes = read_journal(path)
+        else:
+            # No journal yet: anything already in the output CSV must not be scraped (and appended) again
+            self.outcomes = {inmate_id: "F" for inmate_id in ids_in_csv(seed_csv)} if seed_csv else {}
+        self._rewrite()
+        self._file = open(path, mode="a", encoding="utf-8")
+
+    def _rewrite(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, mode="w", encoding="utf-8") as f:
+            f.write(JOURNAL_HEADER + "\n")
+            for first_id, last_id, code in compact_runs(self.outcomes):
+                f.write(f"{first_id} {last_id} {code}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def record(self, inmate_id, outcome):
+        code = OUTCOME_CODES[outcome]
+        self.outcomes[inmate_id] = code
+        self._file.write(f"{inmate_id} {inmate_id} {code}\n")
+        self._file.flush()
+
+    def known_outcomes(self):
+        """{inmate_id: outcome name} for every ID in the journal."""
+        return {inmate_id: CODE_OUTCOMES[code] for inmate_id, code in self.outcomes.items()}
+
+    def is_completed(self, inmate_id):
+        return self.outcomes.get(inmate_id) in COMPLETED_CODES
+
+    def pending(self, ids):
+        """The subset of `ids` that still needs fetching: never probed, or errored last time."""
+        return [inmate_id for inmate_id in ids if not self.is_completed(inmate_id)]
+
+    def counts(self, ids=None):
+        keys = self.outcomes if ids is None else (i for i in ids if i in self.outcomes)
+        totals = {outcome: 0 for outcome in OUTCOME_CODES}
+        for inmate_id in keys:
+            totals[CODE_OUTCOMES[self.outcomes[inmate_id]]] += 1
+        return totals
+
+    def close(self):
+        self._file.close()
+        self._rewrite()
@@ -0,0 +1,218 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Run telemetry for scrape.py.
+# Records per-phase latency histograms and outcome/status counters while a crawl runs:
+#
+#   connect   TCP (+TLS) connection setup, from the session's connection pool
+#   fetch     One page request, including any connect
+#   parse     Extracting a page into a row (measured in the worker process under --workers)
+#   write     Archiving, writing the CSV row and recording the journal entry
+#
+# With --metrics PREFIX a background thread writes a snapshot every --metrics-interval seconds to
+# PREFIX.json and, in Prometheus text exposition format, to PREFIX.prom (for a node_exporter
+# textfile collector or a quick `cat`). Both files are replaced atomically.
+
+# Upper bounds in seconds, from sub-millisecond parses to requests close to the timeout
+BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+PHASES = ["connect", "fetch", "parse", "write"]
+DEFAULT_INTERVAL = 10.0
+
+class Histogram:
+    """Fixed-bucket latency histogram; quantiles are interpolated within a bucket."""
+
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.bounds[-1]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.bounds[-1]
+
+    def cumulative(self):
+        total = 0
+        out = []
+        for n in self.counts:
+            total += n
+            out.append(total)
+        return out
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+        }
+
+class ScrapeMetrics:
+    """Thread-safe collector shared by the fetch threads, the result sink and the session."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.phases = {phase: Histogram() for phase in PHASES}
+        self.statuses = {}
+        self.outcomes = {}
+        self.rows_written = 0
+        self._last_rate_sample = (self.started, 0, 0)
+
+    def observe(self, phase, seconds):
+        with self._lock:
+            self.phases[phase].observe(seconds)
+
+    def observe_connect(self, seconds):
+        self.observe("connect", seconds)
+
+    def observe_parse(self, seconds):
+        self.observe("parse", seconds)
+
+    def record_status(self, status):
+        with self._lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def record_write(self, outcome, wrote_row, seconds):
+        with self._lock:
+            self.phases["write"].observe(seconds)
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            if wrote_row:
+                self.rows_written += 1
+
+    def attach_session(self, session):
+        session.connection_stats.on_connect = self.observe_connect
+
+    def timed_fetch(self, fetch):
+        """Wraps a fetch(session, inmate_id, base_url) function to record fetch latency and status codes."""
+        def timed(session, inmate_id, base_url):
+            started = time.perf_counter()
+            try:
+                page = fetch(session, inmate_id, base_url)
+            except Exception:
+                self.record_status("error")
+                raise
+            finally:
+                self.observe("fetch", time.perf_counter() - started)
+            self.record_status(str(page[0]))
+            return page
+        return timed
+
+    def timed_process(self, process):
+        """Wraps a process(inmate_id, status_code, html) function to record parse latency."""
+        def timed(inmate_id, status_code, html):
+            started = time.perf_counter()
+            try:
+                return process(inmate_id, status_code, html)
+            finally:
+                self.observe_parse(time.perf_counter() - started)
+        return timed
+
+    def snapshot(self):
+        with self._lock:
+            now = time.time()
+            pages = sum(self.outcomes.values())
+            elapsed = max(now - self.started, 1e-9)
+            last_time, last_pages, last_rows = self._last_rate_sample
+            window = max(now - last_time, 1e-9)
+            self._last_rate_sample = (now, pages, self.rows_written)
+            responses = sum(n for status, n in self.statuses.items() if status != "error")
+            return {
+                "timestamp": round(now, 3),
+                "uptime_seconds": round(elapsed, 3),
+                "pages": pages,
+                "rows_written": self.rows_written,
+                "pages_per_minute": round(pages * 60 / elapsed, 2),
+                "rows_per_minute": round(self.rows_written * 60 / elapsed, 2),
+                "recent_pages_per_minute": round((pages - last_pages) * 60 / window, 2),
+                "recent_rows_per_minute": round((self.rows_written - last_rows) * 60 / window, 2),
+                "not_found_ratio": round(self.statuses.get("404", 0) / responses, 4) if responses else None,
+                "statuses": dict(sorted(self.statuses.items())),
+                "outcomes": dict(sorted(self.outcomes.items())),
+                "phases": {phase: hist.to_dict() for phase, hist in self.phases.items()},
+            }
+
+    def to_prometheus(self, snapshot=None):
+        snapshot = snapshot or self.snapshot()
+        lines = [
+            "# HELP scrape_phase_seconds Time spent per scrape phase.",
+            "# TYPE scrape_phase_seconds histogram",
+        ]
+        with self._lock:
+            for phase, hist in self.phases.items():
+                for bound, total in zip(hist.bounds + ["+Inf"], hist.cumulative()):
+                    lines.append(f'scrape_phase_seconds_bucket{{phase="{phase}",le="{bound}"}} {total}')
+                lines.append(f'scrape_phase_seconds_sum{{phase="{phase}"}} {hist.sum:.6f}')
+                lines.append(f'scrape_phase_seconds_count{{phase="{phase}"}} {hist.count}')
+        lines += ["# HELP scrape_responses_total Fetches by HTTP status (or error).",
+                  "# TYPE scrape_responses_total counter"]
+        lines += [f'scrape_responses_total{{status="{s}"}} {n}' for s, n in snapshot["statuses"].items()]
+        lines += ["# HELP scrape_outcomes_total Probed IDs by outcome.",
+                  "# TYPE scrape_outcomes_total counter"]
+        lines += [f'scrape_outcomes_total{{outcome="{o}"}} {n}' for o, n in snapshot["outcomes"].items()]
+        lines += ["# HELP scrape_rows_written_total CSV rows written.",
+                  "# TYPE scrape_rows_written_total counter",
+                  f"scrape_rows_written_total {snapshot['rows_written']}",
+                  "# HELP scrape_rows_per_minute CSV rows written per minute since the last snapshot.",
+                  "# TYPE scrape_rows_per_minute gauge",
+                  f"scrape_rows_per_minute {snapshot['recent_rows_per_minute']}",
+                  "# HELP scrape_uptime_seconds Seconds since the run started.",
+                  "# TYPE scrape_uptime_seconds gauge",
+                  f"scrape_uptime_seconds {snapshot['uptime_seconds']}"]
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        parts = []
+        for phase, hist in self.phases.items():
+            if hist.count:
+                parts.append(f"{phase} p50 {hist.quantile(0.5) * 1000:.1f} ms / p99 {hist.quantile(0.99) * 1000:.1f} ms")
+        return "; ".join(parts) or "no samples"
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, mode="w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+class MetricsWriter:
+    """Writes PREFIX.json and PREFIX.prom every `interval` seconds until closed, then once more."""
+
+    def __init__(self, metrics, prefix, interval=DEFAULT_INTERVAL):
+        self.metrics = metrics
+        self.prefix = prefix
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+        self._thread.start()
+
+    def write(self):
+        snapshot = self.metrics.snapshot()
+        _write_atomic(f"{self.prefix}.json", json.dumps(snapshot, indent=1))
+        _write_atomic(f"{self.prefix}.prom", self.metrics.to_prometheus(snapshot))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.write()
@@ -0,0 +1,116 @@
+import contextlib
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Pipelined fetch -> parse -> write for scrape.py --workers N.
+#
+#   fetch stage    A background thread produces (inmate_id, page) items: the async/sequential
+#                  fetch engine with parsing switched off, or archive replay. page is
+#                  (status_code, html), or None when the fetch failed.
+#   parse stage    Pages are sent in small chunks to a pool of worker processes that run
+#                  process_page (extraction + flatten_charges), so parsing scales with cores.
+#   write stage    The calling thread collects chunk results in submission order and hands them
+#                  to the sink, so the CSV, journal and archive are only ever touched by one thread
+#                  and rows come out in the same order as a single-threaded run.
+#
+# The queue between fetch and parse holds at most `queue_size` pages and at most `workers * 2`
+# chunks are in flight in the pool; when the writer falls behind, both fill up and the fetch
+# stage blocks, so memory stays bounded.
+#
+# Callers that run many small pipelines (scrape.py's discovery probes) pass one `pool` for all of
+# them instead of starting and stopping worker processes for every batch.
+
+DEFAULT_WORKERS = os.cpu_count() or 2
+DEFAULT_QUEUE_SIZE = 256
+DEFAULT_CHUNK_SIZE = 16
+
+_DONE = object()
+
+def parse_chunk(process, chunk):
+    """Runs in a worker process. Returns [(outcome, row, error, parse_seconds)] for [(inmate_id, page)]."""
+    results = []
+    for inmate_id, page in chunk:
+        if page is None:
+            results.append(("error", None, None, None))  # Fetch failed; already reported by the fetch stage
+            continue
+        started = time.perf_counter()
+        try:
+            outcome, row = process(inmate_id, *page)
+            results.append((outcome, row, None, time.perf_counter() - started))
+        except Exception as e:
+            results.append(("error", None, f"{type(e).__name__}: {e}", time.perf_counter() - started))
+    return results
+
+class QueueSink:
+    """Sink for the fetch stage: forwards fetched pages to the parse stage instead of writing them."""
+
+    def __init__(self, emit):
+        self.emit = emit
+
+    def add(self, inmate_id, outcome, row=None, page=None):
+        self.emit((inmate_id, page))
+
+def run_pipeline(produce, sink, process, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE,
+                 chunk_size=DEFAULT_CHUNK_SIZE, report=None, parse_timer=None, pool=None):
+    """
+    `produce(emit)` runs on a background thread and calls emit((inmate_id, page)) per page.
+    `process(inmate_id, status_code, html)` must be a picklable top-level function returning (outcome, row).
+    `report(inmate_id, outcome, status_code, error)` is called per result from the writer.
+    `parse_timer(seconds)` receives the time each page took to parse in its worker.
+    `pool` is a ProcessPoolExecutor to parse on; it is left running. Without one a pool of
+    `workers` processes is started for this call.
+    Returns {inmate_id: outcome}.
+    """
+    pages = queue.Queue(maxsize=queue_size)
+    producer_error = []
+
+    def source():
+        try:
+            produce(pages.put)
+        except BaseException as e:
+            producer_error.append(e)
+        finally:
+            pages.put(_DONE)
+
+    thread = threading.Thread(target=source, name="fetch-stage", daemon=True)
+    thread.start()
+
+    outcomes = {}
+    in_flight = deque()
+
+    def write_oldest():
+        chunk, future = in_flight.popleft()
+        for (inmate_id, page), (outcome, row, error, parse_seconds) in zip(chunk, future.result()):
+            if parse_timer and parse_seconds is not None:
+                parse_timer(parse_seconds)
+            if report and (page is not None or error):
+                report(inmate_id, outcome, page[0] if page else None, error)
+            sink.add(inmate_id, outcome, row, page)
+            outcomes[inmate_id] = outcome
+
+    with contextlib.nullcontext(pool) if pool else ProcessPoolExecutor(max_workers=workers) as pool:
+        chunk = []
+        done = False
+        while not done:
+            item = pages.get()
+            if item is _DONE:
+                done = True
+            else:
+                chunk.append(item)
+            # Submit full chunks, or whatever is buffered when the fetch stage has nothing more yet
+            if chunk and (done or len(chunk) >= chunk_size or pages.empty()):
+                in_flight.append((chunk, pool.submit(parse_chunk, process, chunk)))
+                chunk = []
+            while len(in_flight) > workers * 2 or (in_flight and in_flight[0][1].done()):
+                write_oldest()
+        while in_flight:
+            write_oldest()
+
+    thread.join()
+    if producer_error:
+        raise producer_error[0]
+    return outcomes
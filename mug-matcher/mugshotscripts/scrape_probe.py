@@ -0,0 +1,152 @@
+# Adaptive discovery of live booking-ID ranges for scrape.py.
+# Booking IDs are sparse (e.g. 372500084, 502500409, 542500000) and live records cluster in
+# blocks that grow upward as new bookings arrive. Instead of walking every integer, discovery:
+#
+#   1. gallops up from the start ID with doubling strides, probing a small window of IDs at each
+#      point, to find where live records stop;
+#   2. binary-searches between the last live window and the first dead one for the newest-ID frontier;
+#   3. splits the range up to the frontier into buckets and samples each one evenly to estimate its
+#      hit rate;
+#   4. hands back only the buckets that look dense, so the fill pass spends requests where records exist.
+#
+# Every probe goes through the normal fetch path, so records found while probing are written to the
+# CSV and journaled like any other and are never fetched twice.
+
+DEFAULT_WINDOW = 8
+DEFAULT_BUCKET_SIZE = 500
+DEFAULT_SAMPLES_PER_BUCKET = 16
+
+class Bucket:
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end  # Inclusive
+        self.probes = 0
+        self.hits = 0
+        self.dense = False
+
+    @property
+    def size(self):
+        return self.end - self.start + 1
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def describe(self):
+        estimate = round(self.hit_rate * self.size)
+        flag = "dense" if self.dense else "skip"
+        return (f"{self.start}-{self.end}: {self.probes} probes, {self.hits} hits, "
+                f"est. {self.hit_rate:.1%} (~{estimate} records) {flag}")
+
+class IdSpaceProber:
+    """
+    Finds live regions of the ID space.
+    `probe_batch(ids)` must fetch the given IDs and return {inmate_id: outcome}.
+    `known` seeds outcomes from an earlier run (e.g. the progress journal) so they are not re-fetched.
+    """
+
+    def __init__(self, probe_batch, known=None, window=DEFAULT_WINDOW, bucket_size=DEFAULT_BUCKET_SIZE,
+                 samples_per_bucket=DEFAULT_SAMPLES_PER_BUCKET, min_hit_rate=0.0):
+        self.probe_batch = probe_batch
+        self.outcomes = {i: o for i, o in (known or {}).items() if o != "error"}
+        self.window = window
+        self.bucket_size = bucket_size
+        self.samples_per_bucket = samples_per_bucket
+        self.min_hit_rate = min_hit_rate
+        self.requests = 0
+
+    def _probe(self, ids):
+        missing = [i for i in ids if i not in self.outcomes]
+        if missing:
+            self.requests += len(missing)
+            for inmate_id, outcome in self.probe_batch(missing).items():
+                if outcome != "error":
+                    self.outcomes[inmate_id] = outcome
+        return [i for i in ids if self.outcomes.get(i) == "found"]
+
+    def _window_hits(self, start, hi):
+        return self._probe(list(range(start, min(start + self.window, hi + 1))))
+
+    def find_frontier(self, lo, hi):
+        """Returns the highest live ID found in [lo, hi], or None if the range looks empty."""
+        last_live = None
+        first_dead_after_live = None
+        offset, stride = 0, self.window
+        while lo + offset <= hi:
+            start = lo + offset
+            if self._window_hits(start, hi):
+                last_live = start
+                first_dead_after_live = None
+            elif last_live is not None and first_dead_after_live is None:
+                first_dead_after_live = start
+            offset += stride
+            stride *= 2
+
+        if last_live is None:
+            return None
+
+        # Binary search for the edge between the last live window and the dead one after it
+        low = last_live
+        high = first_dead_after_live if first_dead_after_live is not None else hi + 1
+        while high - low > self.window:
+            mid = (low + high) // 2
+            if self._window_hits(mid, hi):
+                low = mid
+            else:
+                high = mid
+        self._window_hits(low, hi)
+
+        live = [i for i, o in self.outcomes.items() if o == "found" and lo <= i <= hi]
+        return max(live) if live else None
+
+    def estimate_buckets(self, lo, hi):
+        buckets = []
+        start = lo
+        while start <= hi:
+            bucket = Bucket(start, min(start + self.bucket_size - 1, hi))
+            step = max(bucket.size // self.samples_per_bucket, 1)
+            self._probe(list(range(bucket.start, bucket.end + 1, step)))
+            # Count everything known in the bucket, including gallop/binary-search probes
+            for inmate_id in range(bucket.start, bucket.end + 1):
+                outcome = self.outcomes.get(inmate_id)
+                if outcome is None:
+                    continue
+                bucket.probes += 1
+                if outcome == "found":
+                    bucket.hits += 1
+            bucket.dense = bucket.hits > 0 and bucket.hit_rate >= self.min_hit_rate
+            buckets.append(bucket)
+            start = bucket.end + 1
+        return buckets
+
+    def discover(self, lo, hi):
+        """
+        Returns (frontier, buckets) for [lo, hi]. Buckets extend one bucket past the frontier so
+        records booked just above the newest sample are still picked up by the fill pass.
+        """
+        frontier = self.find_frontier(lo, hi)
+        if frontier is None:
+            return None, []
+        return frontier, self.estimate_buckets(lo, min(hi, frontier + self.bucket_size))
+
+    def fill_ids(self, buckets):
+        """IDs in dense buckets that have not been probed yet."""
+        ids = []
+        for bucket in buckets:
+            if bucket.dense:
+                ids.extend(i for i in range(bucket.start, bucket.end + 1) if i not in self.outcomes)
+        return ids
+
+    def fill(self, buckets):
+        """Fetches every unprobed ID in the dense buckets. Returns how many were fetched."""
+        ids = self.fill_ids(buckets)
+        self._probe(ids)
+        return len(ids)
+
+    def actual_hit_rates(self, buckets):
+        """Per-bucket (found, probed) after the fill pass, for the end-of-run report."""
+        report = []
+        for bucket in buckets:
+            probed = [self.outcomes[i] for i in range(bucket.start, bucket.end + 1) if i in self.outcomes]
+            report.append((bucket, probed.count("found"), len(probed)))
+        return report
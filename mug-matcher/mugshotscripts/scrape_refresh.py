@@ -0,0 +1,148 @@
+import csv
+import hashlib
+import json
+import os
+import time
+
+# Incremental refresh of already-scraped inmates for scrape.py --refresh.
+# Known IDs are re-fetched with conditional request headers (If-None-Match / If-Modified-Since) when
+# the server handed out validators last time; a 304 means unchanged without downloading the page.
+# Otherwise the freshly extracted record is hashed and compared with the last known hash, which on
+# the first refresh comes straight from the row already in the CSV. Only changed records are
+# written out, so downstream AI enrichment only has to look at what actually changed.
+#
+# Validators from a 200 response are only held (stage_validators) until the sink has stored the
+# record; if the row is never written, the next refresh fetches the full page again instead of
+# getting a 304 for a change it never saw. Only a 404 or 410 marks an inmate released; throttling,
+# server errors and pages that don't parse count as errors and leave the entry as it was.
+#
+# State lives in <output>.refresh.json:
+#   {"<InmateID>": {"etag": ..., "last_modified": ..., "hash": ..., "status": "active" | "released"}}
+
+def record_hash(row, fieldnames):
+    """Stable hash of a CSV row's values; the same for a freshly scraped row and one read back from the CSV."""
+    joined = "\x1f".join(str(row.get(field, "") if row.get(field) is not None else "") for field in fieldnames)
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()
+
+def load_known_rows(csv_path, fieldnames):
+    """{inmate_id: record hash} for every row in a scraped CSV; the last row for an ID wins."""
+    hashes = {}
+    if not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0:
+        return hashes
+    with open(csv_path, mode="r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            try:
+                inmate_id = int(row.get("InmateID", ""))
+            except ValueError:
+                continue
+            hashes[inmate_id] = record_hash(row, fieldnames)
+    return hashes
+
+class RefreshState:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.pending = {}  # inmate_id -> (etag, last_modified) fetched but not yet stored
+        if os.path.exists(path):
+            with open(path, mode="r", encoding="utf-8") as f:
+                self.entries = {int(k): v for k, v in json.load(f).items()}
+
+    def get(self, inmate_id):
+        return self.entries.setdefault(inmate_id, {})
+
+    def conditional_headers(self, inmate_id):
+        entry = self.entries.get(inmate_id, {})
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def set_validators(self, inmate_id, etag, last_modified):
+        entry = self.get(inmate_id)
+        entry["etag"] = etag
+        entry["last_modified"] = last_modified
+
+    def stage_validators(self, inmate_id, etag, last_modified):
+        self.pending[inmate_id] = (etag, last_modified)
+
+    def commit_validators(self, inmate_id):
+        """Keeps the staged validators once the inmate's record has been stored."""
+        validators = self.pending.pop(inmate_id, None)
+        if validators:
+            self.set_validators(inmate_id, *validators)
+
+    def discard_validators(self, inmate_id):
+        self.pending.pop(inmate_id, None)
+
+    def is_released(self, inmate_id):
+        return self.entries.get(inmate_id, {}).get("status") == "released"
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, mode="w", encoding="utf-8") as f:
+            json.dump({str(k): v for k, v in sorted(self.entries.items())}, f)
+        os.replace(tmp_path, self.path)
+
+class RefreshSink:
+    """
+    Result sink for refresh runs (same add() interface as scrape.ResultSink).
+    Writes only changed records and counts changed / unchanged / released / error outcomes.
+    """
+
+    def __init__(self, file, fieldnames, state, baseline_hashes, archive=None, metrics=None):
+        self.file = file
+        self.fieldnames = fieldnames
+        self.writer = csv.DictWriter(file, fieldnames=fieldnames)
+        self.state = state
+        self.baseline_hashes = baseline_hashes
+        self.archive = archive
+        self.metrics = metrics
+        self.counts = {"changed": 0, "unchanged": 0, "released": 0, "error": 0}
+        self.not_modified = 0
+        self.released_ids = []
+
+    def add(self, inmate_id, outcome, row=None, page=None):
+        started = time.perf_counter()
+        wrote = self._add(inmate_id, outcome, row, page)
+        if self.metrics:
+            self.metrics.record_write(outcome, wrote, time.perf_counter() - started)
+
+    def _add(self, inmate_id, outcome, row, page):
+        # Returns True when a changed record was written
+        if outcome == "not_modified":
+            self.not_modified += 1
+            self.counts["unchanged"] += 1
+            return False
+        if self.archive and page:
+            self.archive.put(inmate_id, *page)
+
+        if outcome == "found":
+            entry = self.state.get(inmate_id)
+            new_hash = record_hash(row, self.fieldnames)
+            previous_hash = entry.get("hash") or self.baseline_hashes.get(inmate_id)
+            wrote = new_hash != previous_hash
+            if wrote:
+                self.writer.writerow(row)
+                self.file.flush()
+            # Only now that the record is stored may a later refresh skip it on a 304
+            entry["status"] = "active"
+            entry["hash"] = new_hash
+            self.state.commit_validators(inmate_id)
+            self.counts["changed" if wrote else "unchanged"] += 1
+            return wrote
+        self.state.discard_validators(inmate_id)
+        if outcome == "not_found":
+            # The booking page is gone (404 or 410): the inmate has been released
+            self.state.get(inmate_id)["status"] = "released"
+            self.counts["released"] += 1
+            self.released_ids.append(inmate_id)
+        else:
+            self.counts["error"] += 1  # Throttled, server error or unparsable page: retried next refresh
+        return False
+
+    def summary(self):
+        c = self.counts
+        return (f"{c['changed']} changed, {c['unchanged']} unchanged "
+                f"({self.not_modified} via 304 Not Modified), {c['released']} released, {c['error']} errors")
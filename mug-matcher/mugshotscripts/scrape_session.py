@@ -0,0 +1,102 @@
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Pooled keep-alive HTTP sessions for scrape.py.
+# One requests.Session is shared by every fetch so connections to apps.sheriff.org are reused
+# instead of paying a TCP+TLS handshake per ID. The adapter counts how many connections were
+# actually opened, which tells us whether keep-alive is working against the real server.
+
+DEFAULT_POOL_SIZE = 8
+
+class ConnectionStats:
+    """Thread-safe counters for requests sent and connections opened (or attempted) by a session."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.opened = 0
+        self.connect_seconds = 0.0
+        self.on_connect = None  # Optional callback(seconds), e.g. ScrapeMetrics.observe_connect
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_connect(self, elapsed):
+        with self._lock:
+            self.opened += 1
+            self.connect_seconds += elapsed
+        if self.on_connect:
+            self.on_connect(elapsed)
+
+    @property
+    def reused(self):
+        # Every request that did not need a fresh connection rode on a kept-alive one
+        return max(self.requests - self.opened, 0)
+
+    def summary(self):
+        avg_connect_ms = (self.connect_seconds / self.opened * 1000) if self.opened else 0.0
+        return (f"{self.requests} requests, {self.opened} connections opened, {self.reused} reused "
+                f"(avg connect {avg_connect_ms:.1f} ms)")
+
+def _counting_pool_classes(stats):
+    class CountingHTTPConnection(HTTPConnection):
+        def connect(self):
+            started = time.perf_counter()
+            try:
+                super().connect()
+            finally:
+                stats.record_connect(time.perf_counter() - started)
+
+    class CountingHTTPSConnection(HTTPSConnection):
+        def connect(self):
+            started = time.perf_counter()
+            try:
+                super().connect()
+            finally:
+                stats.record_connect(time.perf_counter() - started)
+
+    class CountingHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = CountingHTTPConnection
+
+    class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = CountingHTTPSConnection
+
+    return {"http": CountingHTTPConnectionPool, "https": CountingHTTPSConnectionPool}
+
+class CountingAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools report connection opens and requests to a ConnectionStats."""
+
+    def __init__(self, stats, pool_size=DEFAULT_POOL_SIZE, **kwargs):
+        self.stats = stats
+        super().__init__(pool_connections=1, pool_maxsize=pool_size, pool_block=True, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _counting_pool_classes(self.stats)
+
+    def send(self, request, **kwargs):
+        self.stats.record_request()
+        return super().send(request, **kwargs)
+
+def create_session(headers=None, pool_size=DEFAULT_POOL_SIZE, keep_alive=True, gzip=True):
+    """
+    Returns a requests.Session with a bounded connection pool of `pool_size` connections.
+    The session's counters are available as `session.connection_stats`.
+    """
+    stats = ConnectionStats()
+    session = requests.Session()
+    adapter = CountingAdapter(stats, pool_size=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if headers:
+        session.headers.update(headers)
+    session.headers["Accept-Encoding"] = "gzip, deflate" if gzip else "identity"
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    session.connection_stats = stats
+    return session
@@ -0,0 +1,83 @@
+import datetime
+import json
+import os
+
+from charge_cache import normalize_charge
+
+# Curated plain-English explanations for charges whose meaning never changes.
+# Procedural codes (CRT-ORDER, CAP-FEL, VOP-FEL, WARR-PTR-F, holds, ...) make up a large share of
+# the Statute column and always carry the same description, so they don't need a model to
+# explain them. The enrichment scripts look charges up here first and only send the rest to the API.
+#
+# statute_lookup.json holds a version number and a list of entries:
+#
+#   {"statute": "CAP-FEL", "description": "CAPIAS - FEL", "explanation": "Felony arrest warrant issued by court"}
+#
+# An entry matches on the normalized description, and on the statute code too when the caller
+# knows it. Bump "version" whenever an entry changes. build_statute_lookup.py proposes new entries
+# from earlier AI_Description_Explanation output.
+
+DEFAULT_LOOKUP_FILENAME = "statute_lookup.json"
+
+def normalize_statute(statute):
+    return " ".join(statute.split()).upper()
+
+def split_statutes(statute_text, count):
+    """
+    The pipe-separated Statute column as a list lined up with `count` charges, or [None] * count
+    when the columns don't line up (lookups then match on the description alone).
+    """
+    statutes = [normalize_statute(s) for s in (statute_text or "").split("|")]
+    if len(statutes) != count:
+        return [None] * count
+    return [s or None for s in statutes]
+
+def load_table(path):
+    if not os.path.exists(path):
+        return {"version": 0, "updated": None, "entries": []}
+    with open(path, mode="r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_table(path, table):
+    entries = sorted(table["entries"], key=lambda e: (normalize_statute(e["statute"]), normalize_charge(e["description"])))
+    table = {"version": table.get("version", 0), "updated": datetime.date.today().isoformat(), "entries": entries}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, mode="w", encoding="utf-8") as f:
+        json.dump(table, f, indent=1)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+class StatuteLookup:
+    def __init__(self, path):
+        self.path = path
+        table = load_table(path)
+        self.version = table.get("version", 0)
+        self.entries = {}
+        for entry in table.get("entries", []):
+            self.entries.setdefault(normalize_charge(entry["description"]), []).append(
+                (normalize_statute(entry["statute"]), entry["explanation"])
+            )
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.entries.values())
+
+    def get(self, description, statute=None):
+        """The curated explanation for a charge, or None. `statute` narrows the match when known."""
+        for entry_statute, explanation in self.entries.get(normalize_charge(description), []):
+            if statute is None or statute == entry_statute:
+                self.hits += 1
+                return explanation
+        self.misses += 1
+        return None
+
+    def summary(self, seconds_per_call=None, calls_avoided=None):
+        lookups = self.hits + self.misses
+        hit_rate = f"{self.hits / lookups:.1%}" if lookups else "n/a"
+        text = f"{self.hits}/{lookups} charges answered ({hit_rate} hit rate) from {self.path} v{self.version}"
+        if calls_avoided is not None:
+            text += f", {calls_avoided} API calls avoided"
+            if seconds_per_call:
+                text += f" (~{calls_avoided * seconds_per_call:.1f}s at {seconds_per_call:.2f}s per call)"
+        return text
@@ -0,0 +1,89 @@
+import csv
+import os
+import time
+
+# Append-only CSV output for the AI enrichment scripts.
+# Rows are appended to <output>.partial as they are finished, instead of being collected in memory
+# and rewritten to disk every few rows, so memory stays flat and each row is written exactly once.
+#
+#   every row        flushed to the OS, so `tail -f` and a crash lose at most the row in progress
+#   every N rows     fsync'd (also every `fsync_seconds`), bounding what a power loss can take
+#   commit()         final fsync, then an atomic rename of .partial over the output file
+#
+# Readers therefore only ever see the previous complete output or the new complete output, never a
+# half-written file. If the run fails or is interrupted the .partial file is left in place with
+# every row finished so far.
+
+DEFAULT_FSYNC_EVERY = 100
+DEFAULT_FSYNC_SECONDS = 5.0
+
+def partial_path(output_path):
+    return f"{output_path}.partial"
+
+class StreamingCSVWriter:
+    """
+    Use as a context manager: the output is committed when the block finishes normally and left
+    as .partial when it raises. `csv_options` go to csv.writer (quoting, lineterminator, ...).
+    """
+
+    def __init__(self, output_path, header=None, fsync_every=DEFAULT_FSYNC_EVERY,
+                 fsync_seconds=DEFAULT_FSYNC_SECONDS, **csv_options):
+        self.output_path = output_path
+        self.partial_path = partial_path(output_path)
+        self.fsync_every = fsync_every
+        self.fsync_seconds = fsync_seconds
+        self.rows_written = 0
+        self.committed = False
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._file = open(self.partial_path, mode="w", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._file, **csv_options)
+        if header is not None:
+            self._writer.writerow(header)
+            self._file.flush()
+
+    def writerow(self, values):
+        self._writer.writerow(values)
+        self.rows_written += 1
+        self._unsynced += 1
+        self._file.flush()
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_seconds:
+            self.sync()
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def commit(self):
+        """Makes the output final: fsync, close and rename .partial over the output path."""
+        self.sync()
+        self._file.close()
+        os.replace(self.partial_path, self.output_path)
+        self.committed = True
+        directory = os.path.dirname(os.path.abspath(self.output_path))
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return  # Directories can't be opened on every platform; the rename itself is still atomic
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def abort(self):
+        """Keeps what was written so far in the .partial file."""
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
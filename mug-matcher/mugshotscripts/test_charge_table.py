@@ -0,0 +1,47 @@
+import pandas as pd
+
+import consolidated_mugshot_processor as processor
+
+# Charge lists built by prepare_charges must stay with their own inmate when cells repeat across
+# inmates: merges group repeated keys together on some pandas versions.
+#
+#   python -m pytest mugshotscripts/test_charge_table.py
+
+def details_for(df, rank_top=0):
+    processor.rank_top_global = rank_top
+    try:
+        return processor.prepare_charges(df)["details"].tolist()
+    finally:
+        processor.rank_top_global = 0
+
+def test_repeated_cells_stay_with_their_inmate():
+    df = pd.DataFrame({"Description": ["A | B", "C", "A | B", "D"]})
+    assert details_for(df) == [
+        ["Charge: A", "Charge: B"],
+        ["Charge: C"],
+        ["Charge: A", "Charge: B"],
+        ["Charge: D"],
+    ]
+
+def test_repeated_statutes_and_comments_are_paired_per_inmate():
+    df = pd.DataFrame({
+        "Description": ["DUI", "THEFT | DUI", "DUI", ""],
+        "Statute": ["316.193", "812.014 | 316.193", "316.193", ""],
+        "Charge Comments": ["", " | ", "", ""],
+    }, index=[10, 20, 30, 40])
+    prepared = processor.prepare_charges(df)
+    assert list(prepared.index) == [10, 20, 30, 40]
+    assert prepared["details"].tolist() == [
+        ["Charge: DUI, Statute Ref: 316.193"],
+        ["Charge: THEFT, Statute Ref: 812.014", "Charge: DUI, Statute Ref: 316.193"],
+        ["Charge: DUI, Statute Ref: 316.193"],
+        [],
+    ]
+    assert prepared["prompt"].iloc[3] is None
+    assert "1. Charge: THEFT" in prepared["prompt"].iloc[1]
+
+def test_rank_top_keeps_rows_in_inmate_order():
+    df = pd.DataFrame({"Description": ["A | B | C", "C", "A | B | C"]})
+    details = details_for(df, rank_top=2)
+    assert [len(d) for d in details] == [2, 1, 2]
+    assert details[0] == details[2]
@@ -0,0 +1,25 @@
+import os
+
+import pytest
+
+pytest.importorskip("lxml")
+
+from bench_extract import fixture_pages, mismatched_pages
+from mock_sheriff_server import load_pages
+
+# The single-pass lxml extractor must return exactly what the original extractor returns: on the
+# fixture pages (missing and malformed sections, every line ending) and on pages rendered from
+# the scraped CSV.
+#
+#   python -m pytest mugshotscripts/test_page_extract.py
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def test_fixture_pages_match_the_original_extractor():
+    pages = fixture_pages()
+    assert pages
+    assert mismatched_pages(pages) == []
+
+def test_rendered_pages_match_the_original_extractor():
+    pages = sorted(load_pages(os.path.join(SCRIPT_DIR, "mugshots_data.csv")).items())
+    assert mismatched_pages(pages) == []
@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+from openai_async import TokenBucket
+
+# TokenBucket must hold the long-run rate to its per-minute budget even when single calls are
+# larger than the bucket (one second's worth), and must charge usage above the estimate.
+#
+#   python -m pytest mugshotscripts/test_token_bucket.py
+
+def granted_tokens(bucket, amount, seconds):
+    """Acquires `amount` repeatedly for `seconds`; returns (tokens granted, elapsed seconds)."""
+    async def run():
+        granted = 0
+        started = time.monotonic()
+        while time.monotonic() - started < seconds:
+            await bucket.acquire(amount)
+            granted += amount
+        return granted, time.monotonic() - started
+    return asyncio.run(run())
+
+def test_calls_larger_than_the_bucket_keep_to_the_rate():
+    bucket = TokenBucket(60000)  # 1000 tokens/s, a 1000-token bucket
+    granted, elapsed = granted_tokens(bucket, 2500, 3.0)
+    # At most one full bucket plus one call beyond what the rate allows
+    assert granted <= 1000 * elapsed + 1000 + 2500
+    assert granted >= 1000 * (elapsed - 1.0)
+
+def test_small_calls_keep_to_the_rate():
+    bucket = TokenBucket(60000)
+    granted, elapsed = granted_tokens(bucket, 150, 2.0)
+    assert granted <= 1000 * elapsed + 1000 + 150
+    assert granted >= 1000 * (elapsed - 1.0)
+
+def test_usage_above_the_estimate_is_charged():
+    bucket = TokenBucket(60000)
+    asyncio.run(bucket.acquire(500))
+    bucket.adjust(1500)  # The call used 1500 tokens more than estimated
+    started = time.monotonic()
+    asyncio.run(bucket.acquire(100))
+    assert time.monotonic() - started >= 0.9  # ~1000 tokens of debt to wait out first
+
+def test_unused_estimate_is_handed_back():
+    bucket = TokenBucket(60000)
+    asyncio.run(bucket.acquire(1000))
+    bucket.adjust(-1000)
+    started = time.monotonic()
+    asyncio.run(bucket.acquire(900))
+    assert time.monotonic() - started < 0.2
@@ -0,0 +1,108 @@
+import argparse
+import os
+import pathlib
+import sqlite3
+
+from create_database import DEFAULT_DATABASE_FILENAME, INDEXES, format_run
+
+# Reports on the database built by create_database.py: table structure, row counts and statistics,
+# the most common statutes, missing indexes, sample rows, and the throughput of recent loads
+# (from load_run). Opens the database read-only, so it can run while a load is in progress.
+#
+#   python mugshotscripts/verify_database.py
+#   python mugshotscripts/verify_database.py --samples 0 --loads 10
+
+TABLES = ["inmate", "statute_reference", "charge", "bond"]
+
+def print_structure(conn):
+    print("=== Structure ===")
+    for table in TABLES:
+        columns = conn.execute(f"PRAGMA table_info({table})").fetchall()
+        print(f"{table}: " + ", ".join(f"{c[1]} {c[2]}" for c in columns))
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    missing = [name for name in INDEXES if name not in indexes]
+    print(f"Indexes: {', '.join(sorted(indexes & set(INDEXES)))}")
+    if missing:
+        print(f"Warning: missing indexes {', '.join(missing)} (an interrupted load? run create_database.py again)")
+
+def print_statistics(conn, top):
+    print("\n=== Statistics ===")
+    counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in TABLES}
+    inmates, charges = counts["inmate"], counts["charge"]
+    print(f"Total inmates: {inmates:,}")
+    print(f"Total charges: {charges:,}")
+    print(f"Average charges per inmate: {charges / inmates:.2f}" if inmates else "Average charges per inmate: n/a")
+    print(f"Total bonds: {counts['bond']:,}")
+    print(f"Total unique statute references: {counts['statute_reference']:,}")
+
+    total_bond = conn.execute("SELECT COALESCE(SUM(amount), 0) FROM bond").fetchone()[0]
+    print(f"Total bond amount: ${total_bond:,.2f}")
+    ai = conn.execute("SELECT COUNT(best_crime), COUNT(display_crime), COUNT(most_interesting_charge) FROM inmate").fetchone()
+    explained = conn.execute("SELECT COUNT(ai_explanation) FROM charge").fetchone()[0]
+    print(f"AI columns: {ai[0]:,} Best_Crime, {ai[1]:,} Display_Crime, {ai[2]:,} Most_Interesting_Charge, "
+          f"{explained:,} of {charges:,} charges explained")
+    orphans = conn.execute("SELECT COUNT(*) FROM charge WHERE inmate_id NOT IN (SELECT inmate_id FROM inmate)").fetchone()[0]
+    orphans += conn.execute("SELECT COUNT(*) FROM bond WHERE charge_id NOT IN (SELECT charge_id FROM charge)").fetchone()[0]
+    if orphans:
+        print(f"Warning: {orphans} charges or bonds reference a missing inmate or charge")
+
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    pages = conn.execute("PRAGMA page_count").fetchone()[0]
+    journal = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    print(f"Database size: {page_size * pages / 1e6:.1f} MB, journal mode {journal}")
+
+    print("\nThe most common statute codes are:")
+    for code, count in conn.execute(
+        "SELECT s.statute_code, COUNT(*) AS n FROM charge c JOIN statute_reference s ON s.statute_id = c.statute_id "
+        "GROUP BY s.statute_id ORDER BY n DESC, s.statute_code LIMIT ?", (top,)
+    ):
+        print(f"- {code}: {count:,} occurrences")
+
+def print_samples(conn, samples):
+    print("\n=== Sample Data ===")
+    for table in TABLES:
+        cursor = conn.execute(f"SELECT * FROM {table} LIMIT ?", (samples,))
+        names = [d[0] for d in cursor.description]
+        print(f"{table}:")
+        for row in cursor:
+            print("  " + ", ".join(f"{name}={value!r}" for name, value in zip(names, row)))
+
+def print_loads(conn, loads):
+    print("\n=== Recent Loads ===")
+    cursor = conn.execute("SELECT * FROM load_run ORDER BY load_id DESC LIMIT ?", (loads,))
+    names = [d[0] for d in cursor.description]
+    runs = [dict(zip(names, row)) for row in cursor]
+    if not runs:
+        print("No loads recorded.")
+    for run in runs:
+        print(f"{run['loaded_at']} {os.path.basename(run['source'])}: {format_run(run)}")
+
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Report the structure, statistics and load throughput of the mugshot database.")
+    parser.add_argument('--database', default=DEFAULT_DATABASE_FILENAME, help=f'SQLite database file. Default: {DEFAULT_DATABASE_FILENAME} in the script directory')
+    parser.add_argument('--samples', type=int, default=3, help='Sample rows to show per table. Default: 3')
+    parser.add_argument('--top', type=int, default=5, help='Most common statutes to list. Default: 5')
+    parser.add_argument('--loads', type=int, default=5, help='Recent loads to report. Default: 5')
+    args = parser.parse_args()
+
+    database_path = args.database if os.path.isabs(args.database) else os.path.join(script_dir, args.database)
+    if not os.path.exists(database_path):
+        print(f"Error: database {database_path} does not exist (run create_database.py first)")
+        raise SystemExit(1)
+    try:
+        conn = sqlite3.connect(pathlib.Path(database_path).as_uri() + "?mode=ro", uri=True)
+    except sqlite3.Error as e:
+        print(f"Error: could not open database {database_path}: {e}")
+        raise SystemExit(1)
+    try:
+        print_structure(conn)
+        print_statistics(conn, args.top)
+        if args.samples > 0:
+            print_samples(conn, args.samples)
+        print_loads(conn, args.loads)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()